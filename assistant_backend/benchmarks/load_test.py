@@ -0,0 +1,299 @@
+"""
+Load generator for the assistant WebSocket (/ws).
+
+Opens N concurrent sessions that replay a script of recorded messages with
+think times between them. It reports p50/p95/p99 time-to-transcript,
+time-to-first-audio and full-turn latency for each concurrency level,
+plus the server's CPU and RSS when --server-pid is given. Start the stub
+LLM/TTS servers (benchmarks.stub_servers) and the assistant first, then
+run from the assistant_backend directory:
+
+    python -m benchmarks.load_test --sessions 1 4 8 16 --turns 6 --server-pid $(pgrep -f "main:app")
+
+A script is a JSONL file with one message per line:
+
+    {"type": "audio", "file": "recordings/question.wav", "think": 4}
+    {"type": "vision_image", "file": "recordings/street.jpg"}
+    {"type": "pdf_upload", "file": "recordings/letter.pdf"}
+    {"type": "greeting"}
+
+Relative paths are resolved against the script's directory. Lines without
+"think" wait a random (exponential) time with mean --think. Without
+--script a built-in greeting / PDF / audio script is used; its audio is
+a tone, which Whisper's VAD drops, so those turns end after STT.
+"""
+
+import argparse
+import asyncio
+import base64
+import contextlib
+import io
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+import wave
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import websockets
+
+from config import get_config
+
+try:
+    import psutil  # type: ignore
+except ImportError:
+    psutil = None
+
+# Message field that carries the file contents, per message type
+FILE_FIELDS = {"audio": "audio_data", "vision_image": "image", "pdf_upload": "pdf"}
+TURN_TIMEOUT = 120.0
+
+
+def minimal_pdf(text: str) -> bytes:
+    """A one-page PDF with a line of text, built by hand."""
+    stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode()
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R "
+        b"/Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def tone_wav(seconds: float = 2.0, sample_rate: int = 16000) -> bytes:
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    samples = (0.2 * 32767 * np.sin(2 * np.pi * 440 * t)).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+def default_script():
+    return [
+        ({"type": "greeting"}, 0.0),
+        ({"type": "pdf_upload", "pdf": base64.b64encode(minimal_pdf("Appointment on Monday at 10am.")).decode()}, None),
+        ({"type": "audio", "audio_data": base64.b64encode(tone_wav()).decode()}, None),
+    ]
+
+
+def load_script(path: str):
+    base = os.path.dirname(os.path.abspath(path))
+    script = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            think = row.pop("think", None)
+            file_path = row.pop("file", None)
+            if file_path:
+                with open(os.path.join(base, file_path), "rb") as media:
+                    row[FILE_FIELDS[row["type"]]] = base64.b64encode(media.read()).decode()
+            script.append((row, think))
+    return script
+
+
+class ResourceSampler:
+    """
+    Samples a process's CPU (percent of one core) and RSS in a background thread.
+    """
+
+    def __init__(self, pid: int, interval: float = 0.5):
+        self.pid = pid
+        self.interval = interval
+        self.cpu = []
+        self.rss = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _read(self):
+        if psutil is not None:
+            process = psutil.Process(self.pid)
+            times = process.cpu_times()
+            return times.user + times.system, process.memory_info().rss
+        # Linux fallback
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        ticks = os.sysconf("SC_CLK_TCK")
+        cpu_seconds = (int(fields[11]) + int(fields[12])) / ticks
+        rss = int(fields[21]) * os.sysconf("SC_PAGE_SIZE")
+        return cpu_seconds, rss
+
+    def _run(self):
+        last_cpu, _ = self._read()
+        last_t = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            cpu, rss = self._read()
+            now = time.perf_counter()
+            self.cpu.append(100 * (cpu - last_cpu) / (now - last_t))
+            self.rss.append(rss)
+            last_cpu, last_t = cpu, now
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def summary(self):
+        if not self.cpu:
+            return {}
+        return {
+            "cpu_mean_pct": round(float(np.mean(self.cpu)), 1),
+            "cpu_max_pct": round(float(np.max(self.cpu)), 1),
+            "rss_max_mb": round(max(self.rss) / 2 ** 20, 1),
+        }
+
+
+async def run_turn(ws, message: dict) -> dict:
+    result = {"type": message["type"], "transcript": None, "first_audio": None, "total": None, "error": None}
+    start = time.perf_counter()
+    speaking = False
+    await ws.send(json.dumps(message))
+
+    while True:
+        reply = json.loads(await asyncio.wait_for(ws.recv(), TURN_TIMEOUT))
+        elapsed = time.perf_counter() - start
+        kind = reply.get("type")
+
+        if kind == "transcription":
+            result["transcript"] = elapsed
+        elif kind == "tts_chunk" and result["first_audio"] is None:
+            result["first_audio"] = elapsed
+        elif kind == "tts_start":
+            speaking = True
+        elif kind == "tts_end":
+            break
+        elif kind == "error":
+            result["error"] = reply.get("message")
+            break
+        elif kind == "status" and reply.get("busy"):
+            # Shed by admission control; a refused TTS is followed by tts_end
+            result["error"] = "busy"
+            if not speaking:
+                break
+        elif kind == "status" and reply.get("message") == "Listening..." and message["type"] == "audio":
+            # No speech detected, so the turn ends after STT
+            break
+
+    result["total"] = time.perf_counter() - start
+    return result
+
+
+async def run_session(url: str, script, turns: int, think_mean: float, rng: random.Random, results: list):
+    # Stagger connections so sessions do not move in lockstep
+    await asyncio.sleep(rng.uniform(0, think_mean))
+    async with websockets.connect(url, max_size=None) as ws:
+        await ws.recv()  # connection status
+        for i in range(turns):
+            message, think = script[i % len(script)]
+            await asyncio.sleep(think if think is not None else rng.expovariate(1 / think_mean))
+            try:
+                results.append(await run_turn(ws, message))
+            except asyncio.TimeoutError:
+                results.append({"type": message["type"], "transcript": None, "first_audio": None,
+                                "total": None, "error": "timeout"})
+                # Late replies would be attributed to the next turn
+                break
+
+
+def percentiles(values):
+    values = [v for v in values if v is not None]
+    if not values:
+        return {"p50": None, "p95": None, "p99": None}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": round(float(p50), 3), "p95": round(float(p95), 3), "p99": round(float(p99), 3)}
+
+
+async def run_level(url, script, sessions, turns, think_mean, seed, server_pid):
+    results = []
+    rng = random.Random(seed)
+    start = time.perf_counter()
+
+    with (ResourceSampler(server_pid) if server_pid else contextlib.nullcontext()) as sampler:
+        outcomes = await asyncio.gather(
+            *(run_session(url, script, turns, think_mean, random.Random(rng.random()), results) for _ in range(sessions)),
+            return_exceptions=True,
+        )
+
+    failed_sessions = [o for o in outcomes if isinstance(o, Exception)]
+    elapsed = time.perf_counter() - start
+    return {
+        "sessions": sessions,
+        "turns": len(results),
+        "errors": sum(1 for r in results if r["error"]) + len(failed_sessions),
+        "shed": sum(1 for r in results if r["error"] == "busy"),
+        "turns_per_s": round(len(results) / elapsed, 2),
+        "time_to_transcript": percentiles(r["transcript"] for r in results),
+        "time_to_first_audio": percentiles(r["first_audio"] for r in results),
+        "full_turn": percentiles(r["total"] for r in results if not r["error"]),
+        "server": sampler.summary() if sampler else {},
+    }
+
+
+def fmt(value):
+    return "-" if value is None else f"{value:.2f}"
+
+
+def main():
+    cfg = get_config()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=f"ws://127.0.0.1:{cfg['websocket_port']}/ws")
+    parser.add_argument("--sessions", nargs="+", type=int, default=[1, 2, 4, 8])
+    parser.add_argument("--turns", type=int, default=6, help="turns per session")
+    parser.add_argument("--think", type=float, default=3.0, help="mean think time in seconds")
+    parser.add_argument("--script", help="JSONL script of messages to replay")
+    parser.add_argument("--server-pid", type=int, help="assistant process to sample CPU/RSS from")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    script = load_script(args.script) if args.script else default_script()
+    levels = []
+
+    print(f"{'sessions':>8} {'turns/s':>8} {'errors':>6}  {'transcript p50/p95/p99':>24}  "
+          f"{'first audio p50/p95/p99':>24}  {'full turn p50/p95/p99':>24}  {'cpu%':>6} {'rss MB':>7}")
+    for sessions in args.sessions:
+        level = asyncio.run(run_level(args.url, script, sessions, args.turns, args.think, args.seed, args.server_pid))
+        levels.append(level)
+
+        cells = [
+            "/".join(fmt(level[key][p]) for p in ("p50", "p95", "p99"))
+            for key in ("time_to_transcript", "time_to_first_audio", "full_turn")
+        ]
+        server = level["server"]
+        print(f"{sessions:>8} {level['turns_per_s']:>8.2f} {level['errors']:>6}  {cells[0]:>24}  {cells[1]:>24}  "
+              f"{cells[2]:>24}  {server.get('cpu_mean_pct', math.nan):>6.1f} {server.get('rss_max_mb', math.nan):>7.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"url": args.url, "turns": args.turns, "think": args.think, "levels": levels}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Stub LLM and TTS servers with configurable latency for load testing.
+
+Both speak the OpenAI-style HTTP APIs the assistant calls, on the ports
+in config.py, so the assistant runs against them unchanged:
+
+    python -m benchmarks.stub_servers --llm-latency 0.8 --tts-latency 0.3
+
+The assistant only uses these endpoints when OPENAI_API_KEY and
+GROQ_API_KEY are unset, and gTTS (if installed) takes precedence over the
+TTS endpoint, so run the assistant in an environment without it.
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import random
+import sys
+import threading
+import time
+import wave
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+from config import get_config
+
+REPLY = (
+    "Here is a short summary of what you shared. The document describes a routine "
+    "appointment and lists a few follow-up steps. Would you like me to read any part in full?"
+)
+
+# Synthesized speech runs at roughly this many characters per second of audio
+CHARS_PER_SECOND = 15
+SAMPLE_RATE = 22050
+
+
+def jittered(latency: float, jitter: float) -> float:
+    return max(0.0, latency + random.uniform(-jitter, jitter))
+
+
+def make_wav(seconds: float) -> bytes:
+    # A quiet tone, so clients that decode the audio get something real
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    samples = (0.1 * 32767 * np.sin(2 * np.pi * 220 * t)).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+def create_llm_app(args) -> FastAPI:
+    app = FastAPI(title="Stub LLM")
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        await asyncio.sleep(jittered(args.llm_latency, args.llm_jitter))
+        return JSONResponse({
+            "id": "stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": REPLY},
+                "finish_reason": "stop",
+            }],
+        })
+
+    return app
+
+
+def create_tts_app(args) -> FastAPI:
+    app = FastAPI(title="Stub TTS")
+
+    @app.post("/v1/audio/speech")
+    async def speech(request: Request):
+        body = await request.json()
+        text = body.get("input", "")
+        await asyncio.sleep(jittered(args.tts_latency, args.tts_jitter) + args.tts_per_char * len(text))
+        audio = await asyncio.to_thread(make_wav, max(0.5, len(text) / CHARS_PER_SECOND))
+        return Response(audio, media_type="audio/wav")
+
+    return app
+
+
+def serve(app: FastAPI, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    return server
+
+
+def main():
+    cfg = get_config()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm-port", type=int, default=urlparse(cfg["llm_api_endpoint"]).port)
+    parser.add_argument("--tts-port", type=int, default=urlparse(cfg["tts_api_endpoint"]).port)
+    parser.add_argument("--llm-latency", type=float, default=0.8, help="seconds per completion")
+    parser.add_argument("--llm-jitter", type=float, default=0.2)
+    parser.add_argument("--tts-latency", type=float, default=0.3, help="seconds before audio is returned")
+    parser.add_argument("--tts-jitter", type=float, default=0.1)
+    parser.add_argument("--tts-per-char", type=float, default=0.002, help="extra seconds per input character")
+    args = parser.parse_args()
+
+    servers = [
+        serve(create_llm_app(args), args.llm_port),
+        serve(create_tts_app(args), args.tts_port),
+    ]
+    print(f"Stub LLM on :{args.llm_port}, stub TTS on :{args.tts_port} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        for server in servers:
+            server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
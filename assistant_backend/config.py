@@ -18,6 +18,21 @@ AUDIO_SAMPLE_RATE = 44100
 # =====================
 
 WHISPER_MODEL = "base"
+# CTranslate2 threads per transcriber; 0 lets it decide. serve.py sets this
+# per worker so several workers share the CPUs instead of oversubscribing them
+WHISPER_CPU_THREADS = int(os.environ.get("WHISPER_CPU_THREADS", 0))
+
+# =====================
+# MODEL CACHE CONFIG
+# =====================
+
+# Whisper and SmolVLM weights are read from (and downloaded to) this directory.
+# With OFFLINE_MODELS=1 nothing is downloaded, for air-gapped deployments.
+MODEL_CACHE_DIR = os.environ.get("MODEL_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "models"))
+OFFLINE_MODELS = os.environ.get("OFFLINE_MODELS", "0") == "1"
+
+# Loaded in the background after startup; anything else loads on first use
+WARM_UP_MODELS = ["whisper", "smolvlm", "piper"]
 
 # =====================
 # LLM CONFIG
@@ -35,9 +50,66 @@ TTS_MODEL = "tts-1"
 TTS_VOICE = "nova"
 TTS_FORMAT = "wav"
 
+# "piper" speaks with a local Piper voice (ONNX on CPU, no network), "remote"
+# with the OpenAI / gTTS / HTTP endpoint above, and "auto" uses Piper when
+# it is installed and the voice file exists. Voices: https://huggingface.co/rhasspy/piper-voices
+TTS_ENGINE = os.environ.get("TTS_ENGINE", "auto")
+PIPER_VOICE_MODEL = os.environ.get("PIPER_VOICE_MODEL", os.path.join(MODEL_CACHE_DIR, "piper", "en_US-lessac-medium.onnx"))
+# ONNX Runtime threads per synthesis; the TTS lane runs several at once
+PIPER_THREADS = int(os.environ.get("PIPER_THREADS", 1))
+
+# =====================
+# INFERENCE SERVER CONFIG
+# =====================
+
+# With INFERENCE_SOCKET set, the web process loads no models and sends STT,
+# image description and TTS to the inference server (inference_server.py)
+# listening on that Unix socket
+INFERENCE_SOCKET = os.environ.get("INFERENCE_SOCKET", "")
+DEFAULT_INFERENCE_SOCKET = "/tmp/assistant-inference.sock"
+
+# Per model (in the inference server, or in-process without one): worker
+# threads, the token bucket (requests/s and burst), queued requests per
+# priority before new ones are refused as busy, seconds a request may wait
+# to start, and how many requests (waiting at most batch_window seconds)
+# are run as one batch. Voice turns are "interactive", image and PDF
+# turns "batch"
+INFERENCE_LANES = {
+    "stt": {
+        "workers": 2, "rate": 4.0, "burst": 16,
+        "max_queue": {"interactive": 16, "batch": 4},
+        "queue_timeout": {"interactive": 10.0, "batch": 30.0},
+        "max_batch": 1, "batch_window": 0.0,
+    },
+    "vision": {
+        "workers": 1, "rate": 1.0, "burst": 8,
+        "max_queue": {"interactive": 8, "batch": 8},
+        "queue_timeout": {"interactive": 20.0, "batch": 45.0},
+        "max_batch": 4, "batch_window": 0.05,
+    },
+    "tts": {
+        "workers": 2, "rate": 8.0, "burst": 32,
+        "max_queue": {"interactive": 32, "batch": 8},
+        "queue_timeout": {"interactive": 10.0, "batch": 30.0},
+        "max_batch": 1, "batch_window": 0.0,
+    },
+}
+
+# =====================
+# TRACING CONFIG
+# =====================
+
+# Turn latencies are always served on /metrics; set an OTLP/HTTP traces URL
+# (e.g. http://localhost:4318/v1/traces) to also export them as OpenTelemetry spans
+OTLP_TRACES_ENDPOINT = os.environ.get("OTEL_EXPORTER_OTLP_TRACES_ENDPOINT", "")
+
 def get_config():
     return {
         "whisper_model": WHISPER_MODEL,
+        "whisper_cpu_threads": WHISPER_CPU_THREADS,
+        "model_cache_dir": MODEL_CACHE_DIR,
+        "offline_models": OFFLINE_MODELS,
+        "warm_up_models": WARM_UP_MODELS,
         "audio_sample_rate": AUDIO_SAMPLE_RATE,
         "llm_api_endpoint": LLM_API_ENDPOINT,
         "llm_model": LLM_MODEL,
@@ -45,6 +117,13 @@ def get_config():
         "tts_model": TTS_MODEL,
         "tts_voice": TTS_VOICE,
         "tts_format": TTS_FORMAT,
+        "tts_engine": TTS_ENGINE,
+        "piper_voice_model": PIPER_VOICE_MODEL,
+        "piper_threads": PIPER_THREADS,
         "websocket_host": WEBSOCKET_HOST,
-        "websocket_port": WEBSOCKET_PORT
+        "websocket_port": WEBSOCKET_PORT,
+        "inference_socket": INFERENCE_SOCKET,
+        "default_inference_socket": DEFAULT_INFERENCE_SOCKET,
+        "inference_lanes": INFERENCE_LANES,
+        "otlp_traces_endpoint": OTLP_TRACES_ENDPOINT
     }
\ No newline at end of file
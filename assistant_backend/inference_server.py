@@ -0,0 +1,245 @@
+"""
+Inference Server
+
+Hosts Whisper, SmolVLM and TTS (e.g. a Piper voice) in their own process, so web workers stay
+small and a model crash or a long generation never holds the GIL of the
+process that serves the WebSockets:
+
+    python inference_server.py --socket /tmp/assistant-inference.sock
+    INFERENCE_SOCKET=/tmp/assistant-inference.sock python serve.py --workers 4
+
+Requests arrive over a Unix socket (framing in services/inference.py).
+Large inputs are not in the frame: the header names a shared-memory
+segment owned by the web worker, which is read in place (see
+services/shared_buffers.py).
+Each model has a lane (services/admission.py): priority queues served
+by a few worker threads, behind a token bucket. Requests carry a
+"priority" header; interactive requests start before batch ones, and a
+request the lane cannot admit or start in time is answered as "busy"
+with a retry_after hint. The vision lane batches requests that arrive
+close together into one generate call. synthesize_stream answers with
+one "chunk" frame per sentence as it is synthesized, then the final reply.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from typing import Any, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np # type: ignore
+
+from config import get_config
+from services.admission import Busy, Lane
+from services.inference import read_frame, write_frame
+from services.shared_buffers import SegmentAttachments
+from services.model_registry import is_ready, model_states, warm_up
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Payloads are bytes, or memoryviews of shared memory
+Request = Tuple[Dict[str, Any], Any]
+Response = Tuple[Dict[str, Any], bytes]
+
+
+class InferenceServer:
+    """
+    Owns the models and the lanes, and answers requests from web workers.
+    """
+
+    def __init__(self, cfg: Dict[str, Any]):
+        """
+        Args:
+            cfg: Configuration from get_config()
+        """
+        from services.transcription import WhisperTranscriber
+        from services.tts import TTSClient
+        from services.vision import vision_service
+
+        lanes = cfg["inference_lanes"]
+        self.transcriber = WhisperTranscriber(
+            model_size=cfg["whisper_model"],
+            cpu_threads=cfg["whisper_cpu_threads"],
+            num_workers=lanes["stt"]["workers"],
+            sample_rate=cfg["audio_sample_rate"],
+            download_root=cfg["model_cache_dir"],
+            local_files_only=cfg["offline_models"],
+            lazy=True
+        )
+        vision_service.configure(cache_dir=cfg["model_cache_dir"], local_files_only=cfg["offline_models"])
+        self.vision = vision_service
+        self.tts = TTSClient(
+            api_endpoint=cfg["tts_api_endpoint"],
+            model=cfg["tts_model"],
+            voice=cfg["tts_voice"],
+            output_format=cfg["tts_format"],
+            engine=cfg["tts_engine"],
+            piper_model=cfg["piper_voice_model"],
+            piper_threads=cfg["piper_threads"]
+        )
+        self.segments = SegmentAttachments()
+        self.lane_config = lanes
+        self.lanes: Dict[str, Lane] = {}
+        self.ops = {
+            "transcribe": "stt",
+            "describe_image": "vision",
+            "synthesize": "tts",
+            "synthesize_stream": "tts",
+        }
+
+    # ---------- Batch handlers (run on lane threads) ----------
+
+    def _transcribe(self, batch: List[Request]) -> List[Response]:
+        responses = []
+        for _, payload in batch:
+            text, metadata = self.transcriber.transcribe(np.frombuffer(payload, dtype=np.uint8))
+            responses.append(({"text": text, "metadata": metadata}, b""))
+        return responses
+
+    def _describe(self, batch: List[Request]) -> List[Response]:
+        descriptions = self.vision.describe_images(
+            [payload for _, payload in batch],
+            [header.get("prompt") for header, _ in batch]
+        )
+        return [({"description": d}, b"") for d in descriptions]
+
+    def _synthesize(self, batch: List[Request]) -> List[Response]:
+        responses = []
+        for header, payload in batch:
+            timings: Dict[str, float] = {}
+            emit = header.get("emit")
+            if emit is None:
+                audio = self.tts.text_to_speech(str(payload, "utf-8"), timings=timings)
+                responses.append(({"timings": timings, "format": self.tts.output_format}, audio))
+                continue
+            for audio, audio_format in self.tts.stream_speech(str(payload, "utf-8"), timings=timings):
+                emit(audio, audio_format)
+            responses.append(({"timings": timings}, b""))
+        return responses
+
+    # ---------- Connections ----------
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Readiness, model states and lane counters.
+
+        Returns:
+            Dict for the "status" op
+        """
+        return {
+            "ready": is_ready(),
+            "models": model_states(),
+            "lanes": {name: lane.stats() for name, lane in self.lanes.items()},
+            "tts": self.tts.stats(),
+        }
+
+    def _emitter(self, request_id: Any, writer: asyncio.StreamWriter):
+        """Callable for a lane thread that sends one audio chunk frame of a stream."""
+        loop = asyncio.get_running_loop()
+
+        def emit(audio: bytes, audio_format: Dict[str, Any]):
+            loop.call_soon_threadsafe(self._write_chunk, writer, request_id, audio, audio_format)
+
+        return emit
+
+    @staticmethod
+    def _write_chunk(writer: asyncio.StreamWriter, request_id: Any, audio: bytes, audio_format: Dict[str, Any]):
+        # Runs on the event loop; a whole frame is written before any other
+        if not writer.is_closing():
+            write_frame(writer, {"id": request_id, "chunk": True, "audio_format": audio_format}, audio)
+
+    async def _dispatch(self, header: Dict[str, Any], payload: bytes, writer: asyncio.StreamWriter, lock: asyncio.Lock):
+        reply: Dict[str, Any] = {"id": header.get("id")}
+        body = b""
+        op = header.get("op")
+        shared = None
+        try:
+            if op == "status":
+                reply.update(self.status())
+            elif op in self.ops:
+                if "shm" in header:
+                    payload = shared = self.segments.view(header["shm"], header["shm_size"])
+                if op == "synthesize_stream":
+                    # Chunks go out as they are synthesized, ahead of the final reply
+                    header["emit"] = self._emitter(header.get("id"), writer)
+                result, body = await self.lanes[self.ops[op]].submit(
+                    (header, payload),
+                    priority=header.get("priority", "interactive"),
+                    timeout=float(header.get("timeout", 120.0))
+                )
+                reply.update(result)
+            else:
+                reply.update(error="unknown_op", message=f"Unknown operation {op}")
+        except Busy as e:
+            reply.update(error="busy", message=str(e), lane=e.lane, reason=e.reason, retry_after=e.retry_after)
+        except Exception as e:
+            reply.update(error="failed", message=str(e))
+        finally:
+            if shared is not None:
+                payload = None
+                self.segments.release(header["shm"], shared)
+
+        async with lock:
+            if writer.is_closing():
+                return
+            write_frame(writer, reply, body)
+            await writer.drain()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve one web-worker connection until it closes."""
+        lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                header, payload = await read_frame(reader)
+                task = asyncio.create_task(self._dispatch(header, payload, writer, lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            logger.error(f"Dropping inference connection: {e}")
+        finally:
+            writer.close()
+
+    async def serve(self, socket_path: str, warm: List[str]):
+        """
+        Create the lanes, warm the models up and listen on socket_path.
+
+        Args:
+            socket_path: Unix socket to listen on
+            warm: Models to load in the background right away
+        """
+        handlers = {"stt": self._transcribe, "vision": self._describe, "tts": self._synthesize}
+        for name, handler in handlers.items():
+            self.lanes[name] = Lane(name, handler, **self.lane_config[name])
+
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = await asyncio.start_unix_server(self.handle, path=socket_path)
+        warm_up(warm)
+        logger.info(f"Inference server listening on {socket_path}")
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    cfg = get_config()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--socket", default=cfg["inference_socket"] or cfg["default_inference_socket"])
+    args = parser.parse_args()
+
+    server = InferenceServer(cfg)
+    try:
+        asyncio.run(server.serve(args.socket, cfg["warm_up_models"]))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,13 @@
 import uvicorn
 from fastapi import FastAPI, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 from config import get_config
-from services.transcription import WhisperTranscriber
 from services.llm import LLMClient
-from services.tts import TTSClient
-from services.vision import vision_service
+from services.inference import LocalInference, RemoteInference
+from services.model_registry import warm_up
+from services.tracing import tracer
 from routes.websocket import websocket_endpoint
 
 cfg = get_config()
@@ -23,31 +24,89 @@ app.add_middleware(
 
 print("Initializing services...")
 
-transcriber = WhisperTranscriber(
-    model_size=cfg["whisper_model"],
-    sample_rate=cfg["audio_sample_rate"]
-)
-
 llm = LLMClient(
     api_endpoint=cfg["llm_api_endpoint"],
     model=cfg["llm_model"]
 )
 
-tts = TTSClient(
-    api_endpoint=cfg["tts_api_endpoint"],
-    model=cfg["tts_model"],
-    voice=cfg["tts_voice"],
-    output_format=cfg["tts_format"]
-)
+if cfg["inference_socket"]:
+    # STT, vision and TTS run in the inference server; torch and the models
+    # are never imported here
+    inference = RemoteInference(cfg["inference_socket"])
+else:
+    from services.transcription import WhisperTranscriber
+    from services.tts import TTSClient
+    from services.vision import vision_service
+
+    # Whisper and SmolVLM load lazily (see the startup warm-up below), so the
+    # server accepts connections before the models are in memory
+    transcriber = WhisperTranscriber(
+        model_size=cfg["whisper_model"],
+        cpu_threads=cfg["whisper_cpu_threads"],
+        num_workers=cfg["inference_lanes"]["stt"]["workers"],
+        sample_rate=cfg["audio_sample_rate"],
+        download_root=cfg["model_cache_dir"],
+        local_files_only=cfg["offline_models"],
+        lazy=True
+    )
 
-vision_service.initialize()
+    tts = TTSClient(
+        api_endpoint=cfg["tts_api_endpoint"],
+        model=cfg["tts_model"],
+        voice=cfg["tts_voice"],
+        output_format=cfg["tts_format"],
+        engine=cfg["tts_engine"],
+        piper_model=cfg["piper_voice_model"],
+        piper_threads=cfg["piper_threads"]
+    )
+
+    vision_service.configure(
+        cache_dir=cfg["model_cache_dir"],
+        local_files_only=cfg["offline_models"]
+    )
+
+    inference = LocalInference(transcriber, vision_service, tts, cfg["inference_lanes"])
 
 print("Assistant ready")
 
 
+@app.on_event("startup")
+def start_model_warm_up():
+    warm_up(cfg["warm_up_models"])
+    tracer.configure_otlp(cfg["otlp_traces_endpoint"])
+
+
+@app.get("/ready")
+async def ready():
+    status = await inference.status()
+    return JSONResponse(
+        status_code=200 if status["ready"] else 503,
+        content=status
+    )
+
+
+@app.get("/metrics")
+def metrics():
+    """Turn and stage latency histograms in the Prometheus text format."""
+    return PlainTextResponse(tracer.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/metrics/sessions")
+def session_metrics():
+    """Per-session turn counts and mean stage latencies."""
+    return tracer.session_summary()
+
+
+@app.get("/metrics/admission")
+async def admission_metrics():
+    """Per-lane queued requests by priority, rejections by reason and service times."""
+    status = await inference.status()
+    return status.get("lanes", {})
+
+
 @app.websocket("/ws")
 async def ws(websocket: WebSocket):
-    await websocket_endpoint(websocket, transcriber, llm, tts)
+    await websocket_endpoint(websocket, inference, llm)
 
 
 if __name__ == "__main__":
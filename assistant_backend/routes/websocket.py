@@ -1,13 +1,17 @@
 import json
+import time
+import uuid
 import base64
 import asyncio
 import logging
 from fastapi import WebSocket, WebSocketDisconnect
-import numpy as np
 from io import BytesIO
 
-from services.vision import vision_service
+from services.admission import Busy
+from services.audio_format import pcm_duration
+from services.audio_output import AudioOutput
 from services.pdf_service import extract_text_from_pdf
+from services.tracing import tracer
 
 
 # System prompt for the visual assistant
@@ -20,43 +24,170 @@ Your goal is to be their eyes and a helpful companion.
 5. If the user seems lost, gently guide them on how to talk to you.
 """
 
-async def send_text_and_tts(websocket: WebSocket, text: str, tts):
-    """Helper to send transcription/LLM text and then stream TTS audio."""
-    # Send text response
-    await websocket.send_json({
-        "type": "llm_response",
-        "text": text
-    })
+# Message types that start a traced turn
+TRACED_MESSAGES = ("greeting", "audio", "vision_image", "pdf_upload")
+
+# Admission priority of each turn's model calls: voice turns go ahead of
+# image and document turns when the models are overloaded
+TURN_PRIORITY = {"greeting": "interactive", "audio": "interactive", "vision_image": "batch", "pdf_upload": "batch"}
+
+
+def busy_status(e: Busy) -> dict:
+    """Status for a turn shed by admission control; the client may retry after retry_after seconds."""
+    return {
+        "type": "status",
+        # The UI goes back to listening on "Listening"
+        "message": f"I'm busy right now, please try again in {max(1, round(e.retry_after))} seconds. Listening...",
+        "busy": True,
+        "retry_after": e.retry_after
+    }
+
+
+# The LLM client keeps a single conversation history, so its calls run one
+# at a time; they run on a thread so other sessions keep being served
+llm_lock = asyncio.Lock()
+
+
+async def get_llm_response(turn, llm, *args, **kwargs):
+    """Call the LLM off the event loop, recording its latency (and time to first token) on the turn."""
+    start = time.perf_counter()
+    with turn.span("llm"):
+        async with llm_lock:
+            result = await asyncio.to_thread(llm.get_response, *args, **kwargs)
+    if result.get("first_token_time") is not None:
+        turn.mark("llm_first_token", result["first_token_time"], start=start)
+    return result
+
 
-    # Start TTS streaming
-    await websocket.send_json({"type": "tts_start"})
+async def read_messages(websocket: WebSocket, output: AudioOutput, inbox: asyncio.Queue):
+    """
+    Receive client messages while a turn is being handled.
 
-    audio_data = tts.text_to_speech(text)
+    Audio settings and playback buffer reports are applied as they arrive,
+    so they can steer the reply that is being sent; everything else is
+    queued for the main loop. None is queued when the client disconnects.
+    """
+    try:
+        while True:
+            data = await websocket.receive_text()
+            received_at = time.perf_counter()
+            try:
+                message = json.loads(data)
+            except json.JSONDecodeError:
+                print("Received malformed JSON")
+                continue
+            if not isinstance(message, dict):
+                print("Received a message that is not a JSON object")
+                continue
 
-    # Stream in chunks
-    chunk_size = 4096
-    for i in range(0, len(audio_data), chunk_size):
-        chunk = audio_data[i:i + chunk_size]
+            msg_type = message.get("type")
+            if msg_type == "audio_config":
+                if isinstance(message.get("codecs"), list):
+                    output.configure(message["codecs"])
+            elif msg_type == "playback_buffer":
+                if isinstance(message.get("buffered_ms"), (int, float)):
+                    output.report_buffer(message["buffered_ms"])
+            else:
+                inbox.put_nowait((message, received_at))
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"WebSocket receive error: {e}")
+    finally:
+        inbox.put_nowait(None)
+
+
+async def send_audio(websocket: WebSocket, output: AudioOutput, turn, audio_data: bytes, audio_format: dict):
+    """Send one piece of synthesized speech as tts_chunks sized and paced by the session's AudioOutput."""
+    for pcm, sample_rate in output.chunks(audio_data, audio_format):
+        delay = output.pace_delay()
+        if delay > 0:
+            # The client has enough queued; hold the next chunk back
+            with turn.span("pace"):
+                await asyncio.sleep(delay)
+
+        with turn.span("encode"):
+            if sample_rate is None:
+                payload, duration_ms = pcm, 0.0
+            else:
+                # Opus encoding is CPU work; keep it off the event loop
+                payload = output.encode(pcm, sample_rate) if output.codec == "wav" else await asyncio.to_thread(output.encode, pcm, sample_rate)
+                duration_ms = pcm_duration(pcm, sample_rate) * 1000
+
+        with turn.span("send"):
+            send_start = time.perf_counter()
+            await websocket.send_json({
+                "type": "tts_chunk",
+                "audio_chunk": base64.b64encode(payload).decode(),
+                "format": output.codec if sample_rate is not None else audio_format["format"]
+            })
+            output.sent(len(payload), duration_ms, time.perf_counter() - send_start)
+
+
+async def send_text_and_tts(websocket: WebSocket, text: str, inference, turn, output: AudioOutput, priority: str = "interactive"):
+    """Helper to send transcription/LLM text and then stream TTS audio, timing each stage on the turn."""
+    # Send text response
+    with turn.span("send"):
         await websocket.send_json({
-            "type": "tts_chunk",
-            "audio_chunk": base64.b64encode(chunk).decode()
+            "type": "llm_response",
+            "text": text
         })
 
-    await websocket.send_json({"type": "tts_end"})
+        # Start TTS streaming
+        output.begin_reply()
+        await websocket.send_json({"type": "tts_start"})
 
+    # Speech is sent piece by piece as it is synthesized (a sentence at a time
+    # with the local Piper voice); "tts" times synthesis, "send" the sends
+    timings = {}
+    start = time.perf_counter()
+    pieces = inference.synthesize_stream(text, timings=timings, priority=priority)
+    try:
+        while True:
+            with turn.span("tts"):
+                try:
+                    audio_data, audio_format = await pieces.__anext__()
+                except StopAsyncIteration:
+                    break
+            await send_audio(websocket, output, turn, audio_data, audio_format)
+    except Busy as e:
+        # Report the shed turn, then close the audio stream the client was told about
+        await websocket.send_json(busy_status(e))
+        await websocket.send_json({"type": "tts_end"})
+        return
+    if "first_byte" in timings:
+        turn.mark("tts_first_byte", timings["first_byte"], start=start)
+    print(f"TTS delivery: {output.stats()}")
+
+    with turn.span("send"):
+        await websocket.send_json({"type": "tts_end"})
 
-async def websocket_endpoint(websocket: WebSocket, transcriber, llm, tts):
+
+async def websocket_endpoint(websocket: WebSocket, inference, llm):
     await websocket.accept()
+    session_id = uuid.uuid4().hex
     print("Assistant connected")
     
     # Send initial status
     await websocket.send_json({"type": "status", "message": "Connected to Vocalis"})
 
+    # Messages are read by a separate task so playback buffer reports
+    # reach the AudioOutput while a reply is being sent
+    output = AudioOutput()
+    inbox: asyncio.Queue = asyncio.Queue()
+    reader = asyncio.create_task(read_messages(websocket, output, inbox))
+
+    tracer.session_started(session_id)
     try:
         while True:
+            turn = None
+            priority = "interactive"
+            msg_type = None
             try:
-                data = await websocket.receive_text()
-                message = json.loads(data)
+                item = await inbox.get()
+                if item is None:
+                    raise WebSocketDisconnect()
+                message, received_at = item
                 msg_type = message.get("type")
 
                 if not msg_type:
@@ -68,14 +199,20 @@ async def websocket_endpoint(websocket: WebSocket, transcriber, llm, tts):
                 if msg_type == "ping":
                     continue
 
+                # Only known message types get a turn, so clients cannot create metric series
+                if msg_type in TRACED_MESSAGES:
+                    turn = tracer.start_turn(session_id, msg_type, received_at)
+                    turn.record("receive", received_at, time.perf_counter())
+                    priority = TURN_PRIORITY[msg_type]
+
                 # =====================
                 # GREETING (Initial Call)
                 # =====================
-                elif msg_type == "greeting":
+                if msg_type == "greeting":
                     greeting_text = "Hello! I'm Vocalis, your AI assistant. I'm here to help you see and understand the world around you. What can I do for you?"
                     # Initialize LLM
                     llm.clear_history()
-                    await send_text_and_tts(websocket, greeting_text, tts)
+                    await send_text_and_tts(websocket, greeting_text, inference, turn, output, priority)
 
                 # =====================
                 # AUDIO INPUT
@@ -88,11 +225,12 @@ async def websocket_endpoint(websocket: WebSocket, transcriber, llm, tts):
                     # Notify processing
                     await websocket.send_json({"type": "status", "message": "Transcribing..."})
 
-                    audio_bytes = base64.b64decode(audio_b64)
-                    audio_array = np.frombuffer(audio_bytes, dtype=np.uint8)
+                    with turn.span("decode"):
+                        audio = inference.decode(audio_b64)
 
                     # Transcribe
-                    text, _ = transcriber.transcribe(audio_array)
+                    with turn.span("stt"):
+                        text, _ = await inference.transcribe(audio, priority=priority)
                     
                     if text.strip():
                         print(f"User said: {text}")
@@ -104,11 +242,11 @@ async def websocket_endpoint(websocket: WebSocket, transcriber, llm, tts):
 
                         # Get LLM response with system context
                         await websocket.send_json({"type": "status", "message": "Thinking..."})
-                        llm_result = llm.get_response(text, system_prompt=VISUAL_ASSISTANT_PROMPT)
+                        llm_result = await get_llm_response(turn, llm, text, system_prompt=VISUAL_ASSISTANT_PROMPT)
                         response = llm_result["text"]
                         
                         # Send response and TTS
-                        await send_text_and_tts(websocket, response, tts)
+                        await send_text_and_tts(websocket, response, inference, turn, output, priority)
                     else:
                         # No speech detected
                         await websocket.send_json({"type": "status", "message": "Listening..."})
@@ -120,21 +258,25 @@ async def websocket_endpoint(websocket: WebSocket, transcriber, llm, tts):
                     image_data = message.get("image")
                     if image_data:
                         await websocket.send_json({"type": "status", "message": "Analyzing image..."})
-                        description = vision_service.process_image(image_data)
+                        with turn.span("decode"):
+                            image = inference.decode(image_data)
+                        with turn.span("vision"):
+                            description = await inference.describe_image(image, priority=priority)
                         
                         # Add vision context to LLM
                         llm.add_to_history("user", f"[System: The user shared an image. Description: {description}]")
                         
                         # Get assistant response based on the image
                         await websocket.send_json({"type": "status", "message": "Describing..."})
-                        response = llm.get_response("Describe this image to me.", system_prompt=VISUAL_ASSISTANT_PROMPT)
-                        await send_text_and_tts(websocket, response["text"], tts)
+                        response = await get_llm_response(turn, llm, "Describe this image to me.", system_prompt=VISUAL_ASSISTANT_PROMPT)
+                        await send_text_and_tts(websocket, response["text"], inference, turn, output, priority)
 
                 elif msg_type == "pdf_upload":
                     pdf_data = message.get("pdf")
                     if pdf_data:
                         await websocket.send_json({"type": "status", "message": "Reading PDF..."})
-                        extracted_text = extract_text_from_pdf(pdf_data)
+                        with turn.span("pdf_extract"):
+                            extracted_text = await asyncio.to_thread(extract_text_from_pdf, pdf_data)
                         
                         if extracted_text.startswith("Error"):
                             await websocket.send_json({"type": "error", "message": extracted_text})
@@ -142,20 +284,29 @@ async def websocket_endpoint(websocket: WebSocket, transcriber, llm, tts):
                             # Use LLM to summarize
                             llm.add_to_history("user", f"[User uploaded a PDF. Content: {extracted_text[:3000]}...]")
                             await websocket.send_json({"type": "status", "message": "Summarizing PDF..."})
-                            response = llm.get_response("I have uploaded a PDF. Please read out a summary of its content in a natural way.", system_prompt=VISUAL_ASSISTANT_PROMPT)
-                            await send_text_and_tts(websocket, response["text"], tts)
+                            response = await get_llm_response(turn, llm, "I have uploaded a PDF. Please read out a summary of its content in a natural way.", system_prompt=VISUAL_ASSISTANT_PROMPT)
+                            await send_text_and_tts(websocket, response["text"], inference, turn, output, priority)
 
-            except json.JSONDecodeError:
-                print("Received malformed JSON")
+            except Busy as e:
+                print(f"Shedding {msg_type} turn: {e}")
+                await websocket.send_json(busy_status(e))
                 continue
+            except WebSocketDisconnect:
+                raise
             except Exception as e:
                 print(f"Error processing message: {e}")
                 import traceback
                 traceback.print_exc()
                 await websocket.send_json({"type": "error", "message": str(e)})
                 continue
+            finally:
+                if turn is not None:
+                    turn.finish()
 
     except WebSocketDisconnect:
         print("Assistant disconnected")
     except Exception as e:
         print(f"WebSocket fatal error: {e}")
+    finally:
+        reader.cancel()
+        tracer.session_ended(session_id)
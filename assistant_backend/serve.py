@@ -0,0 +1,217 @@
+"""
+Production Launcher
+
+Runs several assistant workers on one port, sharing model memory where
+that is safe:
+
+    python serve.py --workers 4
+
+The supervisor imports the app once, loads the SmolVLM weights (CPU only)
+and then forks the workers, so the weights are shared copy-on-write
+instead of being loaded once per worker. Whisper is not preloaded:
+CTranslate2 starts its thread pool when the model is built, and that pool
+does not survive a fork, so each worker loads its own (small) Whisper
+model during its startup warm-up, limited to its share of the CPUs.
+
+All workers accept from the same listening socket. A WebSocket session is
+a single connection and all of its state (history, tracing) lives in the
+worker that accepted it, so it stays on that worker for its lifetime.
+Each worker also listens on 127.0.0.1:<port + 1 + i>; /metrics is per
+worker, so scrape those ports. Dead workers are restarted.
+
+With INFERENCE_SOCKET set the workers load no models at all and call the
+inference server (inference_server.py) instead, so nothing is preloaded.
+"""
+
+import argparse
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import get_config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# A worker that exits sooner than this after starting is restarted with a delay
+MIN_UPTIME = 5.0
+RESTART_DELAY = 2.0
+
+
+def bind(host: str, port: int) -> socket.socket:
+    """
+    Create a listening socket that forked workers can share.
+
+    Args:
+        host: Interface to bind
+        port: Port to bind
+
+    Returns:
+        The listening socket
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def preload_models(threads: int) -> bool:
+    """
+    Import the app and load SmolVLM in the supervisor, before any fork.
+
+    Torch is kept single-threaded while loading so no OpenMP pool exists
+    at fork time, and the CUDA check goes through NVML so it does not
+    initialize CUDA (which cannot be used in a forked child).
+
+    Args:
+        threads: Torch threads each worker will use (only for the log line)
+
+    Returns:
+        bool: Whether the weights were preloaded
+    """
+    os.environ.setdefault("PYTORCH_NVML_BASED_CUDA_CHECK", "1")
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+    import torch # type: ignore
+    torch.set_num_threads(1)
+
+    import main  # noqa: F401  (builds the service objects once)
+    from services.vision import vision_service
+
+    if torch.cuda.is_available():
+        logger.info("CUDA available; SmolVLM will be loaded by each worker instead of preloaded")
+        return False
+
+    if not vision_service.initialize():
+        logger.warning("SmolVLM preload failed; workers will retry on first use")
+        return False
+
+    logger.info(f"SmolVLM preloaded for copy-on-write sharing ({threads} torch threads per worker)")
+    return True
+
+
+def run_worker(sockets: List[socket.socket], threads: int):
+    """
+    Body of a forked worker: size the thread pools and serve main:app.
+
+    Args:
+        sockets: The shared public socket and this worker's own port
+        threads: CPU threads this worker may use for inference
+    """
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    import uvicorn
+    import main
+
+    # Torch is only imported in local mode (by main, or by the preload)
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(threads)
+
+    # The transcriber (local mode only) was built before the fork; give
+    # this worker its share of the CPUs
+    if hasattr(main, "transcriber"):
+        main.transcriber.cpu_threads = threads
+
+    config = uvicorn.Config(main.app, log_level="info")
+    uvicorn.Server(config).run(sockets=sockets)
+
+
+class Supervisor:
+    """
+    Forks the workers and restarts any that exit until asked to stop.
+    """
+
+    def __init__(self, host: str, port: int, workers: int):
+        """
+        Args:
+            host: Public interface
+            port: Public port; worker i also listens on 127.0.0.1:port + 1 + i
+            workers: Number of worker processes
+        """
+        self.workers = workers
+        self.threads = max(1, (os.cpu_count() or 1) // workers)
+        self.public = bind(host, port)
+        self.private = [bind("127.0.0.1", port + 1 + i) for i in range(workers)]
+        self.children: Dict[int, int] = {}
+        self.started: Dict[int, float] = {}
+        self.stopping = False
+
+    def spawn(self, index: int):
+        """Fork worker number index."""
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker([self.public, self.private[index]], self.threads)
+            except BaseException as e:
+                if not isinstance(e, (KeyboardInterrupt, SystemExit)):
+                    logger.error(f"Worker {index} crashed: {e}")
+                    code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = index
+        self.started[index] = time.monotonic()
+
+    def stop(self, signum, frame):
+        """Signal handler: stop restarting and terminate the workers."""
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        """Start the workers and supervise them until they have all exited."""
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        for index in range(self.workers):
+            self.spawn(index)
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            index = self.children.pop(pid, None)
+            if index is None or self.stopping:
+                continue
+            logger.warning(f"Worker {index} exited (status {os.waitstatus_to_exitcode(status)}), restarting")
+            if time.monotonic() - self.started[index] < MIN_UPTIME:
+                time.sleep(RESTART_DELAY)
+            if not self.stopping:
+                self.spawn(index)
+
+
+def main():
+    cfg = get_config()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=cfg["websocket_host"])
+    parser.add_argument("--port", type=int, default=cfg["websocket_port"])
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 1) // 2))
+    parser.add_argument("--no-preload", action="store_true", help="let every worker load its own SmolVLM")
+    args = parser.parse_args()
+
+    supervisor = Supervisor(args.host, args.port, args.workers)
+    if cfg["inference_socket"]:
+        logger.info(f"Models are served by the inference server at {cfg['inference_socket']}")
+    elif not args.no_preload:
+        preload_models(supervisor.threads)
+    logger.info(f"Serving on {args.host}:{args.port} with {args.workers} workers "
+                f"({supervisor.threads} threads each)")
+    supervisor.run()
+
+
+if __name__ == "__main__":
+    main()
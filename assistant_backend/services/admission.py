@@ -0,0 +1,279 @@
+"""
+Admission Control
+
+Every model call (Whisper, SmolVLM, TTS) goes through a lane: a queue
+served by a fixed number of worker threads. The same lanes run in the
+inference server and, without one, inside the web worker.
+
+Overload is refused early instead of slowing every session down:
+
+- Each lane has a token bucket that caps its sustained request rate.
+  Batch requests also need the bucket at least half full, so a burst of
+  batch work cannot use the tokens interactive turns rely on.
+- Requests are queued by priority class: interactive (voice turns) are
+  always started before batch (image and PDF turns), and each class has
+  its own queue limit.
+- A request still queued after its class's queue deadline is dropped
+  before it reaches the model.
+
+A refused request raises Busy with a retry_after hint, which the
+WebSocket handler turns into a "busy" status for the client.
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Highest priority first
+PRIORITIES = ("interactive", "batch")
+
+# Service-time average used for retry hints, before anything was measured
+INITIAL_SERVICE_TIME = 1.0
+SERVICE_TIME_SMOOTHING = 0.2
+MIN_RETRY_AFTER = 1.0
+
+
+class Busy(Exception):
+    """
+    A request was not admitted.
+
+    Attributes:
+        lane: Lane that refused it
+        reason: "rate", "queue" or "deadline"
+        retry_after: Suggested seconds to wait before retrying
+    """
+
+    def __init__(self, lane: str, reason: str, retry_after: float):
+        super().__init__(f"{lane} is busy ({reason}), retry in {retry_after:.1f}s")
+        self.lane = lane
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Refills at rate tokens per second, up to burst tokens.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        """
+        Args:
+            rate: Tokens added per second
+            burst: Bucket capacity
+        """
+        self.rate = rate
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, reserve: float = 0.0) -> bool:
+        """
+        Take one token, leaving at least reserve tokens in the bucket.
+
+        Returns:
+            bool: Whether a token was taken
+        """
+        self._refill()
+        if self.tokens - 1 < reserve:
+            return False
+        self.tokens -= 1
+        return True
+
+    def wait_time(self, reserve: float = 0.0) -> float:
+        """
+        Seconds until take(reserve) would succeed.
+
+        Returns:
+            float: Wait in seconds
+        """
+        self._refill()
+        return max(0.0, (1 + reserve - self.tokens) / self.rate)
+
+
+class Lane:
+    """
+    Priority queues of requests for one model, served by worker threads.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[List[Any]], List[Any]],
+        workers: int = 1,
+        max_queue: Dict[str, int] = None,
+        queue_timeout: Dict[str, float] = None,
+        rate: float = 10.0,
+        burst: float = 20.0,
+        max_batch: int = 1,
+        batch_window: float = 0.0
+    ):
+        """
+        Args:
+            name: Lane name used in errors and stats
+            handler: Blocking function that runs a batch of requests and
+                returns one response per request
+            workers: Batches run in parallel
+            max_queue: Waiting requests per priority before new ones are refused
+            queue_timeout: Seconds a request of each priority may wait to start
+            rate: Sustained requests per second admitted
+            burst: Requests admitted at once after an idle period
+            max_batch: Most requests run as one batch
+            batch_window: Seconds to wait for a batch to fill up
+        """
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.max_queue = max_queue or {"interactive": 16, "batch": 4}
+        self.queue_timeout = queue_timeout or {"interactive": 10.0, "batch": 30.0}
+        self.bucket = TokenBucket(rate, burst)
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"lane-{name}")
+        self.queue: "asyncio.PriorityQueue" = asyncio.PriorityQueue()
+        self.queued = {p: 0 for p in PRIORITIES}
+        self.service_time = INITIAL_SERVICE_TIME
+        self.running = 0
+        self.completed = 0
+        self.batches = 0
+        self.rejected = {"rate": 0, "queue": 0, "deadline": 0}
+        self._seq = itertools.count()
+        self._started = False
+
+    def start(self):
+        """Start the worker tasks; call from inside the event loop."""
+        if self._started:
+            return
+        self._started = True
+        for _ in range(self.workers):
+            asyncio.create_task(self._work())
+
+    def retry_after(self, priority: str) -> float:
+        """
+        Estimated seconds until a request of this priority would start.
+
+        Args:
+            priority: Priority class of the refused request
+
+        Returns:
+            float: Suggested retry delay
+        """
+        ahead = sum(self.queued[p] for p in PRIORITIES[:PRIORITIES.index(priority) + 1])
+        return max(MIN_RETRY_AFTER, round((ahead / self.workers + 1) * self.service_time, 1))
+
+    def _reject(self, reason: str, retry_after: float) -> Busy:
+        self.rejected[reason] += 1
+        return Busy(self.name, reason, retry_after)
+
+    async def submit(self, request: Any, priority: str = "interactive", timeout: float = None) -> Any:
+        """
+        Queue a request and wait for its response.
+
+        Args:
+            request: Passed to the handler as one item of a batch
+            priority: "interactive" or "batch"
+            timeout: Caller's own deadline in seconds; the queue deadline
+                is the earlier of this and the priority's queue_timeout
+
+        Returns:
+            The handler's response
+
+        Raises:
+            Busy: The request was not admitted, or not started in time
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority {priority}")
+        self.start()
+
+        rank = PRIORITIES.index(priority)
+        reserve = 0.0 if rank == 0 else self.bucket.burst / 2
+        if not self.bucket.take(reserve):
+            raise self._reject("rate", max(MIN_RETRY_AFTER, round(self.bucket.wait_time(reserve), 1)))
+        if self.queued[priority] >= self.max_queue[priority]:
+            raise self._reject("queue", self.retry_after(priority))
+
+        loop = asyncio.get_running_loop()
+        wait = self.queue_timeout[priority] if timeout is None else min(timeout, self.queue_timeout[priority])
+        future = loop.create_future()
+        self.queued[priority] += 1
+        self.queue.put_nowait((rank, next(self._seq), priority, request, loop.time() + wait, future))
+        return await future
+
+    async def _next_batch(self) -> list:
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        end = loop.time() + self.batch_window
+        while len(batch) < self.max_batch:
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            remaining = end - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _work(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = []
+            for _, _, priority, request, deadline, future in await self._next_batch():
+                self.queued[priority] -= 1
+                if future.done():
+                    continue
+                if loop.time() > deadline:
+                    future.set_exception(self._reject("deadline", self.retry_after(priority)))
+                    continue
+                batch.append((request, future))
+            if not batch:
+                continue
+
+            self.running += 1
+            start = time.perf_counter()
+            try:
+                responses = await loop.run_in_executor(self.executor, self.handler, [r for r, _ in batch])
+                for (_, future), response in zip(batch, responses):
+                    if not future.done():
+                        future.set_result(response)
+            except Exception as e:
+                logger.error(f"{self.name} batch failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            finally:
+                self.running -= 1
+                elapsed = time.perf_counter() - start
+                self.service_time += SERVICE_TIME_SMOOTHING * (elapsed - self.service_time)
+                self.completed += len(batch)
+                self.batches += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Queue, admission and throughput counters.
+
+        Returns:
+            Dict of the lane's current counters
+        """
+        return {
+            "queued": dict(self.queued),
+            "running": self.running,
+            "completed": self.completed,
+            "rejected": dict(self.rejected),
+            "tokens": round(self.bucket.tokens, 1),
+            "mean_batch": round(self.completed / self.batches, 2) if self.batches else None,
+            "service_time": round(self.service_time, 3),
+        }
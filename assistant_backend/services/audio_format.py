@@ -0,0 +1,49 @@
+"""
+Audio Formats
+
+Helpers for the raw PCM produced by the local TTS engine. The browser
+decodes every tts_chunk on its own (decodeAudioData), so PCM is wrapped
+in a WAV container before it is sent.
+"""
+
+import io
+import wave
+
+# 16-bit signed little-endian samples
+PCM_SAMPLE_WIDTH = 2
+
+
+def pcm_duration(pcm: bytes, sample_rate: int, channels: int = 1) -> float:
+    """
+    Playback length of raw 16-bit PCM.
+
+    Args:
+        pcm: Raw samples
+        sample_rate: Samples per second
+        channels: Interleaved channels
+
+    Returns:
+        float: Duration in seconds
+    """
+    return len(pcm) / (PCM_SAMPLE_WIDTH * channels * sample_rate)
+
+
+def pcm_to_wav(pcm: bytes, sample_rate: int, channels: int = 1) -> bytes:
+    """
+    Wrap raw 16-bit PCM in a WAV container.
+
+    Args:
+        pcm: Raw samples
+        sample_rate: Samples per second
+        channels: Interleaved channels
+
+    Returns:
+        bytes: A complete WAV file
+    """
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(PCM_SAMPLE_WIDTH)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
@@ -0,0 +1,283 @@
+"""
+Audio Output
+
+Decides how synthesized speech is delivered to one client: the codec,
+how much audio goes into each tts_chunk, and when to send it.
+
+- Codec: the browser decodes every chunk on its own, so every chunk is a
+  complete file. Clients that announce Opus support (an "audio_config"
+  message) get WebM or Ogg Opus at OPUS_BITRATE, which is about a tenth of
+  the size of 16-bit PCM; everyone else gets WAV. Opus needs PyAV with
+  libopus; without it WAV is used.
+- Chunk duration: the first chunk is short so playback starts quickly.
+  After that a chunk is half of what the client has buffered, within the
+  codec's limits, and at least SLOW_LINK_CHUNK_MS when sends are slow.
+  Bigger chunks mean fewer messages and less per-file overhead. Smaller
+  chunks arrive sooner when the buffer is low.
+- Pacing: a chunk is held back while the client has more than
+  TARGET_BUFFER_MS queued, so a fast synthesizer does not dump a whole
+  reply onto the socket (and the event loop) at once.
+
+The client's buffer is estimated from what was sent and how long playback
+has been running. When the client sends "playback_buffer" reports, the
+estimate starts from the latest report instead.
+"""
+
+import io
+import logging
+import time
+import wave
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np # type: ignore
+
+try:
+    import av # type: ignore
+except ImportError:
+    av = None
+
+from services.audio_format import PCM_SAMPLE_WIDTH, pcm_to_wav
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Preferred first; "wav" is always available
+CODECS = ("webm_opus", "ogg_opus", "wav")
+OPUS_CONTAINERS = {"webm_opus": "webm", "ogg_opus": "ogg"}
+OPUS_SAMPLE_RATE = 48000
+OPUS_BITRATE = 24000
+
+# Chunk duration limits in ms; every Opus chunk carries its own container
+# headers and encoder warm-up, so Opus chunks are longer
+CHUNK_MS = {"wav": (200, 1000), "opus": (400, 2000)}
+TARGET_BUFFER_MS = 1500
+# Audio delivered at less than this multiple of real time is a slow link
+SLOW_LINK_SPEED = 4.0
+SLOW_LINK_CHUNK_MS = 800
+SPEED_SMOOTHING = 0.3
+# Formats that arrive as whole files and cannot be re-chunked are sliced
+PASSTHROUGH_CHUNK_BYTES = 4096
+
+_opus_available: Optional[bool] = None
+
+
+def opus_available() -> bool:
+    """Whether PyAV can encode Opus here (checked once)."""
+    global _opus_available
+    if _opus_available is None:
+        try:
+            _opus_available = av is not None and av.codec.Codec("libopus", "w") is not None
+        except Exception:
+            _opus_available = False
+    return _opus_available
+
+
+def encode_opus(pcm: bytes, sample_rate: int, container: str) -> bytes:
+    """
+    Encode 16-bit mono PCM as a complete Opus file.
+
+    Args:
+        pcm: Raw samples
+        sample_rate: Their sample rate (resampled to 48 kHz for Opus)
+        container: "webm" or "ogg"
+
+    Returns:
+        bytes: The encoded file
+    """
+    buffer = io.BytesIO()
+    with av.open(buffer, mode="w", format=container) as output:
+        stream = output.add_stream("libopus", rate=OPUS_SAMPLE_RATE)
+        stream.codec_context.layout = "mono"
+        stream.codec_context.bit_rate = OPUS_BITRATE
+
+        frame = av.AudioFrame.from_ndarray(np.frombuffer(pcm, dtype=np.int16).reshape(1, -1), format="s16", layout="mono")
+        frame.sample_rate = sample_rate
+        # PyAV resamples and splits the frame into Opus-sized frames
+        for packet in stream.encode(frame):
+            output.mux(packet)
+        for packet in stream.encode(None):
+            output.mux(packet)
+    return buffer.getvalue()
+
+
+def read_wav(data: bytes) -> Optional[Tuple[bytes, int]]:
+    """
+    Raw samples of a 16-bit mono WAV file.
+
+    Returns:
+        Tuple of the PCM and its sample rate, or None for anything else
+    """
+    try:
+        with wave.open(io.BytesIO(data), "rb") as wav:
+            if wav.getsampwidth() != PCM_SAMPLE_WIDTH or wav.getnchannels() != 1:
+                return None
+            return wav.readframes(wav.getnframes()), wav.getframerate()
+    except (wave.Error, EOFError):
+        return None
+
+
+class AudioOutput:
+    """
+    Delivery state of one WebSocket session.
+    """
+
+    def __init__(self):
+        self.codec = "wav"
+        # Audio ms delivered per ms spent sending
+        self.speed: Optional[float] = None
+        self.reported_ms: Optional[float] = None
+        self.reported_at: Optional[float] = None
+        self.sent_at_report = 0.0
+        self.chunks_sent = 0
+        self.bytes_sent = 0
+        self.started_at: Optional[float] = None
+        self.sent_ms = 0.0
+
+    def configure(self, codecs: List[str]):
+        """
+        Pick the codec from the ones the client can decode.
+
+        Args:
+            codecs: Codec names from the client's audio_config message
+        """
+        for codec in CODECS:
+            if codec in codecs and (codec == "wav" or opus_available()):
+                self.codec = codec
+                break
+        logger.info(f"Sending TTS audio as {self.codec}")
+
+    def report_buffer(self, buffered_ms: float):
+        """
+        Record a client report of how much audio it has queued.
+
+        Args:
+            buffered_ms: Scheduled but not yet played audio, in ms
+        """
+        self.reported_ms = float(buffered_ms)
+        self.reported_at = time.monotonic()
+        self.sent_at_report = self.sent_ms
+
+    def begin_reply(self):
+        """Reset the per-reply playback clock before a new tts_start."""
+        self.started_at = None
+        self.sent_ms = 0.0
+        self.reported_at = None
+
+    def buffered_ms(self) -> float:
+        """
+        Estimated audio queued at the client right now.
+
+        Returns:
+            float: Milliseconds of unplayed audio
+        """
+        if self.started_at is None:
+            return 0.0
+        now = time.monotonic()
+        if self.reported_at is not None:
+            estimate = self.reported_ms - (now - self.reported_at) * 1000 + (self.sent_ms - self.sent_at_report)
+        else:
+            # Playback is assumed to start with the first send, which
+            # underestimates the buffer, so pacing errs towards sending early
+            estimate = self.sent_ms - (now - self.started_at) * 1000
+        return max(0.0, estimate)
+
+    def pace_delay(self) -> float:
+        """
+        Seconds to wait before the next chunk so the client's buffer stays
+        near TARGET_BUFFER_MS.
+        """
+        return max(0.0, self.buffered_ms() - TARGET_BUFFER_MS) / 1000
+
+    def chunk_ms(self) -> float:
+        """
+        Duration of the next chunk.
+
+        Returns:
+            float: Milliseconds of audio
+        """
+        low, high = CHUNK_MS["wav" if self.codec == "wav" else "opus"]
+        if self.started_at is None:
+            return low
+        target = self.buffered_ms() / 2
+        if self.speed is not None and self.speed < SLOW_LINK_SPEED:
+            target = max(target, SLOW_LINK_CHUNK_MS)
+        return min(high, max(low, target))
+
+    def chunks(self, audio: bytes, audio_format: Dict[str, Any]) -> Iterator[Tuple[bytes, Optional[int]]]:
+        """
+        Split synthesized audio into chunks, sizing each one when it is due.
+
+        Args:
+            audio: Audio from the TTS backend
+            audio_format: Its format (see TTSClient.stream_speech)
+
+        Yields:
+            Tuples of raw PCM and its sample rate, or of passthrough bytes
+            and None for formats that cannot be decoded here
+        """
+        if audio_format["format"] == "pcm":
+            decoded = audio, audio_format["sample_rate"]
+        else:
+            decoded = read_wav(audio) if audio_format["format"] == "wav" else None
+        if decoded is None:
+            for i in range(0, len(audio), PASSTHROUGH_CHUNK_BYTES):
+                yield audio[i:i + PASSTHROUGH_CHUNK_BYTES], None
+            return
+
+        pcm, sample_rate = decoded
+
+        bytes_per_ms = sample_rate * PCM_SAMPLE_WIDTH / 1000
+        min_size = CHUNK_MS["wav" if self.codec == "wav" else "opus"][0] * bytes_per_ms
+        offset = 0
+        while offset < len(pcm):
+            size = int(self.chunk_ms() * bytes_per_ms) // PCM_SAMPLE_WIDTH * PCM_SAMPLE_WIDTH
+            if len(pcm) - offset - size < min_size:
+                # A short remainder rides along rather than going out as a sliver
+                size = len(pcm) - offset
+            yield pcm[offset:offset + size], sample_rate
+            offset += size
+
+    def encode(self, pcm: bytes, sample_rate: int) -> bytes:
+        """
+        Encode one chunk in the session's codec.
+
+        Returns:
+            bytes: A complete, independently decodable file
+        """
+        if self.codec == "wav":
+            return pcm_to_wav(pcm, sample_rate)
+        return encode_opus(pcm, sample_rate, OPUS_CONTAINERS[self.codec])
+
+    def sent(self, size: int, duration_ms: float, seconds: float):
+        """
+        Record a sent chunk.
+
+        Args:
+            size: Bytes sent
+            duration_ms: Audio it carried (0 for passthrough chunks)
+            seconds: Time the send took
+        """
+        if self.started_at is None:
+            self.started_at = time.monotonic()
+        self.sent_ms += duration_ms
+        self.chunks_sent += 1
+        self.bytes_sent += size
+        if duration_ms:
+            speed = duration_ms / max(seconds * 1000, 1.0)
+            self.speed = speed if self.speed is None else self.speed + SPEED_SMOOTHING * (speed - self.speed)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Codec and delivery counters.
+
+        Returns:
+            Dict for logs and debugging
+        """
+        return {
+            "codec": self.codec,
+            "chunks": self.chunks_sent,
+            "bytes": self.bytes_sent,
+            "speed": round(self.speed, 1) if self.speed is not None else None,
+            "buffered_ms": round(self.buffered_ms()),
+        }
@@ -0,0 +1,410 @@
+"""
+Inference Backends
+
+The WebSocket handler reaches speech-to-text, image description and
+text-to-speech through one async interface with two implementations:
+
+- LocalInference runs the in-process models on lane worker threads
+  (services/admission.py), so the event loop keeps serving other sessions
+  while a model runs.
+- RemoteInference sends each call to the inference server
+  (inference_server.py) over a Unix socket, so the web process loads no
+  models at all. Large inputs are decoded straight into shared memory
+  (services/shared_buffers.py) and only their handle is sent.
+
+Callers turn the client's base64 into a payload with decode() and pass
+that to transcribe() or describe_image(); each backend decides where the
+decoded bytes live. Every call takes a priority ("interactive" or
+"batch") and raises Busy when its model's lane does not admit it.
+synthesize_stream() yields speech in pieces (one per sentence with the
+local Piper voice), each tagged with its format.
+
+Wire format (both directions): an 8-byte header with the JSON header
+length and the binary payload length (big-endian uint32 each), the JSON
+header, then the payload. Requests carry an "id" that the response
+echoes, so many calls can be in flight on one connection.
+"""
+
+import asyncio
+import base64
+import itertools
+import json
+import logging
+import struct
+from typing import Any, AsyncIterator, Dict, Optional, Tuple, Union
+
+import numpy as np # type: ignore
+
+from services.admission import Busy, Lane
+from services.shared_buffers import SHM_MIN_PAYLOAD, SharedBufferPool, SharedPayload, decoded_size
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FRAME_HEADER = struct.Struct(">II")
+# Large enough for a long WAV recording or a high-resolution photo
+MAX_PAYLOAD_BYTES = 64 * 1024 * 1024
+MAX_HEADER_BYTES = 1024 * 1024
+DEFAULT_TIMEOUT = 120.0
+
+
+class InferenceError(RuntimeError):
+    """The inference server failed the request."""
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Tuple[Dict[str, Any], bytes]:
+    """
+    Read one frame.
+
+    Args:
+        reader: Stream to read from
+
+    Returns:
+        Tuple of the decoded JSON header and the raw payload
+    """
+    header_len, payload_len = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+    if header_len > MAX_HEADER_BYTES or payload_len > MAX_PAYLOAD_BYTES:
+        raise InferenceError(f"Frame too large ({header_len} + {payload_len} bytes)")
+    header = json.loads(await reader.readexactly(header_len))
+    payload = await reader.readexactly(payload_len) if payload_len else b""
+    return header, payload
+
+
+def write_frame(writer: asyncio.StreamWriter, header: Dict[str, Any], payload: bytes = b""):
+    """
+    Queue one frame on the writer (the caller drains).
+
+    Args:
+        writer: Stream to write to
+        header: JSON-serializable header
+        payload: Raw bytes sent after the header
+    """
+    encoded = json.dumps(header).encode()
+    writer.write(FRAME_HEADER.pack(len(encoded), len(payload)) + encoded)
+    if payload:
+        writer.write(payload)
+
+
+class LocalInference:
+    """
+    Runs the in-process models on lane threads.
+    """
+
+    def __init__(self, transcriber, vision, tts, lanes: Dict[str, Dict[str, Any]]):
+        """
+        Args:
+            transcriber: WhisperTranscriber
+            vision: VisionService
+            tts: TTSClient
+            lanes: Lane settings per model (config INFERENCE_LANES)
+        """
+        self.transcriber = transcriber
+        self.vision = vision
+        self.tts = tts
+        self.lanes = {
+            "stt": Lane("stt", self._transcribe, **lanes["stt"]),
+            "vision": Lane("vision", self._describe, **lanes["vision"]),
+            "tts": Lane("tts", self._synthesize, **lanes["tts"]),
+        }
+
+    # Batch handlers (run on lane threads)
+
+    def _transcribe(self, batch):
+        return [self.transcriber.transcribe(np.frombuffer(audio, dtype=np.uint8)) for audio in batch]
+
+    def _describe(self, batch):
+        return self.vision.describe_images([image for image, _ in batch], [prompt for _, prompt in batch])
+
+    def _synthesize(self, batch):
+        responses = []
+        for text, timings, emit in batch:
+            if emit is None:
+                responses.append(self.tts.text_to_speech(text, timings))
+                continue
+            for audio, audio_format in self.tts.stream_speech(text, timings):
+                emit(audio, audio_format)
+            responses.append(None)
+        return responses
+
+    def decode(self, data_base64: str) -> bytes:
+        """
+        Decode a base64 upload.
+
+        Args:
+            data_base64: Base64 text from the client
+
+        Returns:
+            The decoded bytes
+        """
+        return base64.b64decode(data_base64)
+
+    async def transcribe(self, audio: bytes, priority: str = "interactive") -> Tuple[str, Dict[str, Any]]:
+        """
+        Transcribe a recording (WAV bytes).
+
+        Returns:
+            Tuple of the text and the transcriber's metadata
+        """
+        return await self.lanes["stt"].submit(audio, priority)
+
+    async def describe_image(self, image: bytes, prompt: Optional[str] = None, priority: str = "interactive") -> str:
+        """
+        Describe an encoded image (JPEG, PNG, ...).
+
+        Returns:
+            str: Image description
+        """
+        return await self.lanes["vision"].submit((image, prompt), priority)
+
+    async def synthesize(self, text: str, timings: Optional[Dict[str, float]] = None, priority: str = "interactive") -> bytes:
+        """
+        Synthesize speech for text.
+
+        Args:
+            text: Text to speak
+            timings: Optional dict that receives "first_byte" when measurable
+            priority: "interactive" or "batch"
+
+        Returns:
+            Audio data as bytes
+        """
+        return await self.lanes["tts"].submit((text, timings, None), priority)
+
+    async def synthesize_stream(
+        self, text: str, timings: Optional[Dict[str, float]] = None, priority: str = "interactive"
+    ) -> AsyncIterator[Tuple[bytes, Dict[str, Any]]]:
+        """
+        Synthesize speech for text, yielding audio as it is produced.
+
+        Args:
+            text: Text to speak
+            timings: Optional dict for the TTS timings (see TTSClient)
+            priority: "interactive" or "batch"
+
+        Yields:
+            Tuples of audio bytes and their format (see TTSClient.stream_speech)
+        """
+        loop = asyncio.get_running_loop()
+        pieces: asyncio.Queue = asyncio.Queue()
+
+        def emit(audio: bytes, audio_format: Dict[str, Any]):
+            loop.call_soon_threadsafe(pieces.put_nowait, (audio, audio_format))
+
+        # Pieces are queued from the lane thread before the job completes
+        job = asyncio.ensure_future(self.lanes["tts"].submit((text, timings, emit), priority))
+        job.add_done_callback(lambda _: pieces.put_nowait(None))
+        while True:
+            piece = await pieces.get()
+            if piece is None:
+                break
+            yield piece
+        await job
+
+    async def status(self) -> Dict[str, Any]:
+        """
+        Readiness of the models and lane counters.
+
+        Returns:
+            Dict with "ready", the per-model states and "lanes"
+        """
+        from services.model_registry import is_ready, model_states
+        return {
+            "ready": is_ready(),
+            "models": model_states(),
+            "lanes": {name: lane.stats() for name, lane in self.lanes.items()},
+            "tts": self.tts.stats(),
+        }
+
+
+class RemoteInference:
+    """
+    Client for the inference server; one multiplexed Unix socket connection,
+    opened on first use and reopened after a failure.
+    """
+
+    def __init__(self, socket_path: str, timeout: float = DEFAULT_TIMEOUT):
+        """
+        Args:
+            socket_path: Unix socket the inference server listens on
+            timeout: Seconds to wait for any one call, queueing included
+        """
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._streams: Dict[int, asyncio.Queue] = {}
+        self._ids = itertools.count(1)
+        self._connect_lock: Optional[asyncio.Lock] = None
+        self._write_lock: Optional[asyncio.Lock] = None
+        self._buffers = SharedBufferPool()
+
+    async def _connect(self):
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+            self._write_lock = asyncio.Lock()
+
+        async with self._connect_lock:
+            if self._writer is not None and not self._writer.is_closing():
+                return
+            self._reader, self._writer = await asyncio.open_unix_connection(self.socket_path)
+            asyncio.create_task(self._read_responses(self._reader))
+            logger.info(f"Connected to inference server at {self.socket_path}")
+
+    async def _read_responses(self, reader: asyncio.StreamReader):
+        error: Exception = ConnectionError("Inference server closed the connection")
+        try:
+            while True:
+                header, payload = await read_frame(reader)
+                stream = self._streams.get(header.get("id"))
+                if stream is not None:
+                    stream.put_nowait((header, payload))
+                    continue
+                future = self._pending.pop(header.get("id"), None)
+                if future is not None and not future.done():
+                    future.set_result((header, payload))
+        except Exception as e:
+            if not isinstance(e, asyncio.IncompleteReadError):
+                error = e
+            logger.error(f"Inference connection lost: {e}")
+        finally:
+            if self._reader is reader:
+                self._writer = None
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            self._pending.clear()
+            for stream in self._streams.values():
+                stream.put_nowait(error)
+
+    async def call(self, op: str, payload: bytes = b"", **args) -> Tuple[Dict[str, Any], bytes]:
+        """
+        Send one request and wait for its response.
+
+        Args:
+            op: Operation name (transcribe, describe_image, synthesize, status;
+                synthesize_stream goes through synthesize_stream())
+            payload: Binary input
+            **args: Extra JSON header fields
+
+        Returns:
+            Tuple of the response header and payload
+
+        Raises:
+            Busy: The server did not admit the request
+            InferenceError: The server failed the request
+        """
+        header, body = await self._request(op, payload, **args)
+        self._raise_for_error(op, header)
+        return header, body
+
+    async def _request(self, op: str, payload: bytes = b"", **args) -> Tuple[Dict[str, Any], bytes]:
+        """Send one request and return the server's reply, errors included."""
+        await self._connect()
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+
+        try:
+            async with self._write_lock:
+                write_frame(self._writer, {"id": request_id, "op": op, "timeout": self.timeout, **args}, payload)
+                await self._writer.drain()
+            header, body = await asyncio.wait_for(future, self.timeout)
+        finally:
+            self._pending.pop(request_id, None)
+        return header, body
+
+    @staticmethod
+    def _raise_for_error(op: str, header: Dict[str, Any]):
+        if header.get("error") == "busy":
+            raise Busy(header.get("lane", op), header.get("reason", "queue"), header.get("retry_after", 1.0))
+        if header.get("error"):
+            raise InferenceError(header.get("message", header["error"]))
+
+    def decode(self, data_base64: str) -> Union[bytes, SharedPayload]:
+        """
+        Decode a base64 upload, into shared memory when it is large.
+
+        Args:
+            data_base64: Base64 text from the client
+
+        Returns:
+            bytes, or a SharedPayload that the next call sends and releases
+        """
+        if len(data_base64) % 4 or decoded_size(data_base64) < SHM_MIN_PAYLOAD:
+            return base64.b64decode(data_base64)
+        return self._buffers.decode_base64(data_base64)
+
+    async def _call_with_payload(self, op: str, payload: Union[bytes, SharedPayload], **args):
+        if not isinstance(payload, SharedPayload):
+            return await self.call(op, payload, **args)
+        try:
+            header, body = await self._request(op, **payload.handle(), **args)
+        except BaseException:
+            # Timed out, cancelled or disconnected: a lane may still be
+            # reading the segment, so it must never be reused
+            payload.discard()
+            raise
+        # The server is done reading the segment once it has answered
+        payload.release()
+        self._raise_for_error(op, header)
+        return header, body
+
+    async def transcribe(self, audio: Union[bytes, SharedPayload], priority: str = "interactive") -> Tuple[str, Dict[str, Any]]:
+        header, _ = await self._call_with_payload("transcribe", audio, priority=priority)
+        return header["text"], header.get("metadata", {})
+
+    async def describe_image(self, image: Union[bytes, SharedPayload], prompt: Optional[str] = None, priority: str = "interactive") -> str:
+        header, _ = await self._call_with_payload("describe_image", image, prompt=prompt, priority=priority)
+        return header["description"]
+
+    async def synthesize(self, text: str, timings: Optional[Dict[str, float]] = None, priority: str = "interactive") -> bytes:
+        header, audio = await self.call("synthesize", text.encode(), priority=priority)
+        if timings is not None:
+            timings.update(header.get("timings", {}))
+        return audio
+
+    async def synthesize_stream(
+        self, text: str, timings: Optional[Dict[str, float]] = None, priority: str = "interactive"
+    ) -> AsyncIterator[Tuple[bytes, Dict[str, Any]]]:
+        """
+        The server answers with one "chunk" frame per piece of audio, then
+        a final frame with the timings.
+        """
+        await self._connect()
+        request_id = next(self._ids)
+        frames: asyncio.Queue = asyncio.Queue()
+        self._streams[request_id] = frames
+
+        try:
+            async with self._write_lock:
+                header = {"id": request_id, "op": "synthesize_stream", "timeout": self.timeout, "priority": priority}
+                write_frame(self._writer, header, text.encode())
+                await self._writer.drain()
+            while True:
+                frame = await asyncio.wait_for(frames.get(), self.timeout)
+                if isinstance(frame, Exception):
+                    raise frame
+                header, audio = frame
+                self._raise_for_error("synthesize_stream", header)
+                if not header.get("chunk"):
+                    break
+                yield audio, header["audio_format"]
+        finally:
+            self._streams.pop(request_id, None)
+
+        if timings is not None:
+            timings.update(header.get("timings", {}))
+
+    async def status(self) -> Dict[str, Any]:
+        try:
+            header, _ = await self.call("status")
+        except (OSError, InferenceError) as e:
+            return {"ready": False, "models": {}, "error": str(e)}
+        return {
+            "ready": header["ready"],
+            "models": header["models"],
+            "lanes": header.get("lanes", {}),
+            "tts": header.get("tts", {}),
+        }
@@ -128,6 +128,7 @@ class LLMClient:
             
         Returns:
             Dictionary containing the LLM response and metadata
+            (first_token_time is None when the backend does not expose it)
         """
         self.is_processing = True
         start_time = time.time()
@@ -187,6 +188,7 @@ class LLMClient:
             assistant_message = ""
             finish_reason = None
             model_used = "unknown"
+            first_token_time = None
 
             if self.use_groq and self.client:
                 # Use official Groq python client
@@ -224,6 +226,9 @@ class LLMClient:
                 
                 # Check if request was successful
                 response.raise_for_status()
+                # Time until the response headers arrived; for a non-streamed
+                # completion this is when the first token reached us
+                first_token_time = response.elapsed.total_seconds()
                 
                 # Parse response
                 result = response.json()
@@ -246,6 +251,7 @@ class LLMClient:
             return {
                 "text": assistant_message,
                 "processing_time": processing_time,
+                "first_token_time": first_token_time,
                 "finish_reason": finish_reason,
                 "model": model_used
             }
@@ -0,0 +1,126 @@
+"""
+Model Registry
+
+Tracks lazily loaded models (Whisper, SmolVLM, ...) so they are built on
+first use or in the background after the server is already accepting
+connections, and reports each model's state for the readiness endpoint.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class LazyModel:
+    """
+    A model that is loaded once, on the first get() or during warm-up.
+
+    A failed load is reported through status() and retried on the next get().
+    """
+
+    def __init__(self, name: str, loader: Callable[[], Any]):
+        """
+        Args:
+            name: Name reported by the readiness endpoint
+            loader: Callable that loads and returns the model
+        """
+        self.name = name
+        self.loader = loader
+        self.state = "not_loaded"
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self._value: Any = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Any:
+        """
+        Return the loaded model, loading it first if needed.
+
+        Returns:
+            Whatever the loader returned
+        """
+        if self.state == "ready":
+            return self._value
+
+        with self._lock:
+            if self.state != "ready":
+                self.state = "loading"
+                start_time = time.time()
+                try:
+                    self._value = self.loader()
+                except Exception as e:
+                    self.state = "failed"
+                    self.error = str(e)
+                    logger.error(f"Failed to load {self.name}: {e}")
+                    raise
+                self.load_seconds = round(time.time() - start_time, 3)
+                self.error = None
+                self.state = "ready"
+                logger.info(f"Loaded {self.name} in {self.load_seconds:.2f}s")
+        return self._value
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Returns:
+            Dict with the model state, last error and load time
+        """
+        return {"state": self.state, "error": self.error, "load_seconds": self.load_seconds}
+
+
+_lazy_models: Dict[str, LazyModel] = {}
+
+
+def register_model(name: str, loader: Callable[[], Any]) -> LazyModel:
+    """
+    Register a lazily loaded model.
+
+    Args:
+        name: Model name
+        loader: Callable that loads and returns the model
+
+    Returns:
+        The LazyModel handle
+    """
+    model = LazyModel(name, loader)
+    _lazy_models[name] = model
+    return model
+
+
+def model_states() -> Dict[str, Dict[str, Any]]:
+    """Get the state of every registered model."""
+    return {name: model.status() for name, model in _lazy_models.items()}
+
+
+def is_ready() -> bool:
+    """Ready unless a model is still loading or failed to load."""
+    return all(model.state in ("ready", "not_loaded") for model in _lazy_models.values())
+
+
+def warm_up(names: Optional[Iterable[str]] = None) -> threading.Thread:
+    """
+    Load models one after another in a background thread.
+
+    Args:
+        names: Models to load, or None for all registered models
+
+    Returns:
+        The daemon thread doing the loading
+    """
+    wanted = set(names) if names is not None else None
+    models = [m for n, m in _lazy_models.items() if wanted is None or n in wanted]
+
+    def run():
+        for model in models:
+            try:
+                model.get()
+            except Exception:
+                pass  # already logged and reported through status()
+
+    thread = threading.Thread(target=run, name="model-warm-up", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,208 @@
+"""
+Local Piper TTS
+
+Runs a Piper voice (an ONNX model) on the CPU in this process, so replies
+are spoken without a network hop and without any external TTS server.
+
+Text is synthesized one sentence at a time and each sentence is yielded
+as raw 16-bit mono PCM as soon as it is ready, so playback of the first
+sentence can start while the rest is still being synthesized. The voice
+is registered with the model registry ("piper") and stays loaded; warm-up
+also runs one short synthesis, since the first ONNX run is much slower
+than the rest.
+
+Speed is reported as the real-time factor (RTF): synthesis time divided
+by the duration of the audio produced. Below 1.0 is faster than real time.
+"""
+
+import logging
+import re
+import threading
+import time
+from typing import Any, Dict, Generator, List, Optional
+
+try:
+    from piper import PiperVoice # type: ignore
+except ImportError:
+    PiperVoice = None
+
+try:
+    import onnxruntime # type: ignore
+except ImportError:
+    onnxruntime = None
+
+from services.audio_format import pcm_duration, pcm_to_wav
+from services.model_registry import register_model
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Sentence boundaries: end punctuation followed by whitespace, or line breaks
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n+")
+# Shorter fragments ("Hi.", "1.") are joined to the next sentence so they
+# do not become separately scheduled blips of audio
+MIN_SENTENCE_CHARS = 20
+WARM_UP_TEXT = "Hello."
+# Weight of the newest sentence in the running real-time factor
+RTF_SMOOTHING = 0.1
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Split text into sentences for incremental synthesis.
+
+    Args:
+        text: Text to speak
+
+    Returns:
+        List of non-empty sentences
+    """
+    sentences: List[str] = []
+    pending = ""
+    for part in SENTENCE_BOUNDARY.split(text):
+        part = part.strip()
+        if not part:
+            continue
+        pending = f"{pending} {part}" if pending else part
+        if len(pending) >= MIN_SENTENCE_CHARS:
+            sentences.append(pending)
+            pending = ""
+    if pending:
+        sentences.append(pending)
+    return sentences
+
+
+class PiperTTS:
+    """
+    A Piper voice running on ONNX Runtime (CPU).
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        config_path: Optional[str] = None,
+        speaker_id: Optional[int] = None,
+        threads: int = 1
+    ):
+        """
+        Args:
+            model_path: Path of the voice's .onnx file
+            config_path: Path of its .onnx.json config (default: next to the model)
+            speaker_id: Speaker of a multi-speaker voice
+            threads: ONNX Runtime threads per synthesis; the TTS lane runs
+                several syntheses at once, so keep this small
+        """
+        self.model_path = model_path
+        self.config_path = config_path
+        self.speaker_id = speaker_id
+        self.threads = threads
+        self.sample_rate: Optional[int] = None
+        self.rtf: Optional[float] = None
+        self.audio_seconds = 0.0
+        self.synthesis_seconds = 0.0
+        self._stats_lock = threading.Lock()
+        self._model_handle = register_model("piper", self._load)
+
+    def _load(self):
+        """Load the voice and run one short synthesis; raises on failure."""
+        if PiperVoice is None:
+            raise RuntimeError("piper-tts is not installed (pip install piper-tts)")
+
+        voice = PiperVoice.load(self.model_path, config_path=self.config_path, use_cuda=False)
+        if onnxruntime is not None and self.threads:
+            # Piper builds its session with ONNX Runtime's defaults (every
+            # core); rebuild it with this voice's share of the CPUs
+            options = onnxruntime.SessionOptions()
+            options.intra_op_num_threads = self.threads
+            options.inter_op_num_threads = 1
+            voice.session = onnxruntime.InferenceSession(
+                str(self.model_path), sess_options=options, providers=["CPUExecutionProvider"]
+            )
+        self.sample_rate = voice.config.sample_rate
+        self._synthesize_sentence(voice, WARM_UP_TEXT)
+        logger.info(f"Piper voice {self.model_path} ready ({self.sample_rate} Hz, {self.threads} threads)")
+        return voice
+
+    def _synthesize_sentence(self, voice, sentence: str) -> bytes:
+        if hasattr(voice, "synthesize_stream_raw"):
+            # piper-tts before 1.3
+            return b"".join(voice.synthesize_stream_raw(sentence, speaker_id=self.speaker_id))
+        syn_config = None
+        if self.speaker_id is not None:
+            from piper import SynthesisConfig # type: ignore
+            syn_config = SynthesisConfig(speaker_id=self.speaker_id)
+        return b"".join(chunk.audio_int16_bytes for chunk in voice.synthesize(sentence, syn_config=syn_config))
+
+    def stream_pcm(self, text: str, timings: Optional[Dict[str, float]] = None) -> Generator[bytes, None, None]:
+        """
+        Synthesize text sentence by sentence.
+
+        Args:
+            text: Text to speak
+            timings: Optional dict that receives "first_byte" (seconds until
+                the first sentence was ready) and "rtf" for the whole text
+
+        Yields:
+            Raw 16-bit mono PCM at self.sample_rate, one sentence at a time
+        """
+        voice = self._model_handle.get()
+        start_time = time.perf_counter()
+        total_audio = 0.0
+
+        for sentence in split_sentences(text):
+            sentence_start = time.perf_counter()
+            pcm = self._synthesize_sentence(voice, sentence)
+            elapsed = time.perf_counter() - sentence_start
+            duration = pcm_duration(pcm, self.sample_rate)
+            if not duration:
+                continue
+            self._observe(elapsed, duration)
+            total_audio += duration
+            if timings is not None and "first_byte" not in timings:
+                timings["first_byte"] = time.perf_counter() - start_time
+            yield pcm
+
+        if total_audio:
+            rtf = (time.perf_counter() - start_time) / total_audio
+            if timings is not None:
+                timings["rtf"] = rtf
+            logger.info(f"Piper synthesized {total_audio:.2f}s of audio, RTF {rtf:.3f}")
+
+    def synthesize(self, text: str, timings: Optional[Dict[str, float]] = None) -> bytes:
+        """
+        Synthesize text to a single WAV file.
+
+        Args:
+            text: Text to speak
+            timings: See stream_pcm()
+
+        Returns:
+            WAV bytes
+        """
+        pcm = b"".join(self.stream_pcm(text, timings))
+        return pcm_to_wav(pcm, self.sample_rate)
+
+    def _observe(self, elapsed: float, duration: float):
+        with self._stats_lock:
+            self.synthesis_seconds += elapsed
+            self.audio_seconds += duration
+            rtf = elapsed / duration
+            self.rtf = rtf if self.rtf is None else self.rtf + RTF_SMOOTHING * (rtf - self.rtf)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Real-time factor and totals.
+
+        Returns:
+            Dict with the recent and overall RTF and the audio produced
+        """
+        with self._stats_lock:
+            overall = self.synthesis_seconds / self.audio_seconds if self.audio_seconds else None
+            return {
+                "engine": "piper",
+                "sample_rate": self.sample_rate,
+                "rtf": round(self.rtf, 3) if self.rtf is not None else None,
+                "rtf_overall": round(overall, 3) if overall is not None else None,
+                "audio_seconds": round(self.audio_seconds, 1),
+            }
@@ -0,0 +1,289 @@
+"""
+Shared-Memory Payloads
+
+Large request payloads (recordings, photos) travel from the web workers to
+the inference server through shared memory instead of the Unix socket.
+The web worker decodes the client's base64 straight into a pooled
+segment, which is the only full-size copy; the server attaches to the
+segment by name and reads it in place (np.frombuffer, MemoryReader), and
+only the segment name and size are sent over the socket. The server
+detaches once it has answered, so a segment the web worker unlinks is
+freed rather than kept mapped by the server.
+
+Segments are owned by the web worker: it reuses them for later payloads
+once the server has answered, and unlinks them at exit. A segment whose
+request ended without an answer (timeout, cancellation, lost connection)
+is unlinked rather than reused, since the server may still be reading it. The server only
+attaches, and never registers segments with the resource tracker, so a
+server restart cannot unlink a segment a web worker still uses.
+"""
+
+import atexit
+import binascii
+import io
+import logging
+import threading
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Smaller payloads are cheaper to send inline on the socket
+SHM_MIN_PAYLOAD = 64 * 1024
+MIN_SEGMENT_SIZE = 1024 * 1024
+MAX_FREE_SEGMENTS = 8
+# Base64 characters decoded per step; a multiple of 4
+DECODE_CHUNK = 1024 * 1024
+
+
+def decoded_size(text: str) -> int:
+    """
+    Exact size of the bytes a padded base64 string decodes to.
+
+    Args:
+        text: Base64 text without whitespace
+
+    Returns:
+        int: Decoded length in bytes
+    """
+    return len(text) // 4 * 3 - text[-2:].count("=")
+
+
+class MemoryReader(io.RawIOBase):
+    """
+    Read-only, seekable file object over a buffer, without copying it.
+
+    io.BytesIO copies anything that is not a bytes object, which would
+    copy a shared-memory payload in full just to open it.
+    """
+
+    def __init__(self, buffer):
+        """
+        Args:
+            buffer: Any object supporting the buffer protocol
+        """
+        super().__init__()
+        self._view = memoryview(buffer).cast("B")
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, target) -> int:
+        n = min(len(target), len(self._view) - self._pos)
+        if n <= 0:
+            return 0
+        target[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._view)}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def close(self):
+        if not self.closed:
+            self._view.release()
+        super().close()
+
+
+class SharedPayload:
+    """
+    A payload held in a pooled shared-memory segment.
+    """
+
+    def __init__(self, pool: "SharedBufferPool", segment: shared_memory.SharedMemory, size: int):
+        self.pool = pool
+        self.segment = segment
+        self.size = size
+
+    def handle(self) -> dict:
+        """
+        Header fields that let the server attach to the payload.
+
+        Returns:
+            Dict with the segment name and payload size
+        """
+        return {"shm": self.segment.name, "shm_size": self.size}
+
+    def view(self) -> memoryview:
+        return self.segment.buf[:self.size]
+
+    def release(self):
+        """Return the segment to the pool; the payload must not be used afterwards."""
+        if self.segment is not None:
+            self.pool.release(self.segment)
+            self.segment = None
+
+    def discard(self):
+        """Unlink the segment instead of reusing it, when the server may still be reading it."""
+        if self.segment is not None:
+            self.segment.close()
+            self.segment.unlink()
+            self.segment = None
+
+
+class SharedBufferPool:
+    """
+    Shared-memory segments owned by this process, reused across payloads.
+    """
+
+    def __init__(self, max_free: int = MAX_FREE_SEGMENTS, min_size: int = MIN_SEGMENT_SIZE):
+        """
+        Args:
+            max_free: Idle segments kept for reuse; extra ones are unlinked
+            min_size: Smallest segment created (sizes grow in powers of two)
+        """
+        self.max_free = max_free
+        self.min_size = min_size
+        self._free: List[shared_memory.SharedMemory] = []
+        self._lock = threading.Lock()
+        self._closed = False
+        atexit.register(self.close)
+
+    def acquire(self, size: int) -> shared_memory.SharedMemory:
+        """
+        A segment of at least size bytes, reused when one is free.
+
+        Args:
+            size: Bytes needed
+
+        Returns:
+            SharedMemory segment owned by the pool
+        """
+        with self._lock:
+            fitting = [s for s in self._free if s.size >= size]
+            if fitting:
+                segment = min(fitting, key=lambda s: s.size)
+                self._free.remove(segment)
+                return segment
+        capacity = max(self.min_size, 1 << (size - 1).bit_length())
+        return shared_memory.SharedMemory(create=True, size=capacity)
+
+    def release(self, segment: shared_memory.SharedMemory):
+        """Give a segment back; it is kept for reuse or unlinked."""
+        with self._lock:
+            if not self._closed and len(self._free) < self.max_free:
+                self._free.append(segment)
+                return
+        segment.close()
+        segment.unlink()
+
+    def decode_base64(self, text: str) -> SharedPayload:
+        """
+        Decode base64 text into a shared segment, a chunk at a time, so the
+        full payload is never materialized as bytes first.
+
+        Args:
+            text: Base64 text without whitespace or data-URL prefix
+
+        Returns:
+            SharedPayload holding the decoded bytes
+        """
+        size = decoded_size(text)
+        segment = self.acquire(size)
+        try:
+            offset = 0
+            for start in range(0, len(text), DECODE_CHUNK):
+                chunk = binascii.a2b_base64(text[start:start + DECODE_CHUNK])
+                segment.buf[offset:offset + len(chunk)] = chunk
+                offset += len(chunk)
+        except Exception:
+            self.release(segment)
+            raise
+        return SharedPayload(self, segment, offset)
+
+    def close(self):
+        """Unlink every idle segment (at exit)."""
+        with self._lock:
+            self._closed = True
+            free, self._free = self._free, []
+        for segment in free:
+            segment.close()
+            segment.unlink()
+
+
+def _open_untracked(name: str) -> shared_memory.SharedMemory:
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching also registers the segment, and the
+        # tracker would unlink it when this process exits
+        segment = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(segment._name, "shared_memory")
+        return segment
+
+
+class SegmentAttachments:
+    """
+    Attachments to other processes' segments, held only while a request
+    reads them.
+    """
+
+    def __init__(self):
+        # name -> (segment, requests using it)
+        self._segments: Dict[str, Tuple[shared_memory.SharedMemory, int]] = {}
+        # Detached segments whose buffer was still exported; closed later
+        self._closing: List[shared_memory.SharedMemory] = []
+        self._lock = threading.Lock()
+
+    def view(self, name: str, size: int) -> memoryview:
+        """
+        The first size bytes of the named segment, without copying. Every
+        view must be given back with release() once the request is answered.
+
+        Args:
+            name: Segment name from the payload handle
+            size: Payload size from the payload handle
+
+        Returns:
+            memoryview over the shared bytes
+        """
+        with self._lock:
+            segment, users = self._segments.get(name) or (_open_untracked(name), 0)
+            if size > segment.size:
+                if not users:
+                    segment.close()
+                raise ValueError(f"Payload of {size} bytes does not fit segment {name}")
+            self._segments[name] = (segment, users + 1)
+            return segment.buf[:size]
+
+    def release(self, name: str, view: memoryview):
+        """
+        Give back a view from view(); the last one detaches the segment.
+
+        Args:
+            name: Segment name passed to view()
+            view: The memoryview it returned
+        """
+        with self._lock:
+            try:
+                view.release()
+            except BufferError:
+                # Something still holds an array over it; it goes with the segment
+                pass
+            segment, users = self._segments.pop(name)
+            if users > 1:
+                self._segments[name] = (segment, users - 1)
+                return
+            self._closing.append(segment)
+            self._close_pending()
+
+    def _close_pending(self):
+        still_open = []
+        for segment in self._closing:
+            try:
+                segment.close()
+            except BufferError:
+                # Still being read; try again on a later release
+                still_open.append(segment)
+        self._closing = still_open
@@ -0,0 +1,311 @@
+"""
+Latency Tracing
+
+Records the stages of every assistant turn (receive, decode, STT, LLM,
+TTS, send, ...) as spans, aggregates them into Prometheus-style
+histograms for the /metrics endpoint and keeps per-session totals.
+When an OTLP endpoint is configured and the OpenTelemetry SDK is
+installed, each turn is also exported as a trace with one child span
+per stage.
+"""
+
+import bisect
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    from opentelemetry import trace as otel_trace  # type: ignore
+    from opentelemetry.sdk.resources import Resource  # type: ignore
+    from opentelemetry.sdk.trace import TracerProvider  # type: ignore
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor  # type: ignore
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter  # type: ignore
+except ImportError:
+    otel_trace = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Sessions kept for /metrics/sessions after they disconnect
+MAX_TRACKED_SESSIONS = 256
+
+
+class Histogram:
+    """
+    Cumulative histogram with fixed buckets, labelled by one key (the stage).
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        """
+        Args:
+            buckets: Sorted bucket upper bounds; +Inf is implicit
+        """
+        self.buckets = buckets
+        self._series: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label: str, value: float) -> None:
+        """
+        Record one observation.
+
+        Args:
+            label: Series label (stage name)
+            value: Observed value in seconds
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            # Per-bucket counts, then +Inf count, sum and total count
+            series = self._series.setdefault(label, [0] * (len(self.buckets) + 1) + [0.0, 0])
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self, name: str, label_name: str) -> List[str]:
+        """
+        Render in the Prometheus text exposition format.
+
+        Args:
+            name: Metric name
+            label_name: Name of the label holding the series key
+
+        Returns:
+            Lines of the exposition
+        """
+        with self._lock:
+            snapshot = {label: list(series) for label, series in self._series.items()}
+
+        lines = [f"# TYPE {name} histogram"]
+        for label, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{name}_bucket{{{label_name}="{label}",le="{le}"}} {cumulative}')
+            lines.append(f'{name}_sum{{{label_name}="{label}"}} {series[-2]:.6f}')
+            lines.append(f'{name}_count{{{label_name}="{label}"}} {series[-1]}')
+        return lines
+
+
+class Turn:
+    """
+    One request/response exchange on a session, e.g. an audio message and
+    the spoken reply.
+    """
+
+    def __init__(self, tracer: "Tracer", session_id: str, kind: str, received_at: Optional[float] = None):
+        """
+        Args:
+            tracer: Owning tracer
+            session_id: Session the turn belongs to
+            kind: Message type that started the turn
+            received_at: perf_counter() time the message arrived, if known
+        """
+        self.tracer = tracer
+        self.session_id = session_id
+        self.kind = kind
+        self.turn_id = uuid.uuid4().hex[:16]
+        self.started = received_at if received_at is not None else time.perf_counter()
+        self.wall_started = time.time() - (time.perf_counter() - self.started)
+        self.spans: List[Tuple[str, float, float]] = []
+        self.finished = False
+
+    def record(self, stage: str, start: float, end: float) -> None:
+        """
+        Record a stage that ran from start to end (perf_counter() seconds).
+        """
+        self.spans.append((stage, start, end))
+        self.tracer.stage_seconds.observe(stage, end - start)
+
+    def mark(self, stage: str, elapsed: float, start: Optional[float] = None) -> None:
+        """
+        Record a stage measured elsewhere, e.g. a client-reported time to first byte.
+
+        Args:
+            stage: Stage name
+            elapsed: Duration in seconds
+            start: perf_counter() time the stage started (default: now - elapsed)
+        """
+        if start is None:
+            start = time.perf_counter() - elapsed
+        self.record(stage, start, start + elapsed)
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        """
+        Time the enclosed block as one stage; failed stages are still recorded.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, start, time.perf_counter())
+
+    def finish(self) -> Dict[str, Any]:
+        """
+        Close the turn and return its timing summary.
+
+        Returns:
+            Dict with total seconds and per-stage seconds
+        """
+        if self.finished:
+            return self.summary()
+        self.finished = True
+        end = time.perf_counter()
+        self.tracer.turn_seconds.observe(self.kind, end - self.started)
+        self.tracer._finish_turn(self, end)
+        return self.summary()
+
+    def summary(self) -> Dict[str, Any]:
+        """Per-stage durations in seconds (stages that ran twice are summed)."""
+        stages: Dict[str, float] = {}
+        for stage, start, end in self.spans:
+            stages[stage] = stages.get(stage, 0.0) + end - start
+        return {
+            "turn_id": self.turn_id,
+            "kind": self.kind,
+            "stages": {k: round(v, 4) for k, v in stages.items()},
+        }
+
+
+class Tracer:
+    """
+    Collects turn and stage latencies for every session.
+    """
+
+    def __init__(self):
+        self.stage_seconds = Histogram()
+        self.turn_seconds = Histogram()
+        self.sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.active_sessions = 0
+        self._lock = threading.Lock()
+        self._otel = None
+
+    def configure_otlp(self, endpoint: Optional[str], service_name: str = "assistant-backend") -> bool:
+        """
+        Export turns as OpenTelemetry traces to an OTLP/HTTP collector.
+
+        Args:
+            endpoint: Collector traces URL, e.g. http://localhost:4318/v1/traces (None disables)
+            service_name: service.name resource attribute
+
+        Returns:
+            True if export is enabled
+        """
+        if not endpoint:
+            return False
+        if otel_trace is None:
+            logger.warning("OTLP endpoint configured but opentelemetry-sdk is not installed")
+            return False
+
+        provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=endpoint)))
+        self._otel = provider.get_tracer(__name__)
+        logger.info(f"Exporting assistant traces to {endpoint}")
+        return True
+
+    def session_started(self, session_id: str) -> None:
+        with self._lock:
+            self.active_sessions += 1
+            self._session(session_id)["connected"] = True
+
+    def session_ended(self, session_id: str) -> None:
+        with self._lock:
+            self.active_sessions -= 1
+            self._session(session_id)["connected"] = False
+
+    def _session(self, session_id: str) -> Dict[str, Any]:
+        session = self.sessions.get(session_id)
+        if session is None:
+            session = self.sessions[session_id] = {"turns": 0, "total_seconds": 0.0, "stages": {}, "connected": False}
+            while len(self.sessions) > MAX_TRACKED_SESSIONS:
+                oldest = next(iter(self.sessions))
+                if self.sessions[oldest]["connected"]:
+                    self.sessions.move_to_end(oldest)
+                    break
+                del self.sessions[oldest]
+        return session
+
+    def start_turn(self, session_id: str, kind: str, received_at: Optional[float] = None) -> Turn:
+        """
+        Begin tracing a turn.
+
+        Args:
+            session_id: Session the turn belongs to
+            kind: Message type that started the turn
+            received_at: perf_counter() time the message arrived
+
+        Returns:
+            The Turn to record stages on
+        """
+        return Turn(self, session_id, kind, received_at)
+
+    def _finish_turn(self, turn: Turn, end: float) -> None:
+        with self._lock:
+            session = self._session(turn.session_id)
+            session["turns"] += 1
+            session["total_seconds"] += end - turn.started
+            for stage, start, stop in turn.spans:
+                session["stages"][stage] = session["stages"].get(stage, 0.0) + stop - start
+
+        if self._otel is not None:
+            self._export(turn, end)
+
+    def _export(self, turn: Turn, end: float) -> None:
+        # perf_counter() times are converted to wall-clock nanoseconds
+        def to_ns(t: float) -> int:
+            return int((turn.wall_started + (t - turn.started)) * 1e9)
+
+        try:
+            root = self._otel.start_span(
+                f"assistant.turn.{turn.kind}",
+                start_time=to_ns(turn.started),
+                attributes={"session.id": turn.session_id, "turn.id": turn.turn_id},
+            )
+            context = otel_trace.set_span_in_context(root)
+            for stage, start, stop in turn.spans:
+                child = self._otel.start_span(stage, context=context, start_time=to_ns(start))
+                child.end(end_time=to_ns(stop))
+            root.end(end_time=to_ns(end))
+        except Exception as e:
+            logger.warning(f"Failed to export trace: {e}")
+
+    def session_summary(self) -> Dict[str, Any]:
+        """
+        Per-session turn counts and mean stage latencies.
+        """
+        with self._lock:
+            return {
+                session_id: {
+                    "connected": s["connected"],
+                    "turns": s["turns"],
+                    "mean_turn_seconds": round(s["total_seconds"] / s["turns"], 4) if s["turns"] else None,
+                    "mean_stage_seconds": {
+                        stage: round(total / s["turns"], 4) for stage, total in s["stages"].items()
+                    } if s["turns"] else {},
+                }
+                for session_id, s in self.sessions.items()
+            }
+
+    def render_prometheus(self) -> str:
+        """
+        All metrics in the Prometheus text exposition format.
+        """
+        lines = ["# HELP assistant_stage_seconds Latency of each assistant turn stage"]
+        lines += self.stage_seconds.render("assistant_stage_seconds", "stage")
+        lines.append("# HELP assistant_turn_seconds End-to-end latency of assistant turns by message type")
+        lines += self.turn_seconds.render("assistant_turn_seconds", "kind")
+        lines.append("# HELP assistant_active_sessions Connected assistant WebSocket sessions")
+        lines.append("# TYPE assistant_active_sessions gauge")
+        lines.append(f"assistant_active_sessions {self.active_sessions}")
+        return "\n".join(lines) + "\n"
+
+
+tracer = Tracer()
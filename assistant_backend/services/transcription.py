@@ -6,12 +6,14 @@ Uses Faster Whisper to transcribe speech audio.
 
 import numpy as np # type: ignore
 import logging
-import io  # For BytesIO
 from typing import Dict, Any, List, Optional, Tuple
 from faster_whisper import WhisperModel # type: ignore
 import time
 import torch  # type: ignore
 
+from services.model_registry import register_model
+from services.shared_buffers import MemoryReader
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -29,7 +31,12 @@ class WhisperTranscriber:
         device: Optional[str] = None,
         compute_type: Optional[str] = None,
         beam_size: int = 2,
-        sample_rate: int = 44100
+        cpu_threads: int = 0,
+        num_workers: int = 1,
+        sample_rate: int = 44100,
+        download_root: Optional[str] = None,
+        local_files_only: bool = False,
+        lazy: bool = False
     ):
         """
         Initialize the transcription service.
@@ -39,7 +46,12 @@ class WhisperTranscriber:
             device: Device to run model on ('cpu' or 'cuda'), if None will auto-detect
             compute_type: Model computation type (int8, int16, float16, float32), if None will select based on device
             beam_size: Beam size for decoding
+            cpu_threads: CPU threads for decoding (0 uses the CTranslate2 default)
+            num_workers: Concurrent transcribe() calls the model can run in parallel
             sample_rate: Audio sample rate in Hz
+            download_root: Directory to load/download model weights from
+            local_files_only: Never download, only use weights already in download_root
+            lazy: Defer loading the model until first use or warm-up
         """
         self.model_size = model_size
         
@@ -56,11 +68,17 @@ class WhisperTranscriber:
             self.compute_type = compute_type
             
         self.beam_size = beam_size
+        self.cpu_threads = cpu_threads
+        self.num_workers = num_workers
         self.sample_rate = sample_rate
+        self.download_root = download_root
+        self.local_files_only = local_files_only
         self.model: Any = None
         
-        # Initialize model
-        self._initialize_model()
+        # Initialize model (now, or on first use when lazy)
+        self._model_handle = register_model("whisper", self._initialize_model)
+        if not lazy:
+            self._model_handle.get()
         
         # State tracking
         self.is_processing = False
@@ -75,9 +93,14 @@ class WhisperTranscriber:
             self.model = WhisperModel(
                 self.model_size,  # Pass as positional argument, not keyword
                 device=self.device,
-                compute_type=self.compute_type
+                compute_type=self.compute_type,
+                cpu_threads=self.cpu_threads,
+                num_workers=self.num_workers,
+                download_root=self.download_root,
+                local_files_only=self.local_files_only
             )
             logger.info(f"Successfully loaded Whisper model: {self.model_size}")
+            return self.model
         except Exception as e:
             logger.error(f"Failed to load Whisper model: {e}")
             raise
@@ -98,15 +121,16 @@ class WhisperTranscriber:
         self.is_processing = True
         
         try:
+            self._model_handle.get()
+
             # Handle WAV data (if audio is in uint8 format, it contains WAV headers)
             if audio.dtype == np.uint8:
                 # First check the RIFF header to confirm this is WAV data
                 header = bytes(audio[:44]) # type: ignore
                 if header[:4] == b'RIFF' and header[8:12] == b'WAVE': # type: ignore
-                    # Create a file-like object that Whisper can read from
-                    audio_file = io.BytesIO(bytes(audio))
-                    # The transcribe method expects a file-like object with read method
-                    audio = audio_file
+                    # A file-like view of the array, so the recording (possibly in
+                    # shared memory) is read in place rather than copied twice
+                    audio = MemoryReader(audio)
                 else:
                     # Not a proper WAV header
                     logger.warning("Received audio data with incorrect WAV header")
@@ -163,6 +187,8 @@ class WhisperTranscriber:
         self.is_processing = True
         
         try:
+            self._model_handle.get()
+
             # Process the streaming transcription
             segments = self.model.transcribe_with_vad(
                 audio_generator,
@@ -197,5 +223,6 @@ class WhisperTranscriber:
             "compute_type": self.compute_type,
             "beam_size": self.beam_size,
             "sample_rate": self.sample_rate,
+            "model_state": self._model_handle.state,
             "is_processing": self.is_processing
         }
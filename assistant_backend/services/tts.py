@@ -1,7 +1,8 @@
 """
 Text-to-Speech Service
 
-Handles communication with the local TTS API endpoint.
+Speaks with a local Piper voice (services/piper_tts.py) when one is
+configured, and otherwise through OpenAI, gTTS or a local TTS API endpoint.
 """
 
 import json
@@ -12,7 +13,7 @@ import time
 import base64
 import asyncio
 import os
-from typing import Dict, Any, List, Optional, BinaryIO, Generator, AsyncGenerator
+from typing import Dict, Any, List, Optional, BinaryIO, Generator, AsyncGenerator, Tuple
 
 try:
     from openai import OpenAI # type: ignore
@@ -44,7 +45,10 @@ class TTSClient:
         output_format: str = "wav",
         speed: float = 1.0,
         timeout: int = 60,
-        chunk_size: int = 4096
+        chunk_size: int = 4096,
+        engine: str = "remote",
+        piper_model: Optional[str] = None,
+        piper_threads: int = 1
     ):
         """
         Initialize the TTS client.
@@ -57,6 +61,9 @@ class TTSClient:
             speed: Speech speed multiplier (0.25 to 4.0)
             timeout: Request timeout in seconds
             chunk_size: Size of audio chunks to stream in bytes
+            engine: "piper", "remote" or "auto" (Piper when available)
+            piper_model: Path of the Piper voice (.onnx)
+            piper_threads: ONNX Runtime threads per Piper synthesis
         """
         self.api_endpoint = api_endpoint
         self.model = model
@@ -66,12 +73,23 @@ class TTSClient:
         self.timeout = timeout
         self.chunk_size = chunk_size
         
+        # A local Piper voice takes precedence over every network backend
+        self.local_voice = None
+        if engine != "remote" and piper_model:
+            from services.piper_tts import PiperTTS, PiperVoice
+            if engine == "piper" or (PiperVoice is not None and os.path.exists(piper_model)):
+                self.local_voice = PiperTTS(piper_model, threads=piper_threads)
+                self.output_format = "wav"
+                logger.info(f"Initialized TTS Client with local Piper voice {piper_model}")
+
         # Determine if we should use OpenAI or gTTS
         self.openai_api_key = os.environ.get("OPENAI_API_KEY", "")
-        self.use_openai = bool(self.openai_api_key) and OpenAI is not None
-        self.use_gtts = gTTS is not None
+        self.use_openai = bool(self.openai_api_key) and OpenAI is not None and self.local_voice is None
+        self.use_gtts = gTTS is not None and self.local_voice is None
         
-        if self.use_openai:
+        if self.local_voice is not None:
+            self.client = None
+        elif self.use_openai:
             self.client = OpenAI(api_key=self.openai_api_key) # type: ignore
             # Map valid OpenAI voices if necessary
             valid_openai_voices = ["alloy", "echo", "fable", "onyx", "nova", "shimmer"]
@@ -92,12 +110,14 @@ class TTSClient:
         logger.info(f"Initialized TTS Client with endpoint={api_endpoint}, "
                    f"model={model}, voice={voice}")
     
-    def text_to_speech(self, text: str) -> bytes: # type: ignore
+    def text_to_speech(self, text: str, timings: Optional[Dict[str, float]] = None) -> bytes: # type: ignore
         """
         Convert text to speech audio.
         
         Args:
             text: Text to convert to speech
+            timings: Optional dict that receives "first_byte" (seconds until
+                the TTS server started responding) when it can be measured
             
         Returns:
             Audio data as bytes
@@ -117,7 +137,9 @@ class TTSClient:
             
             logger.info(f"Sending TTS request with {len(text)} characters of text")
             
-            if self.use_openai and self.client:
+            if self.local_voice is not None:
+                audio_data = self.local_voice.synthesize(text, timings)
+            elif self.use_openai and self.client:
                 # Use official OpenAI python client
                 response = self.client.audio.speech.create(
                     model=self.model, # type: ignore
@@ -155,6 +177,8 @@ class TTSClient:
                 
                 # Check if request was successful
                 response.raise_for_status()
+                if timings is not None:
+                    timings["first_byte"] = response.elapsed.total_seconds()
                 
                 # Get audio content
                 audio_data = response.content
@@ -176,6 +200,34 @@ class TTSClient:
         finally:
             self.is_processing = False
     
+    def stream_speech(self, text: str, timings: Optional[Dict[str, float]] = None) -> Generator[Tuple[bytes, Dict[str, Any]], None, None]:
+        """
+        Synthesize text in pieces that can be played as soon as they arrive.
+        
+        The Piper voice yields one sentence at a time as raw PCM; the other
+        backends yield the whole reply as one encoded file.
+        
+        Args:
+            text: Text to convert to speech
+            timings: See text_to_speech(); Piper also sets "rtf"
+            
+        Yields:
+            Tuples of audio bytes and their format: {"format": "pcm",
+            "sample_rate": ...} for 16-bit mono PCM, else {"format": output_format}
+        """
+        if self.local_voice is None:
+            yield self.text_to_speech(text, timings), {"format": self.output_format}
+            return
+        
+        self.is_processing = True
+        start_time = time.time()
+        try:
+            for pcm in self.local_voice.stream_pcm(text, timings):
+                yield pcm, {"format": "pcm", "sample_rate": self.local_voice.sample_rate}
+            self.last_processing_time = time.time() - start_time
+        finally:
+            self.is_processing = False
+    
     def stream_text_to_speech(self, text: str) -> Generator[bytes, None, None]:
         """
         Stream audio data from the TTS API.
@@ -279,6 +331,20 @@ class TTSClient:
         finally:
             self.is_processing = False
     
+    def stats(self) -> Dict[str, Any]:
+        """
+        Engine in use and, for Piper, its real-time factor.
+        
+        Returns:
+            Dict of TTS statistics
+        """
+        if self.local_voice is not None:
+            return self.local_voice.stats()
+        return {
+            "engine": "openai" if self.use_openai else "gtts" if self.use_gtts else "http",
+            "last_processing_time": round(self.last_processing_time, 3),
+        }
+    
     def get_config(self) -> Dict[str, Any]:
         """
         Get the current configuration.
@@ -288,6 +354,7 @@ class TTSClient:
         """
         return {
             "api_endpoint": self.api_endpoint if not self.use_openai else "OpenAI",
+            "engine": self.stats()["engine"],
             "model": self.model,
             "voice": self.voice,
             "output_format": self.output_format,
@@ -5,9 +5,12 @@ Handles loading and initializing the vision model for image understanding.
 """
 
 import logging
-from typing import Optional, Any
+from typing import Any, List, Optional
 from transformers import AutoProcessor, AutoModelForImageTextToText # type: ignore
 
+from services.model_registry import register_model
+from services.shared_buffers import MemoryReader
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -26,43 +29,66 @@ class VisionService:
         self.initialized: bool = False
         self.model_name = "HuggingFaceTB/SmolVLM-256M-Instruct"
         self.default_prompt = "Describe this image in detail. Include information about objects, people, scenes, text, and any notable elements."
+        self.cache_dir: Optional[str] = None
+        self.local_files_only: bool = False
+        self._model_handle = register_model("smolvlm", self._load)
+    
+    def configure(self, cache_dir: Optional[str] = None, local_files_only: bool = False):
+        """
+        Set where model weights are cached before the model is loaded.
+        
+        Args:
+            cache_dir: Hugging Face cache directory for the weights
+            local_files_only: Never download, only use weights already cached
+        """
+        self.cache_dir = cache_dir
+        self.local_files_only = local_files_only
     
     def initialize(self):
         """
-        Initialize the model, downloading it if necessary.
-        This will be called on server startup.
+        Initialize the model, downloading it if necessary (unless
+        local_files_only is set). Called on first use or by the startup
+        warm-up.
         
         Returns:
             bool: Whether initialization was successful
         """
-        if self.initialized:
-            logger.info("Vision model already initialized")
-            return True
-        
         try:
-            import torch # type: ignore
-            
-            # Determine device (use CUDA if available)
-            self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-            logger.info(f"Using device for vision model: {self.device}")
-            
-            logger.info(f"Loading vision model {self.model_name} (this may take a while on first run)...")
-            
-            # These calls will trigger the download if the model isn't cached locally
-            self.processor = AutoProcessor.from_pretrained(self.model_name)
-            self.model = AutoModelForImageTextToText.from_pretrained(self.model_name)
-            
-            # Move model to GPU if available
-            if self.model is not None:
-                self.model = self.model.to(self.device) # type: ignore
-            
-            self.initialized = True
-            logger.info(f"Vision model loaded successfully on {self.device}")
+            self._model_handle.get()
             return True
         except Exception as e:
             logger.error(f"Error loading vision model: {e}")
             return False
     
+    def _load(self):
+        """Load the processor and model; raises on failure."""
+        import torch # type: ignore
+        
+        # Determine device (use CUDA if available)
+        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        logger.info(f"Using device for vision model: {self.device}")
+        
+        logger.info(f"Loading vision model {self.model_name} (this may take a while on first run)...")
+        
+        # These calls will trigger the download if the model isn't cached locally
+        self.processor = AutoProcessor.from_pretrained(
+            self.model_name, cache_dir=self.cache_dir, local_files_only=self.local_files_only
+        )
+        self.model = AutoModelForImageTextToText.from_pretrained(
+            self.model_name, cache_dir=self.cache_dir, local_files_only=self.local_files_only
+        )
+        
+        # Batched generation needs prompts padded on the left
+        self.processor.tokenizer.padding_side = "left"
+        
+        # Move model to GPU if available
+        if self.model is not None:
+            self.model = self.model.to(self.device) # type: ignore
+        
+        self.initialized = True
+        logger.info(f"Vision model loaded successfully on {self.device}")
+        return self.model
+    
     def process_image(self, image_base64: str, prompt: Optional[str] = None):
         """
         Process an image with SmolVLM and return a description.
@@ -74,34 +100,65 @@ class VisionService:
         Returns:
             str: Image description
         """
-        if not self.is_ready():
-            raise RuntimeError("Vision model not initialized")
-            
         try:
-            # Decode base64 image
             import base64
-            from io import BytesIO
-            from PIL import Image # type: ignore
-            import torch # type: ignore
-            
-            # Use default prompt if none provided
-            if prompt is None:
-                prompt = self.default_prompt
-            
-            # Format the prompt to include the <image> token
-            formatted_prompt = f"User uploaded this image: <image>\n{prompt}"
-            
-            # Convert base64 to image
             image_data = base64.b64decode(image_base64)
-            image = Image.open(BytesIO(image_data)).convert('RGB')
+        except Exception as e:
+            logger.error(f"Error decoding image: {e}")
+            return f"Error analyzing image: {str(e)}"
+        
+        return self.describe_images([image_data], [prompt])[0]
+    
+    def describe_images(self, images: List[bytes], prompts: Optional[List[Optional[str]]] = None) -> List[str]:
+        """
+        Describe several images with one batched generate call.
+        
+        Images that cannot be decoded get an error string and are left out
+        of the batch, so one bad upload does not fail the others.
+        
+        Args:
+            images: Encoded image files (JPEG, PNG, ...); bytes or any
+                buffer, such as a shared-memory view, which is read in place
+            prompts: One prompt per image (None entries use the default)
             
+        Returns:
+            List[str]: One description per image, in order
+        """
+        if not self.initialize():
+            raise RuntimeError("Vision model could not be loaded")
+        
+        from PIL import Image # type: ignore
+        import torch # type: ignore
+        
+        prompts = prompts or [None] * len(images)
+        descriptions: List[str] = [""] * len(images)
+        batch = []
+        for index, (image_data, prompt) in enumerate(zip(images, prompts)):
+            try:
+                image = Image.open(MemoryReader(image_data)).convert('RGB')
+            except Exception as e:
+                logger.error(f"Error decoding image: {e}")
+                descriptions[index] = f"Error analyzing image: {str(e)}"
+                continue
+            # Format the prompt to include the <image> token
+            batch.append((index, image, f"User uploaded this image: <image>\n{prompt or self.default_prompt}"))
+        
+        if not batch:
+            return descriptions
+        
+        try:
             # Prepare inputs for the model with the correct token format
-            inputs = self.processor(text=[formatted_prompt], images=[image], return_tensors="pt")
+            inputs = self.processor(
+                text=[text for _, _, text in batch],
+                images=[[image] for _, image, _ in batch],
+                padding=True,
+                return_tensors="pt"
+            )
             
             # Move inputs to the same device as the model
             inputs = {k: v.to(self.device) for k, v in inputs.items()}
             
-            # Generate description
+            # Generate descriptions
             with torch.no_grad():
                 output_ids = self.model.generate(
                     **inputs,
@@ -110,13 +167,15 @@ class VisionService:
                 )
             
             # Decode the output
-            description = self.processor.batch_decode(output_ids, skip_special_tokens=True)[0]
-            
-            return description.strip()
+            for (index, _, _), text in zip(batch, self.processor.batch_decode(output_ids, skip_special_tokens=True)):
+                descriptions[index] = text.strip()
             
         except Exception as e:
             logger.error(f"Error processing image with vision model: {e}")
-            return f"Error analyzing image: {str(e)}"
+            for index, _, _ in batch:
+                descriptions[index] = f"Error analyzing image: {str(e)}"
+        
+        return descriptions
     
     def is_ready(self):
         """
@@ -0,0 +1,332 @@
+"""
+Benchmark the /analyze-report pipeline stage by stage on a synthetic corpus.
+
+Generates digital PDFs (vector text), scanned PDFs (noisy, slightly
+rotated page images) and single scanned images, then times
+detect_file_type, rasterization, preprocess_image, OCR and
+classify_report_text separately, plus the end-to-end path the route runs.
+The LLM is replaced by a stub with a fixed latency, so only local work
+is measured. Run from the backend directory:
+
+    python -m benchmarks.analyze_pipeline --pages 1 5 20 50 --out results.json
+    python -m benchmarks.analyze_pipeline --out new.json --compare results.json --threshold 0.15
+
+With --compare, any stage that got slower (or pages/sec that dropped) by
+more than the threshold is reported and the exit status is 1.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from services import classifier
+from services.classifier import classify_report_text
+from services.ocr_engine import OCR_BACKEND, get_ocr_engine
+from services.text_extractor import (
+    DEFAULT_PREPROCESS,
+    PDF_RENDER_DPI,
+    effective_dpi,
+    extract_text_from_file,
+    image_dpi,
+    preprocess_image,
+    render_pdf_pages,
+)
+from utils.file_utils import detect_file_type
+
+KINDS = ("digital_pdf", "scanned_pdf", "scanned_image")
+SCAN_DPI = 200
+LINES_PER_PAGE = 40
+
+# Neutral filler that matches no pre_classifier rule, so classification
+# reaches the (stubbed) LLM; main() checks that most reports do
+PHRASES = [
+    "Patient attended the clinic for a scheduled review with a parent present.",
+    "History reviewed and medication list updated with no changes this visit.",
+    "General examination was unremarkable and vital signs were within range.",
+    "Discussed school progress and agreed on a follow up in three months.",
+    "Reports occasional difficulty following instructions in noisy rooms.",
+    "Reading speed is below the class average according to the teacher.",
+    "Complains of eye strain after long periods of screen use.",
+    "Immunisations are up to date and there are no known allergies.",
+]
+
+STUB_REPLY = json.dumps({
+    "primary_disability": "none",
+    "confidence": 40,
+    "summary": "Stubbed classification",
+    "assistant_to_load": "none",
+})
+
+# Share of classifications that must reach the LLM for classify_ms to mean anything
+MIN_LLM_SHARE = 0.5
+
+# Stage slowdowns smaller than this are treated as timer noise
+NOISE_FLOOR_MS = 5.0
+
+
+class StubOllamaClient:
+    def __init__(self, latency):
+        self.latency = latency
+
+    async def chat(self, **kwargs):
+        await asyncio.sleep(self.latency)
+        return {"message": {"content": STUB_REPLY}}
+
+
+def report_lines(rng, count):
+    return [rng.choice(PHRASES) for _ in range(count)]
+
+
+def pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_digital_pdf(path, pages, rng):
+    """Multi-page PDF with real text objects, built by hand."""
+    objects = {1: b"<< /Type /Catalog /Pages 2 0 R >>", 3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"}
+    kids = []
+    for page in range(pages):
+        page_id, content_id = 4 + 2 * page, 5 + 2 * page
+        kids.append(page_id)
+        body = "BT /F1 11 Tf 14 TL 60 740 Td " + " ".join(
+            f"({pdf_escape(line)}) '" for line in report_lines(rng, LINES_PER_PAGE)
+        ) + " ET"
+        stream = body.encode("latin-1")
+        objects[page_id] = (
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        objects[content_id] = b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"
+    objects[2] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        " ".join(f"{k} 0 R" for k in kids).encode(), pages,
+    )
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = {}
+        for number in sorted(objects):
+            offsets[number] = f.tell()
+            f.write(b"%d 0 obj\n" % number + objects[number] + b"\nendobj\n")
+        xref = f.tell()
+        count = max(objects) + 1
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % count)
+        for number in range(1, count):
+            f.write(b"%010d 00000 n \n" % offsets[number])
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (count, xref))
+
+
+def load_font(size):
+    try:
+        return ImageFont.truetype("DejaVuSans.ttf", size)
+    except OSError:
+        return ImageFont.load_default()
+
+
+def scanned_page(rng, dpi=SCAN_DPI):
+    width, height = int(8.5 * dpi), int(11 * dpi)
+    page = Image.new("L", (width, height), 235)
+    draw = ImageDraw.Draw(page)
+    font = load_font(int(dpi * 0.15))
+    y = int(dpi * 0.8)
+    for line in report_lines(rng, LINES_PER_PAGE):
+        draw.text((int(dpi * 0.8), y), line, fill=30, font=font)
+        y += int(dpi * 0.23)
+
+    # Scanner look: a small rotation and sensor noise
+    page = page.rotate(rng.uniform(-2, 2), resample=Image.BILINEAR, fillcolor=235)
+    noise = np.random.default_rng(rng.randrange(2 ** 32)).normal(0, 12, (height, width))
+    return Image.fromarray(np.clip(np.asarray(page, dtype=float) + noise, 0, 255).astype(np.uint8))
+
+
+def write_scanned_pdf(path, pages, rng):
+    images = [scanned_page(rng) for _ in range(pages)]
+    images[0].save(path, "PDF", resolution=SCAN_DPI, save_all=True, append_images=images[1:])
+
+
+def write_scanned_image(path, rng):
+    scanned_page(rng).save(path, dpi=(SCAN_DPI, SCAN_DPI))
+
+
+def build_corpus(folder, page_counts, seed):
+    rng = random.Random(seed)
+    corpus = []
+    for pages in page_counts:
+        for kind, writer in (("digital_pdf", write_digital_pdf), ("scanned_pdf", write_scanned_pdf)):
+            path = os.path.join(folder, f"{kind}_{pages}p.pdf")
+            writer(path, pages, rng)
+            corpus.append((f"{kind}/{pages}p", path, pages))
+    # A photo or scan of a single page
+    path = os.path.join(folder, "scanned_image_1p.png")
+    write_scanned_image(path, rng)
+    corpus.append(("scanned_image/1p", path, 1))
+    return corpus
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def peak_rss_mb():
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (2 ** 20 if sys.platform == "darwin" else 2 ** 10)
+
+
+def run_stages(path, preprocess):
+    engine = get_ocr_engine()
+    times = {}
+
+    ftype, times["detect_ms"] = timed(detect_file_type, path)
+
+    if ftype == "pdf":
+        pages, times["rasterize_ms"] = timed(render_pdf_pages, path)
+        dpis = [PDF_RENDER_DPI] * len(pages)
+    else:
+        def open_image():
+            img = Image.open(path)
+            img.load()
+            return [img]
+        pages, times["rasterize_ms"] = timed(open_image)
+        dpis = [image_dpi(pages[0])]
+
+    processed = []
+    start = time.perf_counter()
+    for page, dpi in zip(pages, dpis):
+        processed.append(preprocess_image(page, mode=preprocess, dpi=dpi))
+    times["preprocess_ms"] = (time.perf_counter() - start) * 1000
+
+    text = []
+    start = time.perf_counter()
+    for image, dpi in zip(processed, dpis):
+        text.append(engine.image_to_string(image, dpi=effective_dpi(dpi)))
+    times["ocr_ms"] = (time.perf_counter() - start) * 1000
+
+    verdict, times["classify_ms"] = timed(lambda: asyncio.run(classify_report_text("".join(text))))
+    return times, verdict.get("stage")
+
+
+def run_end_to_end(path, preprocess):
+    # What the route does, minus the upload: pages are OCR'd on the page pool
+    def pipeline():
+        ftype = detect_file_type(path)
+        text = extract_text_from_file(path, ftype, preprocess)
+        return asyncio.run(classify_report_text(text))
+    return timed(pipeline)[1]
+
+
+def benchmark(corpus, repeat, preprocess, classify_stages):
+    results = {}
+    for name, path, pages in corpus:
+        runs = []
+        for _ in range(repeat):
+            times, stage = run_stages(path, preprocess)
+            runs.append(times)
+            classify_stages.append(stage)
+        stages = {key: round(statistics.median(r[key] for r in runs), 2) for key in runs[0]}
+        end_to_end = statistics.median(run_end_to_end(path, preprocess) for _ in range(repeat))
+
+        results[name] = {
+            "pages": pages,
+            **stages,
+            "end_to_end_ms": round(end_to_end, 2),
+            "pages_per_s": round(pages / (end_to_end / 1000), 3),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+        }
+        row = results[name]
+        print(f"{name:>20} {row['detect_ms']:>8.2f} {row['rasterize_ms']:>10.1f} {row['preprocess_ms']:>10.1f} "
+              f"{row['ocr_ms']:>10.1f} {row['classify_ms']:>9.1f} {row['end_to_end_ms']:>10.1f} "
+              f"{row['pages_per_s']:>8.2f} {row['peak_rss_mb']:>8.1f}")
+    return results
+
+
+def compare(current, baseline, threshold):
+    regressions = []
+    for name, row in current.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        for key, value in row.items():
+            if key not in old:
+                continue
+            if key.endswith("_ms") and value > old[key] * (1 + threshold) and value - old[key] > NOISE_FLOOR_MS:
+                regressions.append((name, key, old[key], value))
+            elif key == "pages_per_s" and value < old[key] * (1 - threshold):
+                regressions.append((name, key, old[key], value))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", nargs="+", type=int, default=[1, 5, 20, 50])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--preprocess", default=DEFAULT_PREPROCESS)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="stub model latency in seconds")
+    parser.add_argument("--corpus", help="keep the generated corpus in this folder")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file from an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed relative slowdown")
+    args = parser.parse_args()
+
+    classifier._client = StubOllamaClient(args.llm_latency)
+
+    with tempfile.TemporaryDirectory() as scratch:
+        folder = args.corpus or scratch
+        os.makedirs(folder, exist_ok=True)
+        corpus = build_corpus(folder, args.pages, args.seed)
+
+        print(f"{'document':>20} {'detect':>8} {'rasterize':>10} {'preproc':>10} {'ocr':>10} "
+              f"{'classify':>9} {'end2end':>10} {'pages/s':>8} {'rss MB':>8}   (ms)")
+        classify_stages = []
+        results = benchmark(corpus, args.repeat, args.preprocess, classify_stages)
+
+    llm_share = classify_stages.count("llm") / len(classify_stages)
+    if llm_share < MIN_LLM_SHARE:
+        sys.exit(f"Only {llm_share:.0%} of reports reached the LLM stage; "
+                 "the corpus is hitting the rule-based shortcut and classify_ms is not measuring the LLM path")
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "ocr_backend": OCR_BACKEND,
+            "preprocess": args.preprocess,
+            "repeat": args.repeat,
+            "llm_latency": args.llm_latency,
+            "llm_share": round(llm_share, 3),
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for name, key, old, new in regressions:
+            print(f"REGRESSION {name} {key}: {old} -> {new}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
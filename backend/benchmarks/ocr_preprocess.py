@@ -0,0 +1,127 @@
+"""
+Compare OCR preprocessing modes on a folder of sample scans.
+
+Each scan (png/jpg/tiff/bmp) may have a ground-truth transcript next to it
+with the same name and a .txt extension. Run from the backend directory:
+
+    python -m benchmarks.ocr_preprocess path/to/scans --modes otsu adaptive fixed
+
+Pass --backend pytesseract to compare against the subprocess engine.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from difflib import SequenceMatcher
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from services.ocr_engine import ENGINES, OCR_BACKEND, create_ocr_engine
+from services.text_extractor import (
+    PREPROCESS_MODES,
+    effective_dpi,
+    image_dpi,
+    preprocess_image,
+)
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".tiff", ".tif", ".bmp")
+
+
+def load_samples(folder):
+    samples = []
+    for name in sorted(os.listdir(folder)):
+        stem, ext = os.path.splitext(name)
+        if ext.lower() not in IMAGE_EXTENSIONS:
+            continue
+
+        truth = None
+        truth_path = os.path.join(folder, stem + ".txt")
+        if os.path.exists(truth_path):
+            with open(truth_path, encoding="utf-8") as f:
+                truth = f.read()
+
+        samples.append((os.path.join(folder, name), truth))
+    return samples
+
+
+def normalize(text):
+    return " ".join(text.lower().split())
+
+
+def char_accuracy(expected, actual):
+    return SequenceMatcher(None, normalize(expected), normalize(actual)).ratio() * 100
+
+
+def run_mode(samples, mode, engine, repeat):
+    preprocess_ms = []
+    ocr_ms = []
+    accuracies = []
+
+    for path, truth in samples:
+        img = Image.open(path)
+        img.load()
+        dpi = image_dpi(img)
+
+        for _ in range(repeat):
+            start = time.perf_counter()
+            processed = preprocess_image(img, mode=mode, dpi=dpi)
+            preprocess_ms.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            text = engine.image_to_string(processed, dpi=effective_dpi(dpi))
+            ocr_ms.append((time.perf_counter() - start) * 1000)
+
+        if truth is not None:
+            accuracies.append(char_accuracy(truth, text))
+
+    pages = len(preprocess_ms)
+    return {
+        "mode": mode,
+        "backend": engine.name,
+        "pages": pages,
+        "preprocess_ms_per_page": round(sum(preprocess_ms) / pages, 2),
+        "ocr_ms_per_page": round(sum(ocr_ms) / pages, 2),
+        "total_ms_per_page": round((sum(preprocess_ms) + sum(ocr_ms)) / pages, 2),
+        "accuracy": round(sum(accuracies) / len(accuracies), 2) if accuracies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folder", help="Directory of sample scans with optional .txt ground truth")
+    parser.add_argument("--modes", nargs="+", default=list(PREPROCESS_MODES), choices=PREPROCESS_MODES)
+    parser.add_argument("--backend", default=OCR_BACKEND, choices=["auto", *ENGINES])
+    parser.add_argument("--repeat", type=int, default=1, help="OCR passes per page")
+    parser.add_argument("--json", dest="json_path", help="Also write results to this file")
+    args = parser.parse_args()
+
+    samples = load_samples(args.folder)
+    if not samples:
+        parser.error(f"No images found in {args.folder}")
+
+    engine = create_ocr_engine(args.backend)
+    engine.warm_up()
+    print(f"OCR backend: {engine.name}")
+
+    results = [run_mode(samples, mode, engine, args.repeat) for mode in args.modes]
+    engine.close()
+
+    print(f"{'mode':<10}{'pages':>7}{'prep ms':>10}{'ocr ms':>10}{'total ms':>10}{'accuracy':>10}")
+    for r in results:
+        accuracy = f"{r['accuracy']:.2f}" if r["accuracy"] is not None else "-"
+        print(
+            f"{r['mode']:<10}{r['pages']:>7}{r['preprocess_ms_per_page']:>10.2f}"
+            f"{r['ocr_ms_per_page']:>10.2f}{r['total_ms_per_page']:>10.2f}{accuracy:>10}"
+        )
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Time the word-level reading scorer against the old character-level
+difflib.SequenceMatcher ratio on passages of increasing length.
+
+    python -m benchmarks.reading_accuracy --words 100 1000 5000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from difflib import SequenceMatcher
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.reading_alignment import score_words
+
+VOCABULARY = (
+    "the a reading child patient quickly slowly over under house river light sound "
+    "memory pattern focus letter word sentence story page morning evening blue green"
+).split()
+
+
+def make_passage(words, rng):
+    return " ".join(rng.choice(VOCABULARY) for _ in range(words))
+
+
+def make_typed(passage, error_rate, rng):
+    typed = []
+    for word in passage.split():
+        roll = rng.random()
+        if roll < error_rate / 3:
+            continue  # skipped word
+        if roll < 2 * error_rate / 3:
+            typed.append(rng.choice(VOCABULARY))  # wrong word
+        else:
+            typed.append(word)
+        if rng.random() < error_rate / 3:
+            typed.append(rng.choice(VOCABULARY))  # extra word
+    return " ".join(typed)
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--words", nargs="+", type=int, default=[100, 500, 2000, 5000])
+    parser.add_argument("--error-rate", type=float, default=0.1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"{'words':>7}{'difflib ms':>13}{'wer ms':>10}{'align ms':>10}{'wer':>8}")
+
+    for words in args.words:
+        passage = make_passage(words, rng)
+        typed = make_typed(passage, args.error_rate, rng)
+
+        difflib_ms = best_of(lambda: SequenceMatcher(None, passage.lower(), typed.lower()).ratio(), args.repeat)
+        wer_ms = best_of(lambda: score_words(passage, typed, include_alignment=False), args.repeat)
+        align_ms = best_of(lambda: score_words(passage, typed), args.repeat)
+        wer = score_words(passage, typed, include_alignment=False)["wer"]
+
+        print(f"{words:>7}{difflib_ms:>13.2f}{wer_ms:>10.2f}{align_ms:>10.2f}{wer:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+Benchmark VisionTrackingService frame processing on a recorded webcam clip.
+
+Frames from the clip (any file cv2.VideoCapture reads, or a folder of
+JPEG/PNG images) are encoded the way the browser sends them, then replayed
+through the pipeline one stage at a time: base64 decode, imdecode, color
+conversion, landmark detection, session metrics, mesh drawing, imencode
+and base64 encode. The end-to-end fps of process_jpeg (binary stream,
+results only) and process_frame (data URL, annotated debug frame) is
+measured separately. A second pass under tracemalloc reports the peak
+bytes each stage allocates per frame. Run from the backend directory:
+
+    python -m benchmarks.vision_frames --clip recordings/webcam.mp4 --out vision.json
+
+Detection runs with a session id, i.e. in VIDEO mode like /vision/stream.
+For a profile of the live service, use ?profile=cprofile on the stream or
+POST /vision/profile instead.
+"""
+
+import argparse
+import base64
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import mediapipe as mp
+import numpy as np
+
+from services.gaze_metrics import session_metrics
+from services.vision_tracking_service import (
+    draw_landmarks,
+    landmarks_to_array,
+    pack_landmarks,
+    vision_service,
+)
+
+STAGES = ("b64decode", "imdecode", "cvtcolor", "detect", "metrics", "draw", "imencode", "b64encode")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def read_clip(path, max_frames, width):
+    if os.path.isdir(path):
+        names = sorted(n for n in os.listdir(path) if n.lower().endswith(IMAGE_EXTENSIONS))
+        frames = (cv2.imread(os.path.join(path, n)) for n in names)
+    else:
+        capture = cv2.VideoCapture(path)
+        if not capture.isOpened():
+            raise SystemExit(f"Cannot open clip {path}")
+
+        def frames_from_capture():
+            while True:
+                ok, frame = capture.read()
+                if not ok:
+                    return
+                yield frame
+        frames = frames_from_capture()
+
+    clip = []
+    for frame in frames:
+        if frame is None:
+            continue
+        if width and frame.shape[1] != width:
+            frame = cv2.resize(frame, (width, round(frame.shape[0] * width / frame.shape[1])))
+        clip.append(frame)
+        if len(clip) >= max_frames:
+            break
+    if not clip:
+        raise SystemExit(f"No frames read from {path}")
+    return clip
+
+
+def encode_clip(frames, quality):
+    # What the browser sends: a JPEG, wrapped in a data URL for the POST path
+    jpegs = [cv2.imencode(".jpg", f, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes() for f in frames]
+    urls = [f"data:image/jpeg;base64,{base64.b64encode(j).decode()}" for j in jpegs]
+    return jpegs, urls
+
+
+def run_stages(url, session_id, measure):
+    """One frame through the pipeline; measure(name, fn, *args) times each stage."""
+    jpeg = measure("b64decode", vision_service.decode_data_url, url)
+    frame = measure("imdecode", cv2.imdecode, np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+    rgb = measure("cvtcolor", cv2.cvtColor, frame, cv2.COLOR_BGR2RGB)
+
+    def detect():
+        return vision_service.detect(mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb), session_id)
+    result = measure("detect", detect)
+
+    def metrics():
+        points = landmarks_to_array(result.face_landmarks[0]) if result.face_landmarks else None
+        h, w = frame.shape[:2]
+        session = session_metrics.get(session_id)
+        session.update(points, w, h, 50.0)
+        session.snapshot()
+        if points is not None:
+            pack_landmarks(points)
+        return points
+    points = measure("metrics", metrics)
+
+    if points is not None:
+        measure("draw", draw_landmarks, frame, points)
+    else:
+        measure("draw", lambda: None)
+    buffer = measure("imencode", lambda: cv2.imencode(".jpg", frame)[1])
+    measure("b64encode", lambda: base64.b64encode(buffer).decode())
+    return points is not None
+
+
+def stage_times(urls, session_id):
+    times = {name: [] for name in STAGES}
+
+    def measure(name, fn, *args):
+        start = time.perf_counter()
+        value = fn(*args)
+        times[name].append((time.perf_counter() - start) * 1000)
+        return value
+
+    faces = sum(run_stages(url, session_id, measure) for url in urls)
+    return times, faces
+
+
+def stage_allocations(urls, session_id):
+    allocations = {name: [] for name in STAGES}
+
+    def measure(name, fn, *args):
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        value = fn(*args)
+        _, peak = tracemalloc.get_traced_memory()
+        allocations[name].append(peak - before)
+        return value
+
+    tracemalloc.start()
+    try:
+        for url in urls:
+            run_stages(url, session_id, measure)
+    finally:
+        tracemalloc.stop()
+    return allocations
+
+
+def end_to_end_fps(fn, payloads, session_id, **kwargs):
+    start = time.perf_counter()
+    for payload in payloads:
+        fn(payload, session_id=session_id, **kwargs)
+    return len(payloads) / (time.perf_counter() - start)
+
+
+def summarize(values):
+    ordered = sorted(values)
+    return {
+        "mean": round(statistics.fmean(ordered), 3),
+        "p50": round(ordered[len(ordered) // 2], 3),
+        "p95": round(ordered[int(0.95 * (len(ordered) - 1))], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clip", required=True, help="video file or folder of frames")
+    parser.add_argument("--frames", type=int, default=300, help="use at most this many frames")
+    parser.add_argument("--width", type=int, default=640, help="resize frames to this width (0 keeps the size)")
+    parser.add_argument("--quality", type=int, default=80, help="JPEG quality of the replayed frames")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--no-alloc", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--out", help="write results to this JSON file")
+    args = parser.parse_args()
+
+    frames = read_clip(args.clip, args.frames, args.width)
+    jpegs, urls = encode_clip(frames, args.quality)
+    h, w = frames[0].shape[:2]
+    print(f"{len(frames)} frames of {w}x{h}, mean JPEG {statistics.fmean(map(len, jpegs)) / 1024:.1f} KB")
+
+    # Model load and the first VIDEO-mode frames are not representative
+    for url in urls[:args.warmup]:
+        vision_service.process_frame(url, session_id="warmup")
+    vision_service.release_session("warmup")
+
+    times, faces = stage_times(urls, "bench-stages")
+    vision_service.release_session("bench-stages")
+    allocations = None if args.no_alloc else stage_allocations(urls, "bench-alloc")
+    vision_service.release_session("bench-alloc")
+
+    fps = {
+        "stream_results_only": round(end_to_end_fps(vision_service.process_jpeg, jpegs, "bench-stream"), 2),
+        "post_annotated": round(end_to_end_fps(vision_service.process_frame, urls, "bench-post", annotate=True), 2),
+    }
+    vision_service.release_session("bench-stream")
+    vision_service.release_session("bench-post")
+
+    stages = {}
+    print(f"\n{'stage':>10} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'alloc KB':>9}")
+    for name in STAGES:
+        row = {"ms": summarize(times[name])}
+        if allocations is not None:
+            row["alloc_kb"] = round(statistics.fmean(allocations[name]) / 1024, 1)
+        stages[name] = row
+        alloc = f"{row['alloc_kb']:>9.1f}" if "alloc_kb" in row else f"{'-':>9}"
+        print(f"{name:>10} {row['ms']['mean']:>9.3f} {row['ms']['p50']:>9.3f} {row['ms']['p95']:>9.3f} {alloc}")
+
+    total = sum(stages[name]["ms"]["mean"] for name in STAGES)
+    print(f"{'total':>10} {total:>9.3f}")
+    print(f"\nFace found in {faces}/{len(urls)} frames")
+    for mode, value in fps.items():
+        print(f"{mode}: {value:.1f} fps")
+
+    if args.out:
+        report = {
+            "meta": {
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "cpus": os.cpu_count(),
+                "clip": args.clip,
+                "frames": len(frames),
+                "size": [w, h],
+                "quality": args.quality,
+            },
+            "faces": faces,
+            "stages": stages,
+            "fps": fps,
+        }
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,16 @@
-from fastapi import FastAPI
+import math
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from routes.analyze import router as analyze_router
 from routes.assessment import router as assessment_router
 from routes.vision_tracking import router as vision_router
+from services.admission import Busy, resource_stats
+from services.model_registry import model_states, warm_up
+
+# Loaded in the background once the server is accepting requests;
+# anything else loads on first use
+WARM_UP_MODELS = ("face_landmarker", "tesseract")
 
 app = FastAPI(title="Medical Report Analyzer")
 
@@ -19,6 +27,37 @@ app.include_router(vision_router, prefix="/vision")
 app.include_router(analyze_router)
 
 
+@app.exception_handler(Busy)
+async def busy_handler(request: Request, exc: Busy):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc), "resource": exc.resource, "retry_after": exc.retry_after},
+        headers={"Retry-After": str(math.ceil(exc.retry_after))},
+    )
+
+
+@app.on_event("startup")
+def start_model_warm_up():
+    warm_up(WARM_UP_MODELS)
+
+
+@app.get("/ready")
+def ready():
+    models = model_states()
+    # Lazily loaded models that nobody has asked for yet don't block readiness
+    is_ready = all(m["state"] in ("ready", "not_loaded") for m in models.values())
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={"ready": is_ready, "models": models},
+    )
+
+
+@app.get("/admission")
+def admission():
+    # Per-resource running/queued jobs and rejections by reason
+    return resource_stats()
+
+
 if __name__ == "__main__":
     import uvicorn
 
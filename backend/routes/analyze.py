@@ -1,6 +1,8 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, status
-from services.text_extractor import extract_text_from_file
-from services.classifier import classify_report_text
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
+from services.admission import Busy
+from services.text_extractor import extract_text_from_file, ocr_admission, DEFAULT_PREPROCESS, PREPROCESS_MODES
+from services.classifier import classify_report_text, classifier_admission
 from utils.file_utils import save_upload_to_temp, detect_file_type
 import os
 
@@ -8,9 +10,11 @@ router = APIRouter()
 
 
 @router.post("/analyze-report")
-async def analyze_report(file: UploadFile = File(...)):
+async def analyze_report(file: UploadFile = File(...), preprocess: str = Query(DEFAULT_PREPROCESS)):
     if not file.filename:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No file uploaded")
+    if preprocess not in PREPROCESS_MODES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"preprocess must be one of {', '.join(PREPROCESS_MODES)}")
     if file.size > 10 * 1024 * 1024:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="File too large")
     temp_path = None
@@ -20,19 +24,23 @@ async def analyze_report(file: UploadFile = File(...)):
         if ftype not in ("pdf", "image"):
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported file type")
 
-        text = extract_text_from_file(temp_path, ftype)
-        text = extract_text_from_file(temp_path, ftype)
+        # OCR is CPU-bound; keep it off the event loop. Report analysis is
+        # admitted as batch work: when OCR or the classifier is overloaded
+        # it is refused with Busy (429) rather than queued without limit
+        async with ocr_admission.admit("batch"):
+            text = await run_in_threadpool(extract_text_from_file, temp_path, ftype, preprocess)
 
         print("===== EXTRACTED TEXT START =====")
         print(text[:2000])
         print("===== EXTRACTED TEXT END =====")
-        analysis = classify_report_text(text)
+        async with classifier_admission.admit("batch"):
+            analysis = await classify_report_text(text)
 
         assistant_to_load = analysis.get("assistant_to_load", "")
 
         return {"status": "success", "analysis": analysis, "assistant_to_load": assistant_to_load}
 
-    except HTTPException:
+    except (HTTPException, Busy):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,20 +1,137 @@
-from fastapi import APIRouter
-from services.mock_db import ASSESSMENT_DATA
-from services.report_service import generate_report, calculate_domain_scores
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+from services.assessment_store import DEMO_USER_ID, assessment_store
+from services.gaze_metrics import session_metrics
+from services.score_history import DEFAULT_WINDOW, population_percentile, session_series
+from services.assistant_rules import triage
 from services.assistant_service import decide_assistant
+from services.text_scoring_service import text_scoring_service
 
 router = APIRouter()
 
+def load_report(user_id: str, session_id: Optional[str]):
+    report = assessment_store.get_report(user_id, session_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="No results recorded for this session")
+    return report
+
 @router.get("/report")
-def get_report():
-    return generate_report(ASSESSMENT_DATA)
+def get_report(user_id: str = DEMO_USER_ID, session_id: Optional[str] = None):
+    return load_report(user_id, session_id)
 
 @router.get("/assistant")
-def generate_assistant():
-    domain_scores = calculate_domain_scores(ASSESSMENT_DATA)
-    assistant = decide_assistant(domain_scores)
+def generate_assistant(user_id: str = DEMO_USER_ID, session_id: Optional[str] = None, version: Optional[str] = None):
+    report = load_report(user_id, session_id)
+    domain_scores = report["domain_scores"]
+    try:
+        assistant = decide_assistant(domain_scores, report["detailed_scores"], version)
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     return {
         "assistant": assistant,
         "domain_scores": domain_scores
-    }
\ No newline at end of file
+    }
+
+
+class TestResult(BaseModel):
+    domain: str
+    test: str
+    score: float
+
+class RecordResultsRequest(BaseModel):
+    user_id: str
+    session_id: str
+    results: List[TestResult]
+
+@router.post("/results")
+def record_results(req: RecordResultsRequest):
+    domain_scores = assessment_store.record_results(
+        req.user_id, req.session_id, ((r.domain, r.test, r.score) for r in req.results)
+    )
+    return {"user_id": req.user_id, "session_id": req.session_id, "domain_scores": domain_scores}
+
+
+class Trial(BaseModel):
+    domain: str = "vision"
+    test: Optional[str] = None
+    # Non-reading trials report their score directly
+    score: Optional[float] = None
+    # Reading trials: accuracy, or the passage and what was typed
+    accuracy: Optional[float] = None
+    original_text: Optional[str] = None
+    typed_text: Optional[str] = None
+    stability: float = 0
+    movement: float = 0
+    # Tracked camera session; its metrics replace the client estimates
+    vision_session_id: Optional[str] = None
+
+class BatchScoreRequest(BaseModel):
+    trials: List[Trial]
+    # When both are set, each named trial's score is saved as a test result
+    user_id: Optional[str] = None
+    session_id: Optional[str] = None
+
+@router.post("/score-batch")
+def score_batch(req: BatchScoreRequest):
+    trials = []
+    for trial in req.trials:
+        trial = trial.model_dump()
+        metrics = session_metrics.get(trial["vision_session_id"], create=False) if trial["vision_session_id"] else None
+        snapshot = metrics.snapshot() if metrics is not None else None
+        if snapshot and snapshot["face_frames"]:
+            trial["stability"] = snapshot["behavioral_stability"]
+            trial["movement"] = snapshot["movement_score"]
+        trials.append(trial)
+
+    try:
+        scored = text_scoring_service.score_trials(trials)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if req.user_id and req.session_id:
+        scored["domain_scores"] = assessment_store.record_results(req.user_id, req.session_id, (
+            (t["domain"], t["test"], t["score"]) for t in scored["trials"] if t["test"]
+        ))
+    return scored
+
+
+@router.get("/history")
+def get_history(
+    user_id: str = DEMO_USER_ID,
+    domain: Optional[str] = None,
+    test: Optional[str] = None,
+    window: int = DEFAULT_WINDOW,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+):
+    return {
+        "user_id": user_id,
+        "window": window,
+        "series": session_series(user_id, domain, test, window, since, until),
+    }
+
+@router.get("/percentile")
+def get_percentile(domain: str, user_id: str = DEMO_USER_ID, test: Optional[str] = None):
+    result = population_percentile(user_id, domain, test)
+    if result is None:
+        raise HTTPException(status_code=404, detail="No results recorded for this domain")
+    return result
+
+
+class BulkTriageRequest(BaseModel):
+    # Rule table version to apply (default: the active one)
+    version: Optional[str] = None
+    # Also evaluate under this version and report which decisions change
+    compare_to: Optional[str] = None
+    # Limit to these users (default: everyone)
+    user_ids: Optional[List[str]] = None
+    # Every stored session instead of each user's latest
+    all_sessions: bool = False
+
+@router.post("/assistant/bulk")
+def bulk_triage(req: BulkTriageRequest):
+    try:
+        return triage(req.version, req.compare_to, req.user_ids, req.all_sessions)
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,12 +1,179 @@
-from fastapi import APIRouter
+import asyncio
+import binascii
+import uuid
+from typing import Optional
+from fastapi import APIRouter, HTTPException, WebSocket
 from pydantic import BaseModel
-from services.vision_tracking_service import vision_service
+from services.admission import Busy
+from services.frame_profiler import ProfilerBusy, frame_profiler
+from services.gaze_metrics import session_metrics
+from services.text_scoring_service import text_scoring_service
+from services.vision_tracking_service import vision_admission, vision_service
 
 router = APIRouter()
 
 class FrameRequest(BaseModel):
     frame: str
+    # The calibration page still renders the server-drawn frame
+    annotate: bool = True
+    landmarks: bool = False
+    # Frames sharing a session_id are tracked by one VIDEO-mode landmarker
+    # and accumulate server-side stability metrics
+    session_id: Optional[str] = None
 
 @router.post("/process-frame")
 async def process_frame(req: FrameRequest):
-    return vision_service.process_frame(req.frame)
\ No newline at end of file
+    async with vision_admission.admit("interactive"):
+        return await vision_service.run(vision_service.process_frame, req.frame, req.landmarks, req.annotate, req.session_id)
+
+
+class ProfileRequest(BaseModel):
+    session_id: str
+    mode: str = "cprofile"
+    frames: int = 100
+
+@router.post("/profile")
+def start_profile(req: ProfileRequest):
+    # Profiles the next `frames` frames of one session (POST or stream)
+    try:
+        return frame_profiler.arm(req.session_id, req.mode, req.frames)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.get("/profile")
+def profile_status():
+    return frame_profiler.status()
+
+@router.delete("/profile")
+def stop_profile(session_id: Optional[str] = None):
+    # Reports whatever frames were profiled so far
+    return frame_profiler.disarm(session_id)
+
+
+class FinalScoreRequest(BaseModel):
+    original_text: str
+    typed_text: str = ""
+    time_taken: Optional[float] = None
+    # Client-side estimates, used only when no tracked frame had a face
+    stability_metrics: float = 0
+    movement_metrics: float = 0
+    session_id: Optional[str] = None
+
+@router.post("/final-score")
+async def final_score(req: FinalScoreRequest):
+    reading = text_scoring_service.score_reading(req.original_text, req.typed_text)
+    accuracy = reading.pop("reading_accuracy")
+    stability, movement = req.stability_metrics, req.movement_metrics
+
+    metrics = session_metrics.get(req.session_id, create=False) if req.session_id else None
+    snapshot = metrics.snapshot() if metrics is not None else None
+    if snapshot and snapshot["face_frames"]:
+        stability = snapshot["behavioral_stability"]
+        movement = snapshot["movement_score"]
+
+    result = text_scoring_service.calculate_final_score(accuracy, stability, movement)
+    result["reading_breakdown"] = reading
+    if snapshot:
+        result["session_metrics"] = snapshot
+    return result
+
+
+class LatestFrame:
+    """
+    Single-slot mailbox: a new frame replaces any frame that has not been
+    picked up yet, so a slow server always works on the most recent one.
+    """
+
+    def __init__(self):
+        self.frame = None
+        self.received = 0
+        self.dropped = 0
+        self._ready = asyncio.Event()
+
+    def put(self, frame: bytes):
+        self.received += 1
+        if self.frame is not None:
+            self.dropped += 1
+        self.frame = frame
+        self._ready.set()
+
+    async def take(self) -> bytes:
+        await self._ready.wait()
+        self._ready.clear()
+        frame, self.frame = self.frame, None
+        return frame
+
+
+@router.websocket("/stream")
+async def stream_frames(
+    websocket: WebSocket,
+    landmarks: bool = False,
+    debug: bool = False,
+    profile: Optional[str] = None,
+    profile_frames: int = 100,
+):
+    """
+    Binary JPEG frames in, one compact JSON result out per processed frame.
+    Text messages holding a base64 data URL are accepted too.
+
+    ?landmarks=true adds the packed mesh, ?debug=true the annotated frame,
+    ?profile=cprofile|tracemalloc profiles this session's first
+    profile_frames frames (report at GET /vision/profile).
+    """
+    await websocket.accept()
+    slot = LatestFrame()
+    session_id = uuid.uuid4().hex
+
+    if profile:
+        try:
+            frame_profiler.arm(session_id, profile, profile_frames)
+        except (ValueError, ProfilerBusy) as e:
+            print("Profiling not started:", e)
+
+    async def process_latest():
+        while True:
+            frame = await slot.take()
+            try:
+                async with vision_admission.admit("interactive"):
+                    result = await vision_service.run(vision_service.process_jpeg, frame, landmarks, debug, session_id)
+            except Busy as e:
+                # Shed this frame; the client may keep sending, newer frames replace it
+                await websocket.send_json({"busy": True, "retry_after": e.retry_after, "session_id": session_id})
+                continue
+            except Exception as e:
+                # One failing frame must not end the stream
+                print("Frame processing error:", e)
+                await websocket.send_json({"error": "Frame processing failed", "session_id": session_id})
+                continue
+            if result is None:
+                result = {"distance": 0, "calibration_status": "Invalid frame"}
+            await websocket.send_json({
+                **result,
+                "session_id": session_id,
+                "frame": slot.received,
+                "dropped": slot.dropped,
+            })
+
+    processor = asyncio.create_task(process_latest())
+    try:
+        while not processor.done():
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+
+            if message.get("bytes") is not None:
+                slot.put(message["bytes"])
+            elif message.get("text"):
+                try:
+                    slot.put(vision_service.decode_data_url(message["text"]))
+                except (binascii.Error, ValueError):
+                    await websocket.send_json({"error": "Invalid frame data", "session_id": session_id})
+    finally:
+        if processor.done() and not processor.cancelled() and processor.exception() is not None:
+            print("Frame processor stopped:", processor.exception())
+        processor.cancel()
+        # A stream that closes before its profiled frames are done must not keep the profiler armed
+        await vision_service.run(frame_profiler.disarm, session_id)
+        await vision_service.run(vision_service.release_session, session_id)
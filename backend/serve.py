@@ -0,0 +1,277 @@
+"""
+Production launcher: several uvicorn workers behind a session-affinity router.
+
+    python serve.py --workers 4 --port 8000
+
+The supervisor imports the heavy libraries once (their code and data pages
+are then shared copy-on-write by every forked worker), binds one loopback
+port per worker and forks:
+
+  - N workers, each a full copy of main:app on 127.0.0.1:<port + 1 + i>
+  - a router on --host:--port that hands each connection to a worker
+
+Vision sessions (VIDEO-mode landmarkers, gaze metrics, profiling) live in
+the worker that saw them, so the router keys connections by session: an
+X-Session-Id header or a session_id query parameter, else the client
+address (X-Forwarded-For aware). Keys map to workers by rendezvous
+hashing, so a worker that dies only moves its own sessions. Plain HTTP
+requests are forwarded with "Connection: close" so each one is routed on
+its own key; a WebSocket stays on its worker for its lifetime. Assessment
+results are in SQLite, which every worker shares.
+
+The MediaPipe landmarker is not fork-safe once built and is only a few
+MB, so each worker loads its own. Thread pools are sized to the CPUs per
+worker, and dead workers are restarted on the port they had.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import signal
+import socket
+import sys
+import time
+from urllib.parse import parse_qs, urlsplit
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+MAX_HEAD_BYTES = 64 * 1024
+PIPE_CHUNK = 64 * 1024
+# A worker that exits sooner than this after starting is restarted with a delay
+MIN_UPTIME = 5.0
+RESTART_DELAY = 2.0
+
+# Imported by the supervisor so forked workers share them
+PRELOAD_MODULES = ("numpy", "cv2", "mediapipe", "fastapi", "pydantic", "PIL.Image", "pdfplumber")
+
+
+def preload():
+    for name in PRELOAD_MODULES:
+        try:
+            __import__(name)
+        except ImportError as e:
+            print(f"Preload of {name} skipped:", e)
+
+
+def bind(host, port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+# ---------- Router ----------
+
+def pick_workers(key, ports):
+    # Rendezvous hashing: best-scoring worker first, the rest as fallbacks
+    def score(port):
+        return hashlib.blake2b(f"{key}|{port}".encode(), digest_size=8).digest()
+    return sorted(ports, key=score, reverse=True)
+
+
+def parse_head(head):
+    lines = head.decode("latin-1").split("\r\n")
+    method, target, version = lines[0].split(" ", 2)
+    headers = []
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers.append((name.strip(), value.strip()))
+    return method, target, version, headers
+
+
+def affinity_key(target, headers, peer):
+    values = {name.lower(): value for name, value in headers}
+    if values.get("x-session-id"):
+        return "s:" + values["x-session-id"]
+    session = parse_qs(urlsplit(target).query).get("session_id")
+    if session:
+        return "s:" + session[0]
+    forwarded = values.get("x-forwarded-for")
+    return "c:" + (forwarded.split(",")[0].strip() if forwarded else peer)
+
+
+def rewrite_head(method, target, version, headers, peer):
+    upgrade = any(n.lower() == "upgrade" for n, _ in headers)
+    out = []
+    forwarded = None
+    for name, value in headers:
+        lower = name.lower()
+        if lower == "x-forwarded-for":
+            forwarded = value
+            continue
+        if lower in ("connection", "keep-alive") and not upgrade:
+            continue
+        out.append(f"{name}: {value}")
+    out.append(f"X-Forwarded-For: {forwarded + ', ' + peer if forwarded else peer}")
+    if not upgrade:
+        # One request per backend connection, so every request is routed by its own key
+        out.append("Connection: close")
+    return (f"{method} {target} {version}\r\n" + "\r\n".join(out) + "\r\n\r\n").encode("latin-1")
+
+
+async def pipe(reader, writer):
+    try:
+        while True:
+            data = await reader.read(PIPE_CHUNK)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+    except (ConnectionError, asyncio.CancelledError):
+        pass
+    finally:
+        try:
+            writer.close()
+        except Exception:
+            pass
+
+
+async def handle(client_reader, client_writer, ports):
+    peer = client_writer.get_extra_info("peername")[0]
+    try:
+        head = await client_reader.readuntil(b"\r\n\r\n")
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+        client_writer.close()
+        return
+
+    try:
+        method, target, version, headers = parse_head(head[:-4])
+    except ValueError:
+        client_writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+        client_writer.close()
+        return
+
+    for port in pick_workers(affinity_key(target, headers, peer), ports):
+        try:
+            worker_reader, worker_writer = await asyncio.open_connection("127.0.0.1", port)
+            break
+        except OSError:
+            continue
+    else:
+        client_writer.write(b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+        client_writer.close()
+        return
+
+    worker_writer.write(rewrite_head(method, target, version, headers, peer))
+    upstream = asyncio.ensure_future(pipe(client_reader, worker_writer))
+    # The worker closes after its response (or when the WebSocket ends)
+    await pipe(worker_reader, client_writer)
+    upstream.cancel()
+
+
+def run_router(sock, ports):
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    async def serve():
+        server = await asyncio.start_server(
+            lambda r, w: handle(r, w, ports), sock=sock, limit=MAX_HEAD_BYTES
+        )
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+# ---------- Workers ----------
+
+def run_worker(sock, threads):
+    # Pool sizes are read at import time, so set them before main is imported
+    os.environ.setdefault("VISION_WORKERS", str(max(2, threads)))
+    os.environ.setdefault("OCR_POOL_SIZE", str(threads))
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    import uvicorn
+
+    config = uvicorn.Config(
+        "main:app",
+        proxy_headers=True,
+        forwarded_allow_ips="127.0.0.1",
+        log_level="info",
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+# ---------- Supervisor ----------
+
+class Supervisor:
+    def __init__(self, args):
+        self.args = args
+        self.children = {}
+        self.started = {}
+        self.stopping = False
+        self.threads = max(1, (os.cpu_count() or 1) // args.workers)
+        self.router_sock = bind(args.host, args.port)
+        self.worker_socks = [bind("127.0.0.1", args.port + 1 + i) for i in range(args.workers)]
+        self.ports = [s.getsockname()[1] for s in self.worker_socks]
+
+    def spawn(self, role):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                if role == "router":
+                    run_router(self.router_sock, self.ports)
+                else:
+                    run_worker(self.worker_socks[role], self.threads)
+            except BaseException as e:
+                if not isinstance(e, (KeyboardInterrupt, SystemExit)):
+                    print(f"{role} crashed:", e)
+                    code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = role
+        self.started[role] = time.monotonic()
+
+    def stop(self, signum, frame):
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        for i in range(self.args.workers):
+            self.spawn(i)
+        self.spawn("router")
+        print(f"Serving on {self.args.host}:{self.args.port} with {self.args.workers} workers "
+              f"on ports {self.ports[0]}-{self.ports[-1]} ({self.threads} threads each)")
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            role = self.children.pop(pid, None)
+            if role is None or self.stopping:
+                continue
+            print(f"{'Router' if role == 'router' else f'Worker {role}'} exited "
+                  f"(status {os.waitstatus_to_exitcode(status)}), restarting")
+            if time.monotonic() - self.started[role] < MIN_UPTIME:
+                time.sleep(RESTART_DELAY)
+            if not self.stopping:
+                self.spawn(role)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    preload()
+    Supervisor(args).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Admission control for model-bound work (OCR, the classifier LLM, face
+landmarks).
+
+Each registered resource runs a limited number of jobs at once. Jobs
+beyond that wait in a queue per priority class, and interactive jobs
+always start before batch jobs on the same resource. Resources are
+independent: live vision frames (interactive, on "vision") and report
+analysis (batch, on "ocr" and "classifier") are each limited on their
+own, not ordered against each other.
+Rather than letting everything pile up and slow down together, a job is
+refused with Busy when:
+
+  - the resource's token bucket is empty (a cap on the sustained rate;
+    batch jobs also need the bucket at least half full, which keeps the
+    rest for interactive work),
+  - its priority's queue is full, or
+  - it waited longer than its priority's queue deadline.
+
+Busy carries a retry_after hint; main.py turns it into 429 + Retry-After
+and resource_stats() feeds /admission.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+
+PRIORITIES = ("interactive", "batch")
+SERVICE_TIME_SMOOTHING = 0.2
+MIN_RETRY_AFTER = 1.0
+
+
+class Busy(Exception):
+    def __init__(self, resource, reason, retry_after):
+        super().__init__(f"{resource} is busy ({reason}), retry in {retry_after:.1f}s")
+        self.resource = resource
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, reserve=0.0):
+        self._refill()
+        if self.tokens - 1 < reserve:
+            return False
+        self.tokens -= 1
+        return True
+
+    def wait_time(self, reserve=0.0):
+        self._refill()
+        return max(0.0, (1 + reserve - self.tokens) / self.rate)
+
+
+class Resource:
+    """
+    Async admission gate; use as `async with resource.admit("batch"): ...`.
+    State is only touched from the event loop, so no locks are needed.
+    """
+
+    def __init__(self, name, concurrency, rate, burst, max_queue, queue_timeout):
+        self.name = name
+        self.concurrency = concurrency
+        self.bucket = TokenBucket(rate, burst)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.running = 0
+        self.service_time = 1.0
+        self.admitted = 0
+        self.queued = {p: 0 for p in PRIORITIES}
+        self.rejected = {"rate": 0, "queue": 0, "deadline": 0}
+        self._waiters = []
+        self._seq = itertools.count()
+
+    def _retry_after(self, priority):
+        ahead = sum(self.queued[p] for p in PRIORITIES[:PRIORITIES.index(priority) + 1])
+        return max(MIN_RETRY_AFTER, round((ahead / self.concurrency + 1) * self.service_time, 1))
+
+    def _reject(self, reason, retry_after):
+        self.rejected[reason] += 1
+        return Busy(self.name, reason, retry_after)
+
+    def _release(self):
+        self.running -= 1
+        while self._waiters:
+            _, _, priority, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self.queued[priority] -= 1
+            self.running += 1
+            future.set_result(None)
+            return
+
+    async def _acquire(self, priority):
+        rank = PRIORITIES.index(priority)
+        reserve = 0.0 if rank == 0 else self.bucket.burst / 2
+        if not self.bucket.take(reserve):
+            raise self._reject("rate", max(MIN_RETRY_AFTER, round(self.bucket.wait_time(reserve), 1)))
+
+        if self.running < self.concurrency and not self._waiters:
+            self.running += 1
+            return
+
+        if self.queued[priority] >= self.max_queue[priority]:
+            raise self._reject("queue", self._retry_after(priority))
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (rank, next(self._seq), priority, future))
+        self.queued[priority] += 1
+        try:
+            await asyncio.wait_for(future, self.queue_timeout[priority])
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                return  # handed a slot just as the deadline passed
+            self.queued[priority] -= 1
+            raise self._reject("deadline", self._retry_after(priority))
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release()
+            else:
+                self.queued[priority] -= 1
+            raise
+
+    @asynccontextmanager
+    async def admit(self, priority="batch"):
+        await self._acquire(priority)
+        self.admitted += 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.service_time += SERVICE_TIME_SMOOTHING * (time.monotonic() - start - self.service_time)
+            self._release()
+
+    def stats(self):
+        return {
+            "running": self.running,
+            "concurrency": self.concurrency,
+            "queued": dict(self.queued),
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "tokens": round(self.bucket.tokens, 1),
+            "service_time": round(self.service_time, 3),
+        }
+
+
+_resources = {}
+
+
+def register_resource(name, concurrency, rate, burst, max_queue, queue_timeout):
+    resource = Resource(name, concurrency, rate, burst, max_queue, queue_timeout)
+    _resources[name] = resource
+    return resource
+
+
+def resource_stats():
+    return {name: resource.stats() for name, resource in _resources.items()}
@@ -0,0 +1,283 @@
+"""
+SQLite store for assessment test results, keyed by user and session.
+
+Writes upsert individual test scores, append them to the test_runs
+history (see score_history) and adjust a per-domain running total/count
+in the same transaction, so domain averages are never recomputed from
+the raw scores. Reads go through an in-process LRU cache
+of finished report payloads that every write for the same user drops.
+Writes from other processes (serve.py workers) are noticed through a
+write sequence number that every write bumps: when PRAGMA data_version
+shows another connection has committed, sequence numbers this process did
+not write clear the whole cache. Commits from this process's own threads
+are already handled per user.
+
+The database runs in WAL mode so readers never block the writer; each
+thread gets its own connection.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+
+from services.mock_db import ASSESSMENT_DATA
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.environ.get("ASSESSMENT_DB_PATH", os.path.join(BACKEND_DIR, "assessments.db"))
+REPORT_CACHE_SIZE = 1024
+
+# The sample assessment is loaded into an empty database under this user so
+# the report pages work before any real results are recorded
+DEMO_USER_ID = "demo"
+DEMO_SESSION_ID = "demo"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (user_id, session_id)
+);
+CREATE INDEX IF NOT EXISTS sessions_by_user ON sessions (user_id, updated_at);
+
+CREATE TABLE IF NOT EXISTS test_results (
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    test TEXT NOT NULL,
+    score REAL NOT NULL,
+    recorded_at REAL NOT NULL,
+    PRIMARY KEY (user_id, session_id, domain, test)
+);
+
+-- Append-only: every recorded run, including ones later re-recorded
+CREATE TABLE IF NOT EXISTS test_runs (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    test TEXT NOT NULL,
+    score REAL NOT NULL,
+    recorded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS test_runs_by_user ON test_runs (user_id, domain, test, recorded_at);
+CREATE INDEX IF NOT EXISTS test_runs_by_test ON test_runs (domain, test, recorded_at);
+
+-- Single row, bumped by every write, so a process can tell its own commits from others'
+CREATE TABLE IF NOT EXISTS write_log (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    seq INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO write_log VALUES (1, 0);
+
+CREATE TABLE IF NOT EXISTS domain_aggregates (
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    total REAL NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (user_id, session_id, domain)
+);
+"""
+
+
+class AssessmentStore:
+    def __init__(self, path=DB_PATH, cache_size=REPORT_CACHE_SIZE):
+        self.path = path
+        self.cache_size = cache_size
+        self._local = threading.local()
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._writes = 0
+        # Write sequence numbers accounted for, and this process's commits beyond them
+        self._seen_seq = 0
+        self._own_seqs = set()
+
+        conn = self.connection()
+        conn.executescript(SCHEMA)
+        self._seen_seq = self._write_seq(conn)
+        # Databases created before run history existed start it from their current results
+        if conn.execute("SELECT 1 FROM test_runs LIMIT 1").fetchone() is None:
+            conn.execute(
+                "INSERT INTO test_runs (user_id, session_id, domain, test, score, recorded_at) "
+                "SELECT user_id, session_id, domain, test, score, recorded_at FROM test_results"
+            )
+        if conn.execute("SELECT 1 FROM sessions LIMIT 1").fetchone() is None:
+            self.record_results(DEMO_USER_ID, DEMO_SESSION_ID, (
+                (domain, test, score)
+                for domain, tests in ASSESSMENT_DATA.items()
+                for test, score in tests.items()
+            ))
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; writes open their own BEGIN IMMEDIATE
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def record_results(self, user_id: str, session_id: str, results: Iterable[Tuple[str, str, float]]) -> dict:
+        """
+        Upsert (domain, test, score) results and return the session's new
+        domain scores.
+        """
+        now = time.time()
+        conn = self.connection()
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO sessions VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (user_id, session_id) DO UPDATE SET updated_at = excluded.updated_at",
+                (user_id, session_id, now, now),
+            )
+            for domain, test, score in results:
+                old = conn.execute(
+                    "SELECT score FROM test_results WHERE user_id = ? AND session_id = ? AND domain = ? AND test = ?",
+                    (user_id, session_id, domain, test),
+                ).fetchone()
+                conn.execute(
+                    "INSERT INTO test_results VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (user_id, session_id, domain, test) "
+                    "DO UPDATE SET score = excluded.score, recorded_at = excluded.recorded_at",
+                    (user_id, session_id, domain, test, score, now),
+                )
+                conn.execute(
+                    "INSERT INTO test_runs (user_id, session_id, domain, test, score, recorded_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (user_id, session_id, domain, test, score, now),
+                )
+                # A re-recorded test replaces its old score in the running total
+                delta, added = (score - old[0], 0) if old else (score, 1)
+                conn.execute(
+                    "INSERT INTO domain_aggregates VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (user_id, session_id, domain) "
+                    "DO UPDATE SET total = total + excluded.total, count = count + excluded.count",
+                    (user_id, session_id, domain, delta, added),
+                )
+            conn.execute("UPDATE write_log SET seq = seq + 1 WHERE id = 1")
+            seq = self._write_seq(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        with self._cache_lock:
+            self._own_seqs.add(seq)
+        self._invalidate(user_id)
+        return self._load_domain_scores(user_id, session_id)
+
+    def _invalidate(self, user_id: str):
+        with self._cache_lock:
+            self._writes += 1
+            for key in [k for k in self._cache if k[0] == user_id]:
+                del self._cache[key]
+
+    @staticmethod
+    def _write_seq(conn) -> int:
+        return conn.execute("SELECT seq FROM write_log WHERE id = 1").fetchone()[0]
+
+    def _check_external_writes(self):
+        # data_version moves when any other connection commits: this
+        # process's other threads (already invalidated per user) or other
+        # worker processes, whose writes never reach _invalidate here
+        conn = self.connection()
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if getattr(self._local, "data_version", None) == version:
+            return
+        self._local.data_version = version
+
+        seq = self._write_seq(conn)
+        with self._cache_lock:
+            if seq <= self._seen_seq:
+                return
+            own = {s for s in self._own_seqs if s <= seq}
+            external = seq - self._seen_seq > len(own)
+            self._own_seqs -= own
+            self._seen_seq = seq
+            if external:
+                self._writes += 1
+                self._cache.clear()
+
+    def latest_session(self, user_id: str) -> Optional[str]:
+        row = self.connection().execute(
+            "SELECT session_id FROM sessions WHERE user_id = ? ORDER BY updated_at DESC LIMIT 1",
+            (user_id,),
+        ).fetchone()
+        return row[0] if row else None
+
+    def _load_domain_scores(self, user_id: str, session_id: str) -> dict:
+        rows = self.connection().execute(
+            "SELECT domain, total, count FROM domain_aggregates WHERE user_id = ? AND session_id = ? AND count > 0",
+            (user_id, session_id),
+        )
+        return {domain: round(total / count, 2) for domain, total, count in rows}
+
+    def _load_report(self, user_id: str, session_id: Optional[str]) -> Optional[dict]:
+        if session_id is None:
+            session_id = self.latest_session(user_id)
+            if session_id is None:
+                return None
+
+        # One read transaction so scores and aggregates come from the same snapshot
+        conn = self.connection()
+        conn.execute("BEGIN")
+        try:
+            detailed = {}
+            rows = conn.execute(
+                "SELECT domain, test, score FROM test_results WHERE user_id = ? AND session_id = ? ORDER BY rowid",
+                (user_id, session_id),
+            )
+            for domain, test, score in rows:
+                detailed.setdefault(domain, {})[test] = score
+            domain_scores = self._load_domain_scores(user_id, session_id)
+        finally:
+            conn.execute("COMMIT")
+
+        if not detailed:
+            return None
+
+        return {
+            "user_id": user_id,
+            "session_id": session_id,
+            "domain_scores": domain_scores,
+            "detailed_scores": detailed,
+        }
+
+    def get_report(self, user_id: str, session_id: Optional[str] = None) -> Optional[dict]:
+        """
+        Report payload for a session (default: the user's latest), or None.
+        Callers must not mutate the returned dict; it is shared by the cache.
+        """
+        key = (user_id, session_id)
+        self._check_external_writes()
+        with self._cache_lock:
+            report = self._cache.get(key)
+            if report is not None:
+                self._cache.move_to_end(key)
+                return report
+            writes = self._writes
+
+        report = self._load_report(user_id, session_id)
+        if report is not None:
+            with self._cache_lock:
+                # A write that landed while loading may have made this stale
+                if self._writes != writes:
+                    return report
+                self._cache[key] = report
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return report
+
+    def get_domain_scores(self, user_id: str, session_id: Optional[str] = None) -> Optional[dict]:
+        report = self.get_report(user_id, session_id)
+        return report["domain_scores"] if report else None
+
+
+assessment_store = AssessmentStore()
@@ -0,0 +1,216 @@
+"""
+Versioned rule tables for choosing an assistant from assessment scores.
+
+A rule table gives, per domain, the assistant it triggers, the threshold
+its (weighted) average must reach, optional per-subtest weights and
+optional per-subtest overrides: a subtest scoring below its override
+triggers the domain's assistant whatever the average. Tables are compiled
+once into arrays, so one evaluation call triages any number of
+assessments with a handful of matrix operations.
+
+Add a new version instead of editing a published one, so stored triage
+results stay reproducible; ASSISTANT_RULES_VERSION picks the default.
+"""
+
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.assessment_store import DEMO_USER_ID, AssessmentStore, assessment_store
+
+NO_ASSISTANT = "No Assistant Needed"
+MULTI_ASSIST = "Multi-Assist Mode"
+
+RULE_TABLES = {
+    "v1": {
+        "domains": {
+            "vision": {"assistant": "Vision Assistant", "threshold": 70, "weights": {}, "overrides": {}},
+            "hearing": {"assistant": "Hearing Assistant", "threshold": 70, "weights": {}, "overrides": {}},
+            "cognitive": {"assistant": "Cognitive Assistant", "threshold": 70, "weights": {}, "overrides": {}},
+        },
+    },
+}
+
+ACTIVE_VERSION = os.environ.get("ASSISTANT_RULES_VERSION", "v1")
+
+# (domain, test) score column; test is None for an already averaged domain score
+Column = Tuple[str, Optional[str]]
+
+
+class CompiledRules:
+    def __init__(self, version: str, table: dict):
+        self.version = version
+        self.domains = list(table["domains"])
+        specs = [table["domains"][d] for d in self.domains]
+        self.assistants = np.array([spec["assistant"] for spec in specs] + [NO_ASSISTANT, MULTI_ASSIST], dtype=object)
+        self.thresholds = np.array([spec["threshold"] for spec in specs], dtype=float)
+        self._weights = {(d, t): w for d, spec in zip(self.domains, specs) for t, w in spec.get("weights", {}).items()}
+        self._overrides = {(d, t): v for d, spec in zip(self.domains, specs) for t, v in spec.get("overrides", {}).items()}
+        self._domain_index = {d: i for i, d in enumerate(self.domains)}
+
+    def _compile_columns(self, columns: Sequence[Column]):
+        # Columns from domains the table does not know carry no weight
+        member = np.zeros((len(columns), len(self.domains)))
+        weights = np.ones(len(columns))
+        overrides = np.full(len(columns), -np.inf)
+        for c, (domain, test) in enumerate(columns):
+            index = self._domain_index.get(domain)
+            if index is not None:
+                member[c, index] = 1.0
+            weights[c] = self._weights.get((domain, test), 1.0)
+            overrides[c] = self._overrides.get((domain, test), -np.inf)
+        return member, weights, overrides
+
+    def evaluate(self, columns: Sequence[Column], scores: np.ndarray) -> dict:
+        """
+        scores is (assessments, columns) with NaN where a test was not taken.
+        Returns per-assessment domain scores, triggered domains and decisions.
+        """
+        scores = np.atleast_2d(np.asarray(scores, dtype=float))
+        member, weights, overrides = self._compile_columns(columns)
+
+        present = ~np.isnan(scores)
+        filled = np.where(present, scores, 0.0)
+        totals = (filled * weights) @ member
+        counts = (present * weights) @ member
+        domain_scores = np.divide(totals, counts, out=np.full_like(totals, np.nan), where=counts > 0)
+
+        # Missing domains compare as NaN, which is never below the threshold
+        with np.errstate(invalid="ignore"):
+            triggered = domain_scores < self.thresholds
+        triggered |= ((present & (filled < overrides)) @ member) > 0
+
+        n_triggered = triggered.sum(axis=1)
+        choice = np.where(
+            n_triggered == 0, len(self.domains),
+            np.where(n_triggered == 1, triggered.argmax(axis=1), len(self.domains) + 1),
+        )
+
+        return {
+            "domain_scores": domain_scores,
+            "triggered": triggered,
+            "assistant": self.assistants[choice],
+        }
+
+    def decide(self, domain_scores: Dict[str, float], detailed_scores: Optional[Dict[str, Dict[str, float]]] = None) -> str:
+        if detailed_scores:
+            columns = [(d, t) for d, tests in detailed_scores.items() for t in tests]
+            row = [detailed_scores[d][t] for d, t in columns]
+        else:
+            columns = [(d, None) for d in domain_scores]
+            row = list(domain_scores.values())
+        return str(self.evaluate(columns, np.array([row], dtype=float))["assistant"][0])
+
+
+_compiled: Dict[str, CompiledRules] = {}
+
+
+def get_rules(version: Optional[str] = None) -> CompiledRules:
+    version = version or ACTIVE_VERSION
+    if version not in _compiled:
+        if version not in RULE_TABLES:
+            raise KeyError(f"Unknown assistant rule table {version!r}")
+        _compiled[version] = CompiledRules(version, RULE_TABLES[version])
+    return _compiled[version]
+
+
+def load_score_matrix(
+    user_ids: Optional[List[str]] = None,
+    all_sessions: bool = False,
+    store: AssessmentStore = assessment_store,
+):
+    """
+    Stored test results pivoted into a (sessions, columns) matrix, one row
+    per user's latest session (or per session with all_sessions).
+    Returns (keys, columns, scores) with keys as (user_id, session_id).
+    The seeded demo user is left out unless it is named in user_ids.
+    """
+    where = []
+    params = []
+    if user_ids is not None:
+        where.append(f"r.user_id IN ({', '.join('?' * len(user_ids))})")
+        params.extend(user_ids)
+    else:
+        where.append("r.user_id != ?")
+        params.append(DEMO_USER_ID)
+
+    if all_sessions:
+        source = "test_results r"
+    else:
+        # SQLite returns the session_id of the row holding MAX(updated_at)
+        source = (
+            "test_results r JOIN (SELECT user_id, session_id, MAX(updated_at) FROM sessions GROUP BY user_id) s "
+            "ON s.user_id = r.user_id AND s.session_id = r.session_id"
+        )
+
+    rows = store.connection().execute(
+        f"SELECT r.user_id, r.session_id, r.domain, r.test, r.score FROM {source}"
+        + (f" WHERE {' AND '.join(where)}" if where else ""),
+        params,
+    ).fetchall()
+    if not rows:
+        return [], [], np.empty((0, 0))
+
+    users, sessions, domains, tests, values = zip(*rows)
+    row_keys, row_index = np.unique(
+        np.array([f"{u}\x00{s}" for u, s in zip(users, sessions)]), return_inverse=True
+    )
+    column_keys, column_index = np.unique(
+        np.array([f"{d}\x00{t}" for d, t in zip(domains, tests)]), return_inverse=True
+    )
+
+    scores = np.full((len(row_keys), len(column_keys)), np.nan)
+    scores[row_index, column_index] = values
+
+    keys = [tuple(k.split("\x00", 1)) for k in row_keys]
+    columns = [tuple(k.split("\x00", 1)) for k in column_keys]
+    return keys, columns, scores
+
+
+def triage(
+    version: Optional[str] = None,
+    compare_to: Optional[str] = None,
+    user_ids: Optional[List[str]] = None,
+    all_sessions: bool = False,
+    store: AssessmentStore = assessment_store,
+) -> dict:
+    """
+    Evaluate stored assessments under a rule table. With compare_to, each
+    result also carries the decision under that version and whether it changed.
+    """
+    rules = get_rules(version)
+    baseline = get_rules(compare_to) if compare_to else None
+    keys, columns, scores = load_score_matrix(user_ids, all_sessions, store)
+
+    evaluated = rules.evaluate(columns, scores) if keys else None
+    previous = baseline.evaluate(columns, scores)["assistant"] if baseline and keys else None
+
+    results = []
+    for i, (user_id, session_id) in enumerate(keys):
+        result = {
+            "user_id": user_id,
+            "session_id": session_id,
+            "assistant": evaluated["assistant"][i],
+            "domain_scores": {
+                d: round(float(s), 2)
+                for d, s in zip(rules.domains, evaluated["domain_scores"][i])
+                if not np.isnan(s)
+            },
+        }
+        if previous is not None:
+            result["previous_assistant"] = previous[i]
+            result["changed"] = bool(previous[i] != evaluated["assistant"][i])
+        results.append(result)
+
+    decisions, counts = np.unique(evaluated["assistant"].astype(str), return_counts=True) if keys else ((), ())
+    summary = {
+        "version": rules.version,
+        "evaluated": len(keys),
+        "decisions": {str(d): int(c) for d, c in zip(decisions, counts)},
+        "results": results,
+    }
+    if baseline is not None:
+        summary["compare_to"] = baseline.version
+        summary["changed"] = sum(r["changed"] for r in results)
+    return summary
@@ -1,19 +1,8 @@
-def decide_assistant(domain_scores):
-    assistants = []
+from services.assistant_rules import get_rules
 
-    if domain_scores["vision"] < 70:
-        assistants.append("Vision Assistant")
 
-    if domain_scores["hearing"] < 70:
-        assistants.append("Hearing Assistant")
-
-    if domain_scores["cognitive"] < 70:
-        assistants.append("Cognitive Assistant")
-
-    if not assistants:
-        return "No Assistant Needed"
-
-    if len(assistants) == 1:
-        return assistants[0]
-
-    return "Multi-Assist Mode"
\ No newline at end of file
+def decide_assistant(domain_scores, detailed_scores=None, version=None):
+    # Thresholds, weights and subtest overrides live in the versioned
+    # rule tables in assistant_rules; with detailed_scores the domain
+    # averages are recomputed with the table's weights
+    return get_rules(version).decide(domain_scores, detailed_scores)
@@ -1,29 +1,123 @@
-import ollama
-import json
+import asyncio
 import re
+from typing import List, Literal, Optional
+
+import ollama
+from pydantic import BaseModel, ValidationError, field_validator
+
+from services.admission import register_resource
+from services.pre_classifier import DOMAIN_ASSISTANTS, pre_classify
 
 MODEL_NAME = "llama3"
+OLLAMA_HOST = "http://127.0.0.1:11434"
+
+# Keep llama3 loaded between uploads instead of Ollama's 5 minute default
+KEEP_ALIVE = "30m"
+MAX_CONCURRENT_REQUESTS = 4
+MAX_RETRIES = 1
+REQUEST_TIMEOUT = 120
+
+# Reports longer than CHUNK_TOKENS are split into sections that are
+# classified concurrently and then merged (see reduce_classifications)
+CHUNK_TOKENS = 1500
+MAP_CONCURRENCY = 4
+CHARS_PER_TOKEN = 4
+# Minimum section confidence for a domain to count towards the verdict
+EVIDENCE_THRESHOLD = 60
+
+FALLBACK_RESULT = {
+    "primary_disability": "none",
+    "confidence": 0,
+    "summary": "Could not classify report",
+    "assistant_to_load": "none",
+    "stage": "llm",
+}
+
+
+class ReportClassification(BaseModel):
+    primary_disability: Literal["visual", "hearing", "cognitive", "multiple", "none"]
+    confidence: int
+    summary: str
+    assistant_to_load: Literal["visual_assistant", "speech_assistant", "learning_assistant", "none"]
+
+    @field_validator("confidence", mode="before")
+    @classmethod
+    def clamp_confidence(cls, value):
+        return max(0, min(100, int(float(value))))
+
 
+# The schema is sent as Ollama's `format`, so decoding is constrained to it
+RESPONSE_SCHEMA = ReportClassification.model_json_schema()
 
-def extract_json(text: str):
+_client = None
+_semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+# Reports classified at once; their sections share _semaphore
+classifier_admission = register_resource(
+    "classifier", concurrency=2, rate=0.5, burst=6,
+    max_queue={"interactive": 2, "batch": 8},
+    queue_timeout={"interactive": 10.0, "batch": 90.0},
+)
+
+
+def get_client():
+    # One AsyncClient per process so its HTTP connections are reused
+    global _client
+    if _client is None:
+        _client = ollama.AsyncClient(host=OLLAMA_HOST, timeout=REQUEST_TIMEOUT)
+    return _client
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def split_into_chunks(text: str, chunk_tokens: int = CHUNK_TOKENS) -> List[str]:
     """
-    Safely extract JSON from LLM output
+    Split on paragraph, then line, then word boundaries so that no chunk
+    exceeds roughly chunk_tokens tokens.
     """
-    match = re.search(r"\{.*\}", text, re.DOTALL)
-    if not match:
-        return None
+    max_chars = chunk_tokens * CHARS_PER_TOKEN
+    pieces = []
+
+    for paragraph in re.split(r"\n\s*\n", text):
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+            continue
+        for line in paragraph.splitlines():
+            if len(line) <= max_chars:
+                pieces.append(line)
+                continue
+            words = line.split()
+            for i in range(0, len(words), max(1, max_chars // 8)):
+                pieces.append(" ".join(words[i:i + max(1, max_chars // 8)]))
+
+    chunks = []
+    current = ""
+    for piece in pieces:
+        piece = piece.strip()
+        if not piece:
+            continue
+        if current and len(current) + len(piece) + 2 > max_chars:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current}\n\n{piece}" if current else piece
 
-    try:
-        return json.loads(match.group())
-    except:
-        return None
+    if current:
+        chunks.append(current)
+    return chunks
 
 
-def classify_report_text(text: str):
-    prompt = f"""
+def build_prompt(text: str, section: Optional[str] = None) -> str:
+    scope = "the report"
+    if section:
+        scope = f"{section} of a longer report. Judge only what this section says"
+
+    return f"""
 You are a medical disability classifier.
 
-Analyze the report and return ONLY valid JSON.
+Analyze {scope} and return ONLY valid JSON.
 
 Format EXACTLY like this:
 
@@ -38,32 +132,127 @@ Report:
 {text}
 """
 
-    try:
-        response = ollama.chat(
+
+async def request_classification(prompt: str) -> ReportClassification:
+    async with _semaphore:
+        response = await get_client().chat(
             model=MODEL_NAME,
             messages=[{"role": "user", "content": prompt}],
+            format=RESPONSE_SCHEMA,
+            options={"temperature": 0},
+            keep_alive=KEEP_ALIVE,
         )
 
-        raw = response["message"]["content"]
-        print("===== LLM RAW OUTPUT =====")
-        print(raw)
+    raw = response["message"]["content"]
+    print("===== LLM RAW OUTPUT =====")
+    print(raw)
 
-        parsed = extract_json(raw)
+    return ReportClassification.model_validate_json(raw)
 
-        if not parsed:
-            raise Exception("LLM returned invalid JSON")
 
-        # Ensure safe defaults
-        parsed["confidence"] = max(0, min(100, int(parsed.get("confidence", 0))))
+async def classify_prompt(prompt: str) -> Optional[ReportClassification]:
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            return await request_classification(prompt)
+        except ValidationError as e:
+            print(f"Classifier returned invalid JSON (attempt {attempt + 1}):", e)
+        except Exception as e:
+            print("Classifier error:", e)
+            break
 
-        return parsed
+    return None
 
-    except Exception as e:
-        print("Classifier error:", e)
 
+def reduce_classifications(sections: List[ReportClassification]) -> dict:
+    """
+    Merge per-section verdicts. A domain counts if any section reports it
+    with at least EVIDENCE_THRESHOLD confidence; two or more domains make
+    the report "multiple".
+    """
+    assistant_domains = {assistant: domain for domain, assistant in DOMAIN_ASSISTANTS.items()}
+    evidence = {}
+    summaries = {}
+    multiple_seen = False
+
+    for section in sections:
+        if section.primary_disability == "none" or section.confidence < EVIDENCE_THRESHOLD:
+            continue
+
+        domain = section.primary_disability
+        if domain == "multiple":
+            # The section does not say which domains, only which one leads
+            multiple_seen = True
+            domain = assistant_domains.get(section.assistant_to_load)
+            if domain is None:
+                continue
+
+        if section.confidence > evidence.get(domain, -1):
+            evidence[domain] = section.confidence
+            summaries[domain] = section.summary
+
+    if not evidence and not multiple_seen:
+        confidence = max((s.confidence for s in sections if s.primary_disability == "none"), default=0)
         return {
             "primary_disability": "none",
-            "confidence": 0,
-            "summary": "Could not classify report",
+            "confidence": confidence,
+            "summary": "No section of the report indicates a disability",
             "assistant_to_load": "none",
-        }
\ No newline at end of file
+            "stage": "llm",
+        }
+
+    ranked = sorted(evidence, key=evidence.get, reverse=True)
+
+    if not ranked:
+        # Only "multiple" sections that named no assistant
+        best = max((s for s in sections if s.primary_disability == "multiple"), key=lambda s: s.confidence)
+        return {**best.model_dump(), "stage": "llm"}
+
+    strongest = ranked[0]
+
+    if len(ranked) == 1 and not multiple_seen:
+        primary = strongest
+        confidence = evidence[strongest]
+    else:
+        primary = "multiple"
+        confidence = round(sum(evidence.values()) / len(evidence))
+
+    return {
+        "primary_disability": primary,
+        "confidence": confidence,
+        "summary": " ".join(summaries[d] for d in ranked),
+        "assistant_to_load": DOMAIN_ASSISTANTS[strongest],
+        "stage": "llm",
+    }
+
+
+async def classify_chunked(text: str, chunk_tokens: int = CHUNK_TOKENS, concurrency: int = MAP_CONCURRENCY) -> dict:
+    chunks = split_into_chunks(text, chunk_tokens)
+    limit = asyncio.Semaphore(concurrency)
+
+    async def classify_section(index, chunk):
+        async with limit:
+            return await classify_prompt(build_prompt(chunk, section=f"Section {index + 1} of {len(chunks)}"))
+
+    results = await asyncio.gather(*(classify_section(i, c) for i, c in enumerate(chunks)))
+    sections = [r for r in results if r is not None]
+
+    if not sections:
+        return dict(FALLBACK_RESULT)
+
+    return reduce_classifications(sections)
+
+
+async def classify_report_text(text: str, chunk_tokens: int = CHUNK_TOKENS, concurrency: int = MAP_CONCURRENCY):
+    # "stage" in the result records whether rules, the TF-IDF model or the LLM decided
+    verdict = pre_classify(text)
+    if verdict is not None:
+        return verdict
+
+    if estimate_tokens(text) > chunk_tokens:
+        return await classify_chunked(text, chunk_tokens, concurrency)
+
+    result = await classify_prompt(build_prompt(text))
+    if result is None:
+        return dict(FALLBACK_RESULT)
+
+    return {**result.model_dump(), "stage": "llm"}
@@ -0,0 +1,178 @@
+"""
+On-demand profiling of the live frame pipeline for one session.
+
+arm() picks a session and a number of frames; those frames then run under
+cProfile or tracemalloc, and when they are done the top entries are kept
+as a report (cProfile stats are also written to PROFILE_DIR for snakeviz
+or pstats). Only one session is profiled at a time, and its frames are
+serialized while profiling. A session that is disarmed (or whose stream
+closes) before its frames are done is reported with the frames it ran, and
+a session still armed after PROFILE_TIMEOUT seconds is disarmed the same way.
+
+Both profilers see the whole process: since Python 3.12 cProfile hooks
+every thread while enabled, and tracemalloc is always process-wide, so
+frames from other sessions that run at the same time can show up.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import tempfile
+import threading
+import time
+import tracemalloc
+
+PROFILE_MODES = ("cprofile", "tracemalloc")
+PROFILE_DIR = os.environ.get("VISION_PROFILE_DIR", tempfile.gettempdir())
+MAX_PROFILE_FRAMES = 1000
+TOP_ENTRIES = 25
+PROFILE_TIMEOUT = 300
+
+
+class ProfilerBusy(RuntimeError):
+    pass
+
+
+class FrameProfiler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._frame_lock = threading.Lock()
+        self.session_id = None
+        self.mode = None
+        self.remaining = 0
+        self._frames = 0
+        self._frame_seconds = 0.0
+        self._frame_allocations = []
+        self._profile = None
+        self._owns_tracemalloc = False
+        self.armed_at = 0.0
+        self.last_report = None
+
+    def arm(self, session_id: str, mode: str = "cprofile", frames: int = 100) -> dict:
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"mode must be one of {', '.join(PROFILE_MODES)}")
+        frames = max(1, min(frames, MAX_PROFILE_FRAMES))
+        self._expire()
+
+        with self._lock:
+            if self.session_id is not None:
+                raise ProfilerBusy(f"Already profiling session {self.session_id}")
+            self.session_id = session_id
+            self.mode = mode
+            self.remaining = frames
+            self._frames = 0
+            self._frame_seconds = 0.0
+            self._frame_allocations = []
+            self.armed_at = time.monotonic()
+            if mode == "cprofile":
+                self._profile = cProfile.Profile()
+            elif not tracemalloc.is_tracing():
+                # Tracing someone else started is left running afterwards
+                tracemalloc.start()
+                self._owns_tracemalloc = True
+        return self.status()
+
+    def disarm(self, session_id: str = None) -> dict:
+        # Ends profiling early (session_id None: whatever is armed)
+        with self._frame_lock:
+            if self.session_id is not None and session_id in (None, self.session_id):
+                self._finish()
+        return self.status()
+
+    def _expire(self):
+        if self.session_id is not None and time.monotonic() - self.armed_at > PROFILE_TIMEOUT:
+            self.disarm()
+
+    def status(self) -> dict:
+        self._expire()
+        if self.session_id is None:
+            return {"active": False, "last_report": self.last_report}
+        return {
+            "active": True,
+            "session_id": self.session_id,
+            "mode": self.mode,
+            "frames_done": self._frames,
+            "frames_remaining": self.remaining,
+        }
+
+    def call(self, session_id, fn, *args):
+        # Cheap check first: unprofiled sessions never take the locks
+        if session_id is None or session_id != self.session_id:
+            return fn(*args)
+
+        with self._frame_lock:
+            if session_id != self.session_id or self.remaining <= 0:
+                return fn(*args)
+            if time.monotonic() - self.armed_at > PROFILE_TIMEOUT:
+                self._finish()
+                return fn(*args)
+
+            start = time.perf_counter()
+            if self.mode == "cprofile":
+                self._profile.enable()
+                try:
+                    return fn(*args)
+                finally:
+                    self._profile.disable()
+                    self._frame_done(start)
+            else:
+                before, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+                try:
+                    return fn(*args)
+                finally:
+                    _, peak = tracemalloc.get_traced_memory()
+                    self._frame_allocations.append(peak - before)
+                    self._frame_done(start)
+
+    def _frame_done(self, start):
+        self._frames += 1
+        self._frame_seconds += time.perf_counter() - start
+        self.remaining -= 1
+        if self.remaining <= 0:
+            self._finish()
+
+    def _finish(self):
+        report = {
+            "session_id": self.session_id,
+            "mode": self.mode,
+            "frames": self._frames,
+            "mean_frame_ms": round(1000 * self._frame_seconds / max(self._frames, 1), 2),
+        }
+
+        if not self._frames:
+            # Disarmed before any frame ran: nothing to report
+            self._profile = None
+        elif self.mode == "cprofile":
+            path = os.path.join(PROFILE_DIR, f"vision-{self.session_id}-{int(time.time())}.prof")
+            self._profile.dump_stats(path)
+            text = io.StringIO()
+            pstats.Stats(self._profile, stream=text).sort_stats("cumulative").print_stats(TOP_ENTRIES)
+            report["stats_file"] = path
+            report["top"] = text.getvalue()
+            self._profile = None
+        else:
+            snapshot = tracemalloc.take_snapshot()
+            allocations = sorted(self._frame_allocations)
+            report["peak_kb_per_frame"] = {
+                "mean": round(sum(allocations) / len(allocations) / 1024, 1),
+                "p95": round(allocations[int(0.95 * (len(allocations) - 1))] / 1024, 1),
+                "max": round(allocations[-1] / 1024, 1),
+            }
+            report["top"] = [
+                {"location": str(stat.traceback), "kb": round(stat.size / 1024, 1), "blocks": stat.count}
+                for stat in snapshot.statistics("lineno")[:TOP_ENTRIES]
+            ]
+
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+            self._owns_tracemalloc = False
+
+        with self._lock:
+            self.last_report = report
+            self.session_id = None
+            self.mode = None
+
+
+frame_profiler = FrameProfiler()
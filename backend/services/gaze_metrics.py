@@ -0,0 +1,256 @@
+"""
+Streaming per-session metrics from face landmarks.
+
+Every frame updates One-Euro filters and fixed-size ring buffers in O(1),
+so head motion, blink rate and fixation stability are always current
+without keeping or rescanning the frame history.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+# ~3 s at 30 fps
+WINDOW_FRAMES = 90
+METRICS_TTL = 15 * 60
+
+# Eye aspect ratio below this counts as closed; longer closures are not blinks
+EAR_CLOSED = 0.2
+MAX_BLINK_SECONDS = 0.5
+
+# Spread (normalized units) at which each score falls to ~37 (1/e)
+HEAD_MOTION_SCALE = 0.03
+FIXATION_SCALE = 0.08
+HEAD_SPEED_SCALE = 0.25
+
+# MediaPipe face mesh indices: corners, upper and lower lids, iris centre
+LEFT_EYE = {"outer": 33, "inner": 133, "top": (160, 158), "bottom": (144, 153), "iris": 468}
+RIGHT_EYE = {"outer": 263, "inner": 362, "top": (387, 385), "bottom": (373, 380), "iris": 473}
+NOSE_TIP = 1
+
+
+class OneEuroFilter:
+    """
+    Casiez et al. 2012: low jitter when the signal is still, low lag when
+    it moves fast.
+    """
+
+    def __init__(self, min_cutoff=1.0, beta=0.05, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.x_prev = None
+        self.dx_prev = 0.0
+        self.t_prev = None
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def __call__(self, x, t):
+        if self.x_prev is None:
+            self.x_prev, self.t_prev = x, t
+            return x
+
+        dt = max(t - self.t_prev, 1e-3)
+        dx = (x - self.x_prev) / dt
+        a_d = self._alpha(self.d_cutoff, dt)
+        dx_hat = a_d * dx + (1 - a_d) * self.dx_prev
+
+        cutoff = self.min_cutoff + self.beta * abs(dx_hat)
+        a = self._alpha(cutoff, dt)
+        x_hat = a * x + (1 - a) * self.x_prev
+
+        self.x_prev, self.dx_prev, self.t_prev = x_hat, dx_hat, t
+        return x_hat
+
+
+class RollingStats:
+    """
+    Mean and variance over the last `size` samples using running sums.
+    """
+
+    def __init__(self, size=WINDOW_FRAMES):
+        self.values = np.zeros(size)
+        self.size = size
+        self.count = 0
+        self.index = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def push(self, x: float):
+        if self.count == self.size:
+            old = self.values[self.index]
+            self.total -= old
+            self.total_sq -= old * old
+        else:
+            self.count += 1
+
+        self.values[self.index] = x
+        self.index = (self.index + 1) % self.size
+        self.total += x
+        self.total_sq += x * x
+
+    @property
+    def mean(self) -> float:
+        return float(self.total / self.count) if self.count else 0.0
+
+    @property
+    def variance(self) -> float:
+        if self.count < 2:
+            return 0.0
+        return max(0.0, float(self.total_sq / self.count) - self.mean ** 2)
+
+
+def eye_aspect_ratio(px: np.ndarray, eye: dict) -> float:
+    width = np.linalg.norm(px[eye["outer"]] - px[eye["inner"]])
+    if width < 1e-6:
+        return 0.0
+    lids = sum(np.linalg.norm(px[t] - px[b]) for t, b in zip(eye["top"], eye["bottom"]))
+    return float(lids / (2 * width))
+
+
+def gaze_ratio(px: np.ndarray, eye: dict):
+    """
+    Iris position inside the eye opening, 0..1 on each axis.
+    """
+    outer, inner, iris = px[eye["outer"]], px[eye["inner"]], px[eye["iris"]]
+    span = inner[0] - outer[0]
+    gx = (iris[0] - outer[0]) / span if abs(span) > 1e-6 else 0.5
+
+    top = px[list(eye["top"])].mean(axis=0)
+    bottom = px[list(eye["bottom"])].mean(axis=0)
+    height = bottom[1] - top[1]
+    gy = (iris[1] - top[1]) / height if abs(height) > 1e-6 else 0.5
+    return float(gx), float(gy)
+
+
+class SessionMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = None
+        self.last_used = time.monotonic()
+        self.frames = 0
+        self.face_frames = 0
+
+        self.filters = {name: OneEuroFilter() for name in ("nose_x", "nose_y", "distance")}
+        self.head_x = RollingStats()
+        self.head_y = RollingStats()
+        self.head_speed = RollingStats()
+        self.gaze_x = RollingStats()
+        self.gaze_y = RollingStats()
+
+        self.prev_nose = None
+        self.prev_t = None
+        self.eyes_closed_since = None
+        self.blinks = 0
+        self.smoothed_distance = 0.0
+
+    def update(self, points: Optional[np.ndarray], width: int, height: int, distance: float, t: Optional[float] = None):
+        t = time.monotonic() if t is None else t
+        with self.lock:
+            if self.started is None:
+                self.started = t
+            self.frames += 1
+            self.last_used = t
+
+            if points is None:
+                return
+
+            self.face_frames += 1
+            nose_x = self.filters["nose_x"](float(points[NOSE_TIP, 0]), t)
+            nose_y = self.filters["nose_y"](float(points[NOSE_TIP, 1]), t)
+            self.smoothed_distance = self.filters["distance"](distance, t)
+
+            self.head_x.push(nose_x)
+            self.head_y.push(nose_y)
+            if self.prev_nose is not None:
+                dt = max(t - self.prev_t, 1e-3)
+                self.head_speed.push(math.hypot(nose_x - self.prev_nose[0], nose_y - self.prev_nose[1]) / dt)
+            self.prev_nose = (nose_x, nose_y)
+            self.prev_t = t
+
+            # Pixel space so the eye aspect ratio is not skewed by frame shape
+            px = points * (width, height)
+
+            ear = (eye_aspect_ratio(px, LEFT_EYE) + eye_aspect_ratio(px, RIGHT_EYE)) / 2
+            if ear < EAR_CLOSED:
+                if self.eyes_closed_since is None:
+                    self.eyes_closed_since = t
+            else:
+                if self.eyes_closed_since is not None and t - self.eyes_closed_since <= MAX_BLINK_SECONDS:
+                    self.blinks += 1
+                self.eyes_closed_since = None
+
+                # Iris positions are meaningless while the lids are shut
+                if len(points) > RIGHT_EYE["iris"]:
+                    lx, ly = gaze_ratio(px, LEFT_EYE)
+                    rx, ry = gaze_ratio(px, RIGHT_EYE)
+                    self.gaze_x.push((lx + rx) / 2)
+                    self.gaze_y.push((ly + ry) / 2)
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            started = self.last_used if self.started is None else self.started
+            duration = max(self.last_used - started, 1e-3)
+            visible = self.face_frames / self.frames if self.frames else 0.0
+
+            head_spread = math.sqrt(self.head_x.variance + self.head_y.variance)
+            fixation_spread = math.sqrt(self.gaze_x.variance + self.gaze_y.variance)
+
+            head_score = 100 * math.exp(-head_spread / HEAD_MOTION_SCALE)
+            fixation_score = 100 * math.exp(-fixation_spread / FIXATION_SCALE)
+            movement_score = 100 * math.exp(-self.head_speed.mean / HEAD_SPEED_SCALE)
+
+            return {
+                "frames": self.frames,
+                "face_frames": self.face_frames,
+                "duration_s": round(duration, 1),
+                "face_visible_ratio": round(visible, 3),
+                "smoothed_distance": round(self.smoothed_distance, 1),
+                "head_motion_variance": round(float(self.head_x.variance + self.head_y.variance), 6),
+                "fixation_dispersion": round(fixation_spread, 4),
+                "blink_rate_per_min": round(self.blinks * 60 / duration, 1),
+                "behavioral_stability": round((0.6 * head_score + 0.4 * fixation_score) * visible, 2),
+                "movement_score": round(movement_score * visible, 2),
+            }
+
+
+class MetricsRegistry:
+    """
+    Session metrics outlive the landmarker session so the final score can
+    still read them after the camera stream closes.
+    """
+
+    def __init__(self, ttl=METRICS_TTL):
+        self.ttl = ttl
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str, create: bool = True) -> Optional[SessionMetrics]:
+        now = time.monotonic()
+        with self._lock:
+            while self._sessions:
+                oldest_id, oldest = next(iter(self._sessions.items()))
+                if now - oldest.last_used <= self.ttl:
+                    break
+                del self._sessions[oldest_id]
+
+            metrics = self._sessions.get(session_id)
+            if metrics is None and create:
+                metrics = self._sessions[session_id] = SessionMetrics()
+            if metrics is not None:
+                self._sessions.move_to_end(session_id)
+            return metrics
+
+    def pop(self, session_id: str) -> Optional[SessionMetrics]:
+        with self._lock:
+            return self._sessions.pop(session_id, None)
+
+
+session_metrics = MetricsRegistry()
@@ -0,0 +1,159 @@
+"""
+Model files and lazily loaded model instances.
+
+resolve_model finds a model file in MODEL_CACHE_DIR (or next to this file)
+and checks its SHA-256; it only downloads when ALLOW_MODEL_DOWNLOAD=1, so
+air-gapped hosts fail fast with a clear error instead of hanging. Heavy
+objects are wrapped in LazyModel and built on first use or by warm_up()
+after the app is already serving, and model_states() feeds /ready.
+"""
+
+import hashlib
+import os
+import threading
+import time
+import urllib.request
+
+BUNDLED_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_CACHE_DIR = os.environ.get("MODEL_CACHE_DIR", BUNDLED_DIR)
+ALLOW_MODEL_DOWNLOAD = os.environ.get("ALLOW_MODEL_DOWNLOAD", "0") == "1"
+
+MODELS = {
+    "face_landmarker": {
+        "filename": "face_landmarker.task",
+        "sha256": "64184e229b263107bc2b804c6625db1341ff2bb731874b0bcc2fe6544e0bc9ff",
+        "url": "https://storage.googleapis.com/mediapipe-models/face_landmarker/face_landmarker/float16/1/face_landmarker.task",
+    },
+}
+
+
+class ModelUnavailable(RuntimeError):
+    pass
+
+
+_verified = {}
+_verified_lock = threading.Lock()
+
+
+def sha256sum(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def verify_checksum(path, expected):
+    # Hash each file once per (size, mtime) rather than on every lookup
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime)
+    with _verified_lock:
+        if key not in _verified:
+            _verified[key] = sha256sum(path) == expected
+        return _verified[key]
+
+
+def download_model(spec, destination):
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    partial = destination + ".part"
+    urllib.request.urlretrieve(spec["url"], partial)
+
+    if sha256sum(partial) != spec["sha256"]:
+        os.remove(partial)
+        raise ModelUnavailable(f"Downloaded {spec['filename']} failed checksum verification")
+    os.replace(partial, destination)
+
+
+def resolve_model(name):
+    spec = MODELS[name]
+    cached = os.path.join(MODEL_CACHE_DIR, spec["filename"])
+    bundled = os.path.join(BUNDLED_DIR, spec["filename"])
+
+    for path in dict.fromkeys((cached, bundled)):
+        if not os.path.exists(path):
+            continue
+        if verify_checksum(path, spec["sha256"]):
+            return path
+        print(f"Checksum mismatch for {path}, ignoring it")
+
+    if not ALLOW_MODEL_DOWNLOAD:
+        raise ModelUnavailable(
+            f"{spec['filename']} not found in {MODEL_CACHE_DIR}. "
+            "Copy it there or set ALLOW_MODEL_DOWNLOAD=1."
+        )
+
+    download_model(spec, cached)
+    return cached
+
+
+class LazyModel:
+    """
+    Builds its value with loader() once, on first get() or warm-up. A failed
+    load is reported by status() and retried on the next get().
+    """
+
+    def __init__(self, name, loader):
+        self.name = name
+        self.loader = loader
+        self.state = "not_loaded"
+        self.error = None
+        self.load_seconds = None
+        self._value = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self.state == "ready":
+            return self._value
+
+        with self._lock:
+            if self.state != "ready":
+                self.state = "loading"
+                start = time.perf_counter()
+                try:
+                    self._value = self.loader()
+                except Exception as e:
+                    self.state = "failed"
+                    self.error = str(e)
+                    raise
+                self.load_seconds = round(time.perf_counter() - start, 3)
+                self.error = None
+                self.state = "ready"
+        return self._value
+
+    def warm_up(self):
+        try:
+            self.get()
+        except Exception as e:
+            print(f"Failed to load {self.name}:", e)
+
+    def status(self):
+        return {"state": self.state, "error": self.error, "load_seconds": self.load_seconds}
+
+
+_lazy_models = {}
+
+
+def register_model(name, loader):
+    model = LazyModel(name, loader)
+    _lazy_models[name] = model
+    return model
+
+
+def model_states():
+    return {name: model.status() for name, model in _lazy_models.items()}
+
+
+def warm_up(names=None):
+    """
+    Load the named models (default: all) one after another in a daemon
+    thread, so startup does not wait for them.
+    """
+    models = [m for n, m in _lazy_models.items() if names is None or n in names]
+
+    def run():
+        for model in models:
+            model.warm_up()
+
+    thread = threading.Thread(target=run, name="model-warm-up", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,206 @@
+import abc
+import os
+import queue
+import threading
+
+import numpy as np
+
+from services.model_registry import register_model
+
+# Several engines run side by side, so keep each one single-threaded
+# instead of letting OpenMP oversubscribe the cores
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+import pytesseract
+pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+
+try:
+    from tesserocr import PyTessBaseAPI  # type: ignore
+except ImportError:
+    PyTessBaseAPI = None
+
+# "auto" prefers the in-process tesserocr engine and falls back to pytesseract
+OCR_BACKEND = "auto"
+OCR_LANG = "eng"
+OCR_PSM = 3  # fully automatic page segmentation
+OCR_OEM = 1  # LSTM only
+OCR_WHITELIST = None
+# serve.py sets this per worker so several workers do not oversubscribe the CPUs
+OCR_POOL_SIZE = int(os.environ.get("OCR_POOL_SIZE", 0)) or max(1, os.cpu_count() or 1)
+TESSDATA_PATH = None
+DEFAULT_DPI = 300
+
+
+class OCREngine(abc.ABC):
+    name = "base"
+
+    def __init__(self, lang=OCR_LANG, psm=OCR_PSM, oem=OCR_OEM, whitelist=OCR_WHITELIST, pool_size=OCR_POOL_SIZE):
+        self.lang = lang
+        self.psm = psm
+        self.oem = oem
+        self.whitelist = whitelist
+        self.pool_size = pool_size
+
+    @abc.abstractmethod
+    def image_to_string(self, image, dpi=None):
+        ...
+
+    def warm_up(self, count=None):
+        pass
+
+    def close(self):
+        pass
+
+
+class PytesseractEngine(OCREngine):
+    """
+    Runs the tesseract binary once per image. Always available, but every
+    call pays for a process spawn, a temp file and loading traineddata.
+    """
+
+    name = "pytesseract"
+
+    def build_config(self, dpi=None):
+        config = f"--psm {self.psm} --oem {self.oem} --dpi {int(dpi or DEFAULT_DPI)}"
+        if self.whitelist:
+            config += f" -c tessedit_char_whitelist={self.whitelist}"
+        return config
+
+    def image_to_string(self, image, dpi=None):
+        return pytesseract.image_to_string(image, lang=self.lang, config=self.build_config(dpi))
+
+
+class TesserocrEngine(OCREngine):
+    """
+    Keeps up to pool_size PyTessBaseAPI instances loaded and hands one to
+    each caller, so the language model is read once per instance rather
+    than once per page. close() ends idle instances at once and the rest
+    as their callers release them; callers still waiting get RuntimeError.
+    """
+
+    name = "tesserocr"
+
+    def __init__(self, tessdata_path=TESSDATA_PATH, **kwargs):
+        if PyTessBaseAPI is None:
+            raise RuntimeError("tesserocr is not installed")
+
+        super().__init__(**kwargs)
+        self.tessdata_path = tessdata_path
+        self._idle = queue.LifoQueue()
+        self._instances = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _create_api(self):
+        kwargs = {"lang": self.lang, "psm": self.psm, "oem": self.oem}
+        if self.tessdata_path:
+            kwargs["path"] = self.tessdata_path
+
+        api = PyTessBaseAPI(**kwargs)
+        if self.whitelist:
+            api.SetVariable("tessedit_char_whitelist", self.whitelist)
+        return api
+
+    def _acquire(self):
+        try:
+            api = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("OCR engine is closed")
+                if len(self._instances) < self.pool_size:
+                    api = self._create_api()
+                    self._instances.append(api)
+                    return api
+
+            # Pool is full, wait for another page to finish
+            api = self._idle.get()
+
+        if api is None:
+            # close() wakes waiters with None; pass it on to the next one
+            self._idle.put(None)
+            raise RuntimeError("OCR engine is closed")
+        return api
+
+    def _release(self, api):
+        api.Clear()
+        with self._lock:
+            if self._closed:
+                api.End()
+                self._instances.remove(api)
+                return
+            self._idle.put(api)
+
+    def warm_up(self, count=None):
+        target = min(count or self.pool_size, self.pool_size)
+        with self._lock:
+            while not self._closed and len(self._instances) < target:
+                api = self._create_api()
+                self._instances.append(api)
+                self._idle.put(api)
+
+    def image_to_string(self, image, dpi=None):
+        image = np.ascontiguousarray(image, dtype=np.uint8)
+        height, width = image.shape[:2]
+        channels = 1 if image.ndim == 2 else image.shape[2]
+
+        api = self._acquire()
+        try:
+            api.SetImageBytes(image.tobytes(), width, height, channels, width * channels)
+            api.SetSourceResolution(int(dpi or DEFAULT_DPI))
+            return api.GetUTF8Text()
+        finally:
+            self._release(api)
+
+    def close(self):
+        # Instances in use are ended by _release when their page is done
+        with self._lock:
+            self._closed = True
+            while True:
+                try:
+                    api = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                if api is not None:
+                    api.End()
+                    self._instances.remove(api)
+            self._idle.put(None)
+
+
+ENGINES = {
+    "tesserocr": TesserocrEngine,
+    "pytesseract": PytesseractEngine,
+}
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def create_ocr_engine(backend=OCR_BACKEND, **kwargs):
+    if backend == "auto":
+        try:
+            engine = TesserocrEngine(**kwargs)
+            # Loading one instance up front proves tessdata is usable
+            engine.warm_up(1)
+            return engine
+        except Exception as e:
+            print("tesserocr unavailable, falling back to pytesseract:", e)
+            return PytesseractEngine(**kwargs)
+
+    if backend not in ENGINES:
+        raise ValueError(f"Unknown OCR backend: {backend}")
+    return ENGINES[backend](**kwargs)
+
+
+# The configured engine is tracked by the model registry so /ready reports it
+tesseract_model = register_model("tesseract", create_ocr_engine)
+
+
+def get_ocr_engine(backend=OCR_BACKEND):
+    if backend == OCR_BACKEND:
+        return tesseract_model.get()
+
+    with _engines_lock:
+        if backend not in _engines:
+            _engines[backend] = create_ocr_engine(backend)
+        return _engines[backend]
@@ -0,0 +1,305 @@
+"""
+First-stage report classifier.
+
+Keyword/regex rules (plus an optional TF-IDF + logistic regression model
+trained from labelled reports) that settle obvious reports without the
+LLM. pre_classify returns None whenever the verdict is not clear-cut, and
+the caller escalates to llama3.
+
+Train the optional model from a JSONL file of {"text": ..., "label": ...}:
+
+    python -m services.pre_classifier labelled_reports.jsonl
+"""
+
+import json
+import os
+import re
+import sys
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import joblib  # type: ignore
+    from sklearn.feature_extraction.text import TfidfVectorizer  # type: ignore
+    from sklearn.linear_model import LogisticRegression  # type: ignore
+    from sklearn.pipeline import make_pipeline  # type: ignore
+except ImportError:
+    joblib = None
+
+DOMAIN_ASSISTANTS = {
+    "visual": "visual_assistant",
+    "hearing": "speech_assistant",
+    "cognitive": "learning_assistant",
+}
+
+STRONG = 0.9
+WEAK = 0.5
+
+# A domain is decided when its evidence reaches CONFIDENT_EVIDENCE and every
+# other domain stays below ABSENT_EVIDENCE (or is itself confident)
+CONFIDENT_EVIDENCE = 0.85
+ABSENT_EVIDENCE = 0.3
+MODEL_CONFIDENCE = 0.9
+MODEL_PATH = os.path.join(os.path.dirname(__file__), "pre_classifier.joblib")
+
+# Negated or uncertain findings, before the match ("rule out hearing loss")
+# or after it, within the sentence ("autism was ruled out", "screened for
+# autism: negative", "hearing loss was suspected")
+NEGATION = re.compile(
+    r"\b(?:no|not|without|negative for|denies|ruled out|rule out|r/o|to exclude|absence of|"
+    r"suspected|possible|probable|query|screened for|screening for|evaluate for|assess for)\b[\w\s,]{0,20}$"
+)
+POST_NEGATION = re.compile(
+    r"[^.;\n]{0,40}?(?:\b(?:ruled out|excluded|negative|not (?:confirmed|present|found|detected|seen)|"
+    r"absent|unlikely|suspected|queried|questionable)\b|\?)",
+    re.IGNORECASE,
+)
+
+# Findings about someone else ("family history of deafness", "a sibling who
+# uses hearing aids") are skipped. A sentence that merely names a relative as
+# the reporter is skipped too, which only sends the report on to the LLM.
+EXPERIENCER = re.compile(
+    r"\b(?:family history|family hx|fhx|mother|father|parents?|siblings?|brothers?|sisters?|twin|"
+    r"grand(?:mother|father|parents?)|aunt|uncle|cousin)\b",
+    re.IGNORECASE,
+)
+FAMILY_SUFFIX = re.compile(r"\W{0,3}(?:[\w-]+\s+){0,3}in (?:the |his |her |their )?family\b", re.IGNORECASE)
+EXPERIENCER_WINDOW = 60
+SENTENCE_END = re.compile(r"[.;\n]")
+
+
+def _snellen(match) -> float:
+    return _snellen_ratio(int(match.group("va_num")), int(match.group("va_den")))
+
+
+def _snellen_eye(match) -> float:
+    return _snellen_ratio(int(match.group("eye_num")), int(match.group("eye_den")))
+
+
+def _snellen_ratio(num: int, den: int) -> float:
+    if not num or not den:
+        return 0.0
+    ratio = num / den
+    if ratio <= 6 / 18:
+        return STRONG
+    if ratio <= 6 / 12:
+        return WEAK
+    return 0.0
+
+
+def _hearing_db(match) -> float:
+    db = int(match.group("db"))
+    if db > 40:
+        return STRONG
+    if db > 25:
+        return WEAK
+    return 0.0
+
+
+def _iq(match) -> float:
+    iq = int(match.group("iq"))
+    if iq < 70:
+        return STRONG
+    if iq < 85:
+        return WEAK
+    return 0.0
+
+
+# (rule name, domain, pattern, weight or function of the match)
+RULES = [
+    ("visual_acuity", "visual",
+     r"\b(?:visual acuity|vision|va|bcva)\b\W{0,10}(?:(?:re|le|od|os|ou|right eye|left eye)\W{0,5})?(?:of\W{0,3})?(?P<va_num>\d{1,2})\s*/\s*(?P<va_den>\d{1,3})\b",
+     _snellen),
+    # Further per-eye readings after the first ("VA RE 6/6 LE 6/60")
+    ("eye_acuity", "visual",
+     r"\b(?:re|le|od|os|right eye|left eye)\W{0,5}(?P<eye_num>\d{1,2})\s*/\s*(?P<eye_den>\d{1,3})\b",
+     _snellen_eye),
+    ("blindness", "visual", r"\b(?:legally blind|blindness|total blindness|no light perception)\b", STRONG),
+    ("low_vision", "visual", r"\b(?:low vision|visual impairment|visually impaired|visual disability)\b", STRONG),
+    ("eye_disease", "visual",
+     r"\b(?:glaucoma|retinitis pigmentosa|macular degeneration|optic atrophy|diabetic retinopathy|keratoconus)\b", WEAK),
+    ("eye_signs", "visual", r"\b(?:nystagmus|cataract|amblyopia|strabismus)\b", WEAK),
+
+    ("hearing_loss", "hearing",
+     r"\b(?:sensorineural|conductive|mixed|bilateral|profound|severe)\s+hearing\s+loss\b", STRONG),
+    ("hearing_impairment", "hearing", r"\b(?:hearing loss|hearing impairment|hard of hearing|deafness|deaf)\b", STRONG),
+    ("hearing_device", "hearing", r"\b(?:cochlear implant|hearing aids?)\b", STRONG),
+    ("hearing_threshold", "hearing",
+     r"\b(?:pta|pure tone average|hearing threshold)\b\D{0,20}(?P<db>\d{2,3})\s*db", _hearing_db),
+    ("hearing_signs", "hearing", r"\b(?:tinnitus|otitis media|audiogram)\b", WEAK),
+
+    ("learning_disorder", "cognitive",
+     r"\b(?:dyslexia|dyscalculia|dysgraphia|specific learning (?:disorder|disability)|learning disability)\b", STRONG),
+    ("intellectual_disability", "cognitive",
+     r"\b(?:intellectual disability|mental retardation|global developmental delay|down syndrome)\b", STRONG),
+    ("attention_autism", "cognitive",
+     r"\b(?:adhd|attention deficit|autism|autism spectrum disorder)\b", STRONG),
+    ("iq_score", "cognitive", r"\b(?:iq|fsiq|full scale iq)\b\D{0,15}(?P<iq>\d{2,3})\b", _iq),
+    ("cognitive_signs", "cognitive",
+     r"\b(?:cognitive impairment|memory deficits?|poor concentration|slow processing speed)\b", WEAK),
+]
+
+_COMBINED = re.compile(
+    "|".join(f"(?P<{name}>{pattern})" for name, _, pattern, _ in RULES),
+    re.IGNORECASE,
+)
+_RULES_BY_NAME = {name: (domain, weight) for name, domain, _, weight in RULES}
+
+
+def _other_experiencer(text: str, match) -> bool:
+    sentence = SENTENCE_END.split(text[max(0, match.start() - EXPERIENCER_WINDOW):match.start()])[-1]
+    return bool(EXPERIENCER.search(sentence) or FAMILY_SUFFIX.match(text, match.end()))
+
+
+def score_rules(text: str) -> Tuple[Dict[str, float], Dict[str, List[str]]]:
+    """
+    One regex pass over the text. Each rule counts once (its strongest
+    match) and rules combine per domain as a noisy-or.
+    """
+    best: Dict[str, float] = {}
+
+    for match in _COMBINED.finditer(text):
+        name = match.lastgroup
+        # Rule groups enclose the numeric captures, but guard against lastgroup naming one
+        if name not in _RULES_BY_NAME:
+            name = next(n for n in _RULES_BY_NAME if match.group(n) is not None)
+
+        prefix = text[max(0, match.start() - 40):match.start()].lower()
+        if NEGATION.search(prefix) or POST_NEGATION.match(text, match.end()) or _other_experiencer(text, match):
+            continue
+
+        domain, weight = _RULES_BY_NAME[name]
+        value = weight(match) if callable(weight) else weight
+        if value > best.get(name, 0.0):
+            best[name] = value
+
+    evidence: Dict[str, float] = {}
+    matched: Dict[str, List[str]] = {}
+    for name, value in best.items():
+        if value <= 0:
+            continue
+        domain = _RULES_BY_NAME[name][0]
+        evidence[domain] = 1 - (1 - evidence.get(domain, 0.0)) * (1 - value)
+        matched.setdefault(domain, []).append(name.replace("_", " "))
+
+    return evidence, matched
+
+
+def verdict_from_evidence(evidence: Dict[str, float], matched: Dict[str, List[str]]) -> Optional[dict]:
+    confident = [d for d, e in evidence.items() if e >= CONFIDENT_EVIDENCE]
+    ambiguous = [d for d, e in evidence.items() if ABSENT_EVIDENCE <= e < CONFIDENT_EVIDENCE]
+
+    if not confident or ambiguous:
+        return None
+
+    confident.sort(key=evidence.get, reverse=True)
+    strongest = confident[0]
+    primary = strongest if len(confident) == 1 else "multiple"
+    # Rules never claim certainty
+    confidence = min(99, round(100 * min(evidence[d] for d in confident)))
+
+    return {
+        "primary_disability": primary,
+        "confidence": confidence,
+        "summary": "Report mentions " + "; ".join(
+            f"{d}: {', '.join(matched[d])}" for d in confident
+        ),
+        "assistant_to_load": DOMAIN_ASSISTANTS[strongest],
+        "stage": "rules",
+    }
+
+
+class TextModel:
+    """
+    Optional TF-IDF + logistic regression over whole reports. Labels are
+    the primary_disability values.
+    """
+
+    def __init__(self, pipeline=None):
+        self.pipeline = pipeline
+
+    @classmethod
+    def train(cls, texts: List[str], labels: List[str]) -> "TextModel":
+        if joblib is None:
+            raise RuntimeError("scikit-learn is required to train the pre-classifier model")
+
+        pipeline = make_pipeline(
+            TfidfVectorizer(ngram_range=(1, 2), min_df=2, sublinear_tf=True),
+            LogisticRegression(max_iter=1000, class_weight="balanced"),
+        )
+        pipeline.fit(texts, labels)
+        return cls(pipeline)
+
+    @classmethod
+    def load(cls, path: str = MODEL_PATH) -> Optional["TextModel"]:
+        if joblib is None or not os.path.exists(path):
+            return None
+        return cls(joblib.load(path))
+
+    def save(self, path: str = MODEL_PATH) -> None:
+        joblib.dump(self.pipeline, path)
+
+    def predict(self, text: str) -> Optional[dict]:
+        probabilities = self.pipeline.predict_proba([text])[0]
+        best = probabilities.argmax()
+        label = self.pipeline.classes_[best]
+        probability = float(probabilities[best])
+
+        # "multiple" needs the LLM to pick which assistant leads
+        if probability < MODEL_CONFIDENCE or label == "multiple":
+            return None
+
+        return {
+            "primary_disability": label,
+            "confidence": round(probability * 100),
+            "summary": f"Matched labelled {label} reports",
+            "assistant_to_load": DOMAIN_ASSISTANTS.get(label, "none"),
+            "stage": "model",
+        }
+
+
+_model = None
+_model_loaded = False
+
+
+def get_model() -> Optional[TextModel]:
+    global _model, _model_loaded
+    if not _model_loaded:
+        _model = TextModel.load()
+        _model_loaded = True
+    return _model
+
+
+def pre_classify(text: str) -> Optional[dict]:
+    """
+    Verdict in the classifier's result format, or None to escalate.
+    """
+    verdict = verdict_from_evidence(*score_rules(text))
+    if verdict is not None:
+        return verdict
+
+    model = get_model()
+    if model is not None:
+        return model.predict(text)
+
+    return None
+
+
+def train_from_jsonl(path: str, out_path: str = MODEL_PATH) -> TextModel:
+    texts, labels = [], []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                texts.append(row["text"])
+                labels.append(row["label"])
+
+    model = TextModel.train(texts, labels)
+    model.save(out_path)
+    return model
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit("usage: python -m services.pre_classifier labelled_reports.jsonl [out.joblib]")
+    train_from_jsonl(*sys.argv[1:3])
+    print("Saved pre-classifier model")
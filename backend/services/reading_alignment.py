@@ -0,0 +1,186 @@
+"""
+Word-level alignment between a reading passage and what the user typed.
+
+word_edit_distance is Myers' bit-parallel algorithm in Hyyrö's formulation
+for global edit distance: one pass over the typed words, using Python ints
+as bit vectors over the passage, so the cost is O(n * m / 64) machine-word
+operations. align_words then fills only the diagonal band that an optimal
+path can use given that distance, one NumPy row at a time, and traces
+the alignment back through it.
+
+score_words only builds the alignment when it is asked for. Without it the
+operation counts come from the distance alone, split with the fewest
+insertions and deletions (the length difference); an alignment of the same
+cost may instead show a substitution as a deletion plus an insertion.
+"""
+
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+
+WORD_RE = re.compile(r"[a-z0-9']+")
+
+
+def tokenize(text: str) -> List[str]:
+    return WORD_RE.findall(text.lower())
+
+
+def word_edit_distance(reference: List[str], hypothesis: List[str]) -> int:
+    m = len(reference)
+    if m == 0:
+        return len(hypothesis)
+
+    # Peq[w] marks the positions where w occurs in reference
+    peq: Dict[str, int] = {}
+    for i, word in enumerate(reference):
+        peq[word] = peq.get(word, 0) | (1 << i)
+
+    mask = (1 << m) - 1
+    high = 1 << (m - 1)
+    pv = mask
+    mv = 0
+    score = m
+
+    for word in hypothesis:
+        eq = peq.get(word, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+
+        # Shifting in a 1 encodes the first DP row, D[0][j] = j
+        ph = ((ph << 1) | 1) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+
+    return score
+
+
+def align_words(reference: List[str], hypothesis: List[str], distance: Optional[int] = None) -> List[dict]:
+    """
+    Minimal-cost alignment as a list of
+    {"op": "match" | "substitution" | "deletion" | "insertion", "expected", "typed"}.
+    A deletion is a passage word the user left out, an insertion an extra typed word.
+    """
+    if distance is None:
+        distance = word_edit_distance(reference, hypothesis)
+
+    m, n = len(reference), len(hypothesis)
+
+    # A path through diagonal q = j - i costs at least |q| + |(n - m) - q|,
+    # so only diagonals within `slack` of the [0, n - m] corridor can be optimal
+    slack = (distance - abs(n - m)) // 2
+    q_lo = min(0, n - m) - slack
+    q_hi = max(0, n - m) + slack
+    width = q_hi - q_lo + 1
+    inf = m + n + 1
+
+    vocab: Dict[str, int] = {}
+    ref_ids = np.array([vocab.setdefault(w, len(vocab)) for w in reference], dtype=np.int64)
+    pad = width + 1
+    hyp_ids = np.full(n + 2 * pad, -1, dtype=np.int64)
+    hyp_ids[pad:pad + n] = [vocab.setdefault(w, len(vocab)) for w in hypothesis]
+
+    # table[i, k] is D[i][j] for j = i + q_lo + k (cells are diagonal-aligned)
+    table = np.full((m + 1, width), inf, dtype=np.int64)
+    steps = np.arange(width)
+
+    j0 = q_lo + steps
+    valid = (j0 >= 0) & (j0 <= n)
+    table[0, valid] = j0[valid]
+
+    up = np.empty(width, dtype=np.int64)
+    for i in range(1, m + 1):
+        prev = table[i - 1]
+        j = i + q_lo + steps
+        valid = (j >= 0) & (j <= n)
+
+        mismatch = hyp_ids[j - 1 + pad] != ref_ids[i - 1]
+        candidates = prev + mismatch
+        up[:-1] = prev[1:] + 1
+        up[-1] = inf
+        np.minimum(candidates, up, out=candidates)
+        candidates[j == 0] = i
+        candidates[~valid] = inf
+
+        # Insertions chain left to right: D[k] = min(c[k], D[k-1] + 1)
+        row = np.minimum.accumulate(candidates - steps) + steps
+        row[~valid] = inf
+        table[i] = row
+
+    def cell(i, j):
+        k = j - i - q_lo
+        if 0 <= k < width and 0 <= j <= n:
+            return table[i, k]
+        return inf
+
+    ops = []
+    i, j = m, n
+    while i > 0 or j > 0:
+        current = cell(i, j)
+        if i > 0 and j > 0:
+            same = reference[i - 1] == hypothesis[j - 1]
+            if cell(i - 1, j - 1) + (not same) == current:
+                ops.append({
+                    "op": "match" if same else "substitution",
+                    "expected": reference[i - 1],
+                    "typed": hypothesis[j - 1],
+                })
+                i, j = i - 1, j - 1
+                continue
+        if i > 0 and cell(i - 1, j) + 1 == current:
+            ops.append({"op": "deletion", "expected": reference[i - 1], "typed": None})
+            i -= 1
+        else:
+            ops.append({"op": "insertion", "expected": None, "typed": hypothesis[j - 1]})
+            j -= 1
+
+    ops.reverse()
+    return ops
+
+
+def score_words(original_text: str, typed_text: str, include_alignment: bool = True) -> dict:
+    reference = tokenize(original_text)
+    hypothesis = tokenize(typed_text)
+    distance = word_edit_distance(reference, hypothesis)
+
+    result = {
+        "reference_words": len(reference),
+        "typed_words": len(hypothesis),
+        "edit_distance": distance,
+        "wer": round(distance / len(reference), 4) if reference else 0.0,
+    }
+
+    if include_alignment:
+        alignment = align_words(reference, hypothesis, distance)
+        counts = {"match": 0, "substitution": 0, "deletion": 0, "insertion": 0}
+        for step in alignment:
+            counts[step["op"]] += 1
+    else:
+        # No O(m * d) table: derive the counts from the distance
+        m, n = len(reference), len(hypothesis)
+        deletions, insertions = max(0, m - n), max(0, n - m)
+        substitutions = distance - deletions - insertions
+        counts = {
+            "match": m - substitutions - deletions,
+            "substitution": substitutions,
+            "deletion": deletions,
+            "insertion": insertions,
+        }
+
+    result.update({
+        "correct": counts["match"],
+        "substitutions": counts["substitution"],
+        "deletions": counts["deletion"],
+        "insertions": counts["insertion"],
+    })
+    if include_alignment:
+        result["alignment"] = alignment
+    return result
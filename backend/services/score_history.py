@@ -0,0 +1,145 @@
+"""
+Longitudinal queries over the append-only test_runs history.
+
+Per-session means, rolling averages and session-to-session deltas are
+computed by SQLite window functions in a single indexed query, and
+population percentiles with NumPy over one column of scores. Results are
+columnar (one list per field) so progress charts can plot them as-is.
+"""
+
+from typing import Optional
+
+import numpy as np
+
+from services.assessment_store import DEMO_USER_ID, AssessmentStore, assessment_store
+
+DEFAULT_WINDOW = 5
+POPULATION_PERCENTILES = (10, 25, 50, 75, 90)
+
+SERIES_FIELDS = ("session_id", "recorded_at", "runs", "score", "rolling_avg", "delta")
+
+
+def session_series(
+    user_id: str,
+    domain: Optional[str] = None,
+    test: Optional[str] = None,
+    window: int = DEFAULT_WINDOW,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    store: AssessmentStore = assessment_store,
+) -> dict:
+    """
+    One series per domain, or per test when `test` is given: the mean score
+    of each session, its rolling mean over the last `window` sessions and
+    its change from the previous session. A test recorded more than once in
+    a session counts with its latest score, as in the session report;
+    "runs" still counts every recording.
+    """
+    series_column = "test" if test else "domain"
+    where = ["user_id = ?"]
+    params = [user_id]
+    for column, value in (("domain", domain), ("test", test)):
+        if value is not None:
+            where.append(f"{column} = ?")
+            params.append(value)
+    if since is not None:
+        where.append("recorded_at >= ?")
+        params.append(since)
+    if until is not None:
+        where.append("recorded_at <= ?")
+        params.append(until)
+
+    rows = store.connection().execute(
+        f"""
+        WITH runs AS (
+            SELECT {series_column} AS series, session_id, recorded_at, score,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY session_id, domain, test ORDER BY recorded_at DESC, id DESC
+                   ) AS newest
+            FROM test_runs
+            WHERE {" AND ".join(where)}
+        ),
+        per_session AS (
+            SELECT series, session_id, MAX(recorded_at) AS recorded_at,
+                   COUNT(*) AS runs, AVG(CASE WHEN newest = 1 THEN score END) AS score
+            FROM runs
+            GROUP BY series, session_id
+        )
+        SELECT series, session_id, recorded_at, runs, ROUND(score, 2),
+               ROUND(AVG(score) OVER (
+                   PARTITION BY series ORDER BY recorded_at ROWS BETWEEN ? PRECEDING AND CURRENT ROW
+               ), 2),
+               ROUND(score - LAG(score) OVER (PARTITION BY series ORDER BY recorded_at), 2)
+        FROM per_session
+        ORDER BY series, recorded_at
+        """,
+        (*params, max(window, 1) - 1),
+    ).fetchall()
+
+    series = {}
+    for row in rows:
+        columns = series.setdefault(row[0], {field: [] for field in SERIES_FIELDS})
+        for field, value in zip(SERIES_FIELDS, row[1:]):
+            columns[field].append(value)
+    return series
+
+
+def population_percentile(
+    user_id: str,
+    domain: str,
+    test: Optional[str] = None,
+    store: AssessmentStore = assessment_store,
+) -> Optional[dict]:
+    """
+    Where the user's latest session score for a domain (or one test) sits
+    among every user's latest score for the same thing. The seeded demo
+    user is left out of the population unless it is the one asking.
+    """
+    conn = store.connection()
+    # SQLite returns the session_id of the row holding MAX(updated_at)
+    latest = "SELECT user_id, session_id, MAX(updated_at) FROM sessions WHERE user_id != ? OR user_id = ? GROUP BY user_id"
+    population = (DEMO_USER_ID, user_id)
+    if test is None:
+        rows = conn.execute(
+            f"""
+            SELECT a.user_id, a.total / a.count
+            FROM domain_aggregates a
+            JOIN ({latest}) s ON s.user_id = a.user_id AND s.session_id = a.session_id
+            WHERE a.domain = ? AND a.count > 0
+            """,
+            (*population, domain),
+        ).fetchall()
+    else:
+        rows = conn.execute(
+            f"""
+            SELECT r.user_id, r.score
+            FROM test_results r
+            JOIN ({latest}) s ON s.user_id = r.user_id AND s.session_id = r.session_id
+            WHERE r.domain = ? AND r.test = ?
+            """,
+            (*population, domain, test),
+        ).fetchall()
+
+    if not rows:
+        return None
+
+    users, scores = zip(*rows)
+    scores = np.asarray(scores, dtype=float)
+    user_score = None
+    rank = None
+    if user_id in users:
+        user_score = float(scores[users.index(user_id)])
+        # Midpoint rank: ties count half below and half above
+        rank = 100 * (np.count_nonzero(scores < user_score) + 0.5 * np.count_nonzero(scores == user_score)) / len(scores)
+
+    return {
+        "domain": domain,
+        "test": test,
+        "population": len(scores),
+        "score": None if user_score is None else round(user_score, 2),
+        "percentile_rank": None if rank is None else round(float(rank), 1),
+        "percentiles": {
+            str(p): round(float(v), 2)
+            for p, v in zip(POPULATION_PERCENTILES, np.percentile(scores, POPULATION_PERCENTILES))
+        },
+    }
@@ -1,49 +1,176 @@
-import pytesseract
-pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
 from pdf2image import convert_from_path
 from PIL import Image
 import cv2
 import numpy as np
 
+from services.admission import register_resource
+from services.ocr_engine import OCR_POOL_SIZE, get_ocr_engine
 
-def preprocess_image(pil_img):
-    img = np.array(pil_img)
+# "fixed" is the original global threshold at 150, "gray" skips binarization
+PREPROCESS_MODES = ("otsu", "adaptive", "fixed", "gray")
+DEFAULT_PREPROCESS = "otsu"
+
+# Tesseract is tuned for ~300 DPI text; anything denser only costs time
+TARGET_DPI = 300
+PDF_RENDER_DPI = 300
+MAX_SKEW_ANGLE = 15.0
+
+# Poppler's bin directory; when it does not exist pdftoppm is taken from PATH
+POPPLER_PATH = os.environ.get("POPPLER_PATH", r"C:\Users\Rohit Reddy\Downloads\Poppler\poppler-25.12.0\Library\bin")
+
+
+def to_grayscale(img):
+    if isinstance(img, Image.Image) and img.mode not in ("L", "RGB", "RGBA"):
+        img = img.convert("L")
+
+    arr = np.asarray(img)
 
     # If already grayscale, skip conversion
-    if len(img.shape) == 2:
-        gray = img
-    else:
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    if arr.ndim == 2:
+        return arr
+    if arr.shape[2] == 4:
+        return cv2.cvtColor(arr, cv2.COLOR_RGBA2GRAY)
+    # PIL hands us RGB, not OpenCV's BGR
+    return cv2.cvtColor(arr, cv2.COLOR_RGB2GRAY)
+
+
+def downscale_to_dpi(gray, dpi, target_dpi=TARGET_DPI):
+    if not dpi or dpi <= target_dpi:
+        return gray
+
+    scale = target_dpi / dpi
+    return cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+
+def binarize(gray, mode):
+    if mode == "gray":
+        return gray
+    if mode == "fixed":
+        return cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY)[1]
+    if mode == "otsu":
+        return cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)[1]
+    if mode == "adaptive":
+        # Handles uneven lighting on phone photos of reports
+        blurred = cv2.medianBlur(gray, 3)
+        return cv2.adaptiveThreshold(
+            blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 15
+        )
+    raise ValueError(f"Unknown preprocess mode: {mode}")
+
+
+def estimate_skew(binary):
+    """
+    Angle (degrees) of the text block, from the minimum-area rectangle
+    around all dark pixels.
+    """
+    coords = cv2.findNonZero(cv2.bitwise_not(binary))
+    if coords is None or len(coords) < 100:
+        return 0.0
+
+    # Use the box corners rather than the returned angle, whose range
+    # changed between OpenCV releases
+    box = cv2.boxPoints(cv2.minAreaRect(coords))
+    dx, dy = box[1] - box[0]
+    angle = math.degrees(math.atan2(dy, dx))
+
+    while angle > 45:
+        angle -= 90
+    while angle <= -45:
+        angle += 90
+    return angle
+
+
+def deskew(binary, max_angle=MAX_SKEW_ANGLE):
+    angle = estimate_skew(binary)
+    if abs(angle) < 0.1 or abs(angle) > max_angle:
+        return binary
 
-    thresh = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY)[1]
-    return Image.fromarray(thresh)
+    h, w = binary.shape[:2]
+    matrix = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+    return cv2.warpAffine(
+        binary, matrix, (w, h),
+        flags=cv2.INTER_NEAREST,
+        borderMode=cv2.BORDER_CONSTANT,
+        borderValue=255,
+    )
 
 
-def extract_text_from_image(path):
+def preprocess_image(img, mode=DEFAULT_PREPROCESS, dpi=None, straighten=True):
+    """
+    PIL image or array -> uint8 NumPy array ready for Tesseract.
+    """
+    if mode not in PREPROCESS_MODES:
+        raise ValueError(f"Unknown preprocess mode: {mode}")
+
+    gray = to_grayscale(img)
+    gray = downscale_to_dpi(gray, dpi)
+    processed = binarize(gray, mode)
+
+    if straighten and mode != "gray":
+        processed = deskew(processed)
+
+    return processed
+
+
+def effective_dpi(dpi):
+    # Resolution of the page after downscale_to_dpi, passed on to Tesseract
+    return min(dpi or TARGET_DPI, TARGET_DPI)
+
+
+def image_dpi(img):
+    dpi = img.info.get("dpi")
+    if not dpi:
+        return None
+    return float(dpi[0]) or None
+
+
+def extract_text_from_image(path, preprocess=DEFAULT_PREPROCESS):
     img = Image.open(path)
-    img = preprocess_image(img)
-    text = pytesseract.image_to_string(img)
+    dpi = image_dpi(img)
+    processed = preprocess_image(img, mode=preprocess, dpi=dpi)
+    text = get_ocr_engine().image_to_string(processed, dpi=effective_dpi(dpi))
     return text
 
 
-def extract_text_from_pdf(path):
-    POPPLER_PATH = r"C:\Users\Rohit Reddy\Downloads\Poppler\poppler-25.12.0\Library\bin"
-    pages = convert_from_path(path, dpi=300, poppler_path=POPPLER_PATH)
+def render_pdf_pages(path, dpi=PDF_RENDER_DPI):
+    poppler_path = POPPLER_PATH if POPPLER_PATH and os.path.isdir(POPPLER_PATH) else None
+    # Render straight to grayscale so pages never go through RGB
+    return convert_from_path(path, dpi=dpi, grayscale=True, poppler_path=poppler_path)
 
-    text = ""
 
-    for page in pages:
-        page = preprocess_image(page)
-        text += pytesseract.image_to_string(page)
+# OpenCV and tesserocr both release the GIL, so pages scale across threads
+_page_pool = ThreadPoolExecutor(max_workers=OCR_POOL_SIZE, thread_name_prefix="ocr-page")
 
-    return text
+# Whole reports OCR'd at once; each one already spreads its pages over _page_pool
+ocr_admission = register_resource(
+    "ocr", concurrency=2, rate=0.5, burst=6,
+    max_queue={"interactive": 2, "batch": 8},
+    queue_timeout={"interactive": 10.0, "batch": 60.0},
+)
+
+
+def extract_text_from_pdf(path, preprocess=DEFAULT_PREPROCESS):
+    pages = render_pdf_pages(path)
+    engine = get_ocr_engine()
+
+    def ocr_page(page):
+        processed = preprocess_image(page, mode=preprocess, dpi=PDF_RENDER_DPI)
+        return engine.image_to_string(processed, dpi=effective_dpi(PDF_RENDER_DPI))
+
+    if len(pages) == 1:
+        return ocr_page(pages[0])
+
+    return "".join(_page_pool.map(ocr_page, pages))
 
 
-def extract_text_from_file(path, ftype):
+def extract_text_from_file(path, ftype, preprocess=DEFAULT_PREPROCESS):
     if ftype == "pdf":
-        return extract_text_from_pdf(path)
+        return extract_text_from_pdf(path, preprocess)
 
     elif ftype == "image":
-        return extract_text_from_image(path)
+        return extract_text_from_image(path, preprocess)
 
-    return ""
\ No newline at end of file
+    return ""
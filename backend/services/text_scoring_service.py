@@ -1,17 +1,35 @@
-from difflib import SequenceMatcher
+import numpy as np
+from services.reading_alignment import score_words
+
+# Vision Score = 50% Reading Accuracy + 30% Behavioral Stability + 20% Movement / Speed Score
+VISION_WEIGHTS = np.array([0.5, 0.3, 0.2])
+
+# Lower bounds of each interpretation band, lowest first
+INTERPRETATION_THRESHOLDS = np.array([25, 50, 75, 90])
+INTERPRETATIONS = (
+    "Severe visual impairment. Critical difficulty in visual engagement and information processing.",
+    "Significant visual impairment. Marked difficulty in reading accuracy and behavioral tracking.",
+    "Moderate visual impairment. Noticeable difficulty in reading consistency and maintaining stable head position.",
+    "Mild visual difficulty. Reading accuracy or stability shows slight deviations from baseline.",
+    "Minimal to no visual impairment detected. Excellent reading performance and behavioral stability.",
+)
 
 class TextScoringService:
+    def score_reading(self, original_text: str, typed_text: str, include_alignment: bool = True) -> dict:
+        # Word error rate with substitution/insertion/deletion counts and,
+        # optionally, the per-word alignment for clinicians
+        result = score_words(original_text, typed_text, include_alignment)
+        result["reading_accuracy"] = round(max(0.0, 1 - result["wer"]) * 100, 2) if result["reference_words"] else 0.0
+        return result
+
     def calculate_reading_accuracy(self, original_text: str, typed_text: str) -> float:
         if not original_text:
             return 0.0
         
-        # Simple similarity ratio
-        similarity = SequenceMatcher(None, original_text.lower(), typed_text.lower()).ratio()
-        return round(similarity * 100, 2)
+        return self.score_reading(original_text, typed_text, include_alignment=False)["reading_accuracy"]
 
     def calculate_final_score(self, accuracy: float, stability: float, movement_speed: float) -> dict:
-        # Vision Score = 50% Reading Accuracy + 30% Behavioral Stability + 20% Movement / Speed Score
-        vision_score = (0.5 * accuracy) + (0.3 * stability) + (0.2 * movement_speed)
+        vision_score = float(np.dot(VISION_WEIGHTS, (accuracy, stability, movement_speed)))
         vision_score = round(max(0, min(100, vision_score)), 2)
         
         interpretation = self.get_interpretation(vision_score)
@@ -25,15 +43,88 @@ class TextScoringService:
         }
 
     def get_interpretation(self, score: float) -> str:
-        if score >= 90:
-            return "Minimal to no visual impairment detected. Excellent reading performance and behavioral stability."
-        elif score >= 75:
-            return "Mild visual difficulty. Reading accuracy or stability shows slight deviations from baseline."
-        elif score >= 50:
-            return "Moderate visual impairment. Noticeable difficulty in reading consistency and maintaining stable head position."
-        elif score >= 25:
-            return "Significant visual impairment. Marked difficulty in reading accuracy and behavioral tracking."
-        else:
-            return "Severe visual impairment. Critical difficulty in visual engagement and information processing."
+        return INTERPRETATIONS[int(np.searchsorted(INTERPRETATION_THRESHOLDS, score, side="right"))]
+
+    def score_trials(self, trials: list) -> dict:
+        """
+        Score every trial of an assessment session in one call.
+
+        Each trial is a dict with "domain" and "test" plus either a direct
+        "score" (hearing, cognitive, ...) or the vision components: "accuracy"
+        or the "original_text"/"typed_text" pair, "stability" and "movement".
+        Weighting, clipping and interpretation run over the whole batch at
+        once; only the reading alignment is per trial. A non-vision trial
+        without a "score", or a vision trial with neither "accuracy" nor a
+        passage, is rejected with ValueError rather than scored as zero.
+        """
+        if not trials:
+            return {"trials": [], "domains": {}, "overall": None}
+
+        n = len(trials)
+        components = np.zeros((n, 3))
+        direct = np.full(n, np.nan)
+
+        for i, trial in enumerate(trials):
+            if trial.get("score") is not None:
+                direct[i] = trial["score"]
+                continue
+            if trial.get("domain", "vision") != "vision":
+                raise ValueError(f"Trial {i} ({trial['domain']}) has no score; only vision trials are scored from components")
+            accuracy = trial.get("accuracy")
+            if accuracy is None and not trial.get("original_text"):
+                raise ValueError(f"Trial {i} has no score, accuracy or original_text")
+            if accuracy is None:
+                accuracy = self.calculate_reading_accuracy(trial.get("original_text") or "", trial.get("typed_text") or "")
+            components[i] = (accuracy, trial.get("stability") or 0, trial.get("movement") or 0)
+
+        scores = np.where(np.isnan(direct), components @ VISION_WEIGHTS, direct)
+        scores = np.round(np.clip(scores, 0, 100), 2)
+        bands = np.searchsorted(INTERPRETATION_THRESHOLDS, scores, side="right")
+
+        results = []
+        for i, trial in enumerate(trials):
+            result = {
+                "domain": trial.get("domain", "vision"),
+                "test": trial.get("test"),
+                "score": float(scores[i]),
+            }
+            if np.isnan(direct[i]):
+                result.update({
+                    "reading_accuracy": float(components[i, 0]),
+                    "behavioral_stability": float(components[i, 1]),
+                    "movement_score": float(components[i, 2]),
+                    "interpretation": INTERPRETATIONS[bands[i]],
+                })
+            results.append(result)
+
+        # Per-domain aggregates with one grouped reduction
+        domain_names, domain_index = np.unique([r["domain"] for r in results], return_inverse=True)
+        counts = np.bincount(domain_index)
+        means = np.bincount(domain_index, weights=scores) / counts
+        mins = np.full(len(domain_names), np.inf)
+        maxs = np.full(len(domain_names), -np.inf)
+        np.minimum.at(mins, domain_index, scores)
+        np.maximum.at(maxs, domain_index, scores)
+
+        domains = {
+            str(name): {
+                "trials": int(counts[d]),
+                "mean_score": round(float(means[d]), 2),
+                "min_score": float(mins[d]),
+                "max_score": float(maxs[d]),
+            }
+            for d, name in enumerate(domain_names)
+        }
+
+        return {
+            "trials": results,
+            "domains": domains,
+            "overall": {
+                "trials": n,
+                "mean_score": round(float(scores.mean()), 2),
+                "min_score": float(scores.min()),
+                "max_score": float(scores.max()),
+            },
+        }
 
 text_scoring_service = TextScoringService()
@@ -1,82 +1,290 @@
+import asyncio
 import cv2
+import functools
 import mediapipe as mp
 import numpy as np
 import base64
-import math
 import os
-import urllib.request
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from mediapipe.tasks import python
 from mediapipe.tasks.python import vision
+from services.admission import register_resource
+from services.frame_profiler import frame_profiler
+from services.gaze_metrics import NOSE_TIP, session_metrics
+from services.model_registry import register_model, resolve_model
+
+# Normalized landmark coordinates are sent as int16 (value * LANDMARK_SCALE),
+# i.e. 1e-4 of the frame size per step
+LANDMARK_SCALE = 10000
+MESH_COLOR = (0, 255, 0)
+# Pixel offsets that approximate the old radius-1 cv2.circle dots
+MESH_DOT_OFFSETS = ((0, 0), (-1, 0), (1, 0), (0, -1), (0, 1))
+
+# Per-session VIDEO-mode landmarkers track the face between frames instead
+# of running full detection every time
+VIDEO_IDLE_TIMEOUT = 60.0
+MAX_VIDEO_SESSIONS = 16
+MAX_SPARE_LANDMARKERS = 4
+VISION_WORKERS = int(os.environ.get("VISION_WORKERS", 0)) or max(2, os.cpu_count() or 2)
+
+# A frame that waited half a second is stale; the client has newer ones
+vision_admission = register_resource(
+    "vision", concurrency=VISION_WORKERS, rate=25.0 * VISION_WORKERS, burst=50 * VISION_WORKERS,
+    max_queue={"interactive": 2 * VISION_WORKERS, "batch": VISION_WORKERS},
+    queue_timeout={"interactive": 0.5, "batch": 2.0},
+)
+
+
+def landmarks_to_array(landmarks) -> np.ndarray:
+    return np.array([(lm.x, lm.y) for lm in landmarks], dtype=np.float32)
+
+
+def pack_landmarks(points: np.ndarray) -> dict:
+    quantized = np.clip(np.rint(points * LANDMARK_SCALE), -32768, 32767).astype("<i2")
+    return {
+        "encoding": "int16-le",
+        "scale": LANDMARK_SCALE,
+        "count": len(points),
+        "data": base64.b64encode(quantized.tobytes()).decode(),
+    }
+
+
+def draw_landmarks(frame: np.ndarray, points: np.ndarray) -> None:
+    h, w = frame.shape[:2]
+    xs = (points[:, 0] * w).astype(np.intp)
+    ys = (points[:, 1] * h).astype(np.intp)
+
+    for dx, dy in MESH_DOT_OFFSETS:
+        frame[np.clip(ys + dy, 0, h - 1), np.clip(xs + dx, 0, w - 1)] = MESH_COLOR
+
+
+def encode_jpeg_data_url(frame: np.ndarray) -> str:
+    _, buffer = cv2.imencode(".jpg", frame)
+    return f"data:image/jpeg;base64,{base64.b64encode(buffer).decode()}"
+
+
+class LandmarkerSession:
+    """
+    A VIDEO-mode landmarker owned by one client. MediaPipe requires strictly
+    increasing timestamps per landmarker, which also holds when an instance
+    is handed from an evicted session to a new one.
+    """
+
+    def __init__(self, landmarker=None, last_timestamp=0):
+        self.landmarker = landmarker
+        self.lock = threading.Lock()
+        self.closed = False
+        self.started = time.monotonic()
+        self.base_timestamp = last_timestamp + 1
+        self.last_timestamp = last_timestamp
+        self.last_used = self.started
+
+    def next_timestamp(self) -> int:
+        elapsed_ms = int((time.monotonic() - self.started) * 1000)
+        self.last_timestamp = max(self.base_timestamp + elapsed_ms, self.last_timestamp + 1)
+        return self.last_timestamp
+
 
 class VisionTrackingService:
     def __init__(self):
-        self.model_path = os.path.join(os.path.dirname(__file__), "face_landmarker.task")
-        self._ensure_model_exists()
+        # Nothing is loaded here; the model file is resolved and the
+        # landmarker built on the first frame (or by the startup warm-up)
+        self._image_landmarker = register_model(
+            "face_landmarker", lambda: self._create_landmarker(vision.RunningMode.IMAGE)
+        )
+        self._landmarker_lock = threading.Lock()
+
+        self._sessions = OrderedDict()
+        self._spare = []
+        self._sessions_lock = threading.Lock()
 
-        base_options = python.BaseOptions(model_asset_path=self.model_path)
+        # Inference runs here so it never blocks the event loop
+        self.executor = ThreadPoolExecutor(max_workers=VISION_WORKERS, thread_name_prefix="vision")
+
+    @property
+    def landmarker(self):
+        # Stateless IMAGE-mode landmarker for one-off frames without a session
+        return self._image_landmarker.get()
+
+    def _create_landmarker(self, running_mode):
+        base_options = python.BaseOptions(model_asset_path=resolve_model("face_landmarker"))
         options = vision.FaceLandmarkerOptions(
             base_options=base_options,
             num_faces=1,
-            running_mode=vision.RunningMode.IMAGE
+            running_mode=running_mode
         )
-        self.landmarker = vision.FaceLandmarker.create_from_options(options)
+        return vision.FaceLandmarker.create_from_options(options)
 
-    def _ensure_model_exists(self):
-        if not os.path.exists(self.model_path):
-            url = "https://storage.googleapis.com/mediapipe-models/face_landmarker/face_landmarker/float16/1/face_landmarker.task"
-            urllib.request.urlretrieve(url, self.model_path)
+    async def run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(fn, *args))
 
-    def process_frame(self, base64_image: str):
+    def _retire(self, session) -> bool:
+        # Called with _sessions_lock held; a session mid-frame is left alone
+        if not session.lock.acquire(blocking=False):
+            return False
         try:
-            encoded_data = base64_image.split(',')[1]
-            nparr = np.frombuffer(base64.b64decode(encoded_data), np.uint8)
-            frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            if session.landmarker is not None:
+                if len(self._spare) < MAX_SPARE_LANDMARKERS:
+                    self._spare.append((session.landmarker, session.last_timestamp))
+                else:
+                    session.landmarker.close()
+            session.landmarker = None
+            session.closed = True
+            return True
+        finally:
+            session.lock.release()
 
-            if frame is None:
-                return None
+    def _evict(self, now):
+        for session_id, session in list(self._sessions.items()):
+            if now - session.last_used > VIDEO_IDLE_TIMEOUT and self._retire(session):
+                del self._sessions[session_id]
 
-            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb)
+        while len(self._sessions) >= MAX_VIDEO_SESSIONS:
+            # Least recently used first
+            for session_id, session in self._sessions.items():
+                if self._retire(session):
+                    del self._sessions[session_id]
+                    break
+            else:
+                break
 
-            result = self.landmarker.detect(mp_image)
+    def _checkout(self, session_id):
+        now = time.monotonic()
+        with self._sessions_lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                self._evict(now)
+                landmarker, last_timestamp = self._spare.pop() if self._spare else (None, 0)
+                session = LandmarkerSession(landmarker, last_timestamp)
+                self._sessions[session_id] = session
+            else:
+                self._sessions.move_to_end(session_id)
+            session.last_used = now
+            return session
 
-            status = "No face detected"
-            distance = 0
+    def release_session(self, session_id):
+        with self._sessions_lock:
+            session = self._sessions.get(session_id)
+            if session is not None and self._retire(session):
+                del self._sessions[session_id]
 
-            if result.face_landmarks:
-                landmarks = result.face_landmarks[0]
-                h, w, _ = frame.shape
+    def active_sessions(self) -> int:
+        return len(self._sessions)
 
-                p1 = landmarks[234]
-                p2 = landmarks[454]
-                face_width = math.dist((p1.x, p1.y), (p2.x, p2.y)) * w
-                distance = (w * 15) / (face_width + 1e-6)
+    def detect(self, mp_image, session_id=None):
+        if session_id is None:
+            with self._landmarker_lock:
+                return self.landmarker.detect(mp_image)
 
-                nose = landmarks[1]
+        while True:
+            session = self._checkout(session_id)
+            with session.lock:
+                if session.closed:
+                    # Evicted between checkout and lock; take a fresh session
+                    continue
+                if session.landmarker is None:
+                    session.landmarker = self._create_landmarker(vision.RunningMode.VIDEO)
+                return session.landmarker.detect_for_video(mp_image, session.next_timestamp())
 
-                if not (0.4 < nose.x < 0.6):
-                    status = "Align your face"
-                elif distance < 45:
-                    status = "Move back"
-                elif distance > 65:
-                    status = "Move closer"
-                else:
-                    status = "Calibration complete"
+    def decode_data_url(self, base64_image: str) -> bytes:
+        encoded_data = base64_image.split(',')[1] if ',' in base64_image else base64_image
+        return base64.b64decode(encoded_data)
 
-                # Draw mesh
-                for lm in landmarks:
-                    cv2.circle(frame, (int(lm.x*w), int(lm.y*h)), 1, (0,255,0), -1)
+    def calibration_status(self, distance, nose_x):
+        if not (0.4 < nose_x < 0.6):
+            return "Align your face"
+        elif distance < 45:
+            return "Move back"
+        elif distance > 65:
+            return "Move closer"
+        return "Calibration complete"
 
-            _, buffer = cv2.imencode(".jpg", frame)
-            img = base64.b64encode(buffer).decode()
+    def analyze(self, frame, session_id=None):
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb)
 
-            return {
-                "processed_frame": f"data:image/jpeg;base64,{img}",
-                "distance": round(distance,1),
-                "calibration_status": status
-            }
+        result = self.detect(mp_image, session_id)
+
+        if not result.face_landmarks:
+            return 0.0, None
+
+        points = landmarks_to_array(result.face_landmarks[0])
+        w = frame.shape[1]
+
+        face_width = float(np.linalg.norm(points[234] - points[454])) * w
+        distance = (w * 15) / (face_width + 1e-6)
+        return distance, points
+
+    def build_result(self, frame, include_landmarks=False, annotate=False, session_id=None):
+        """
+        Results-only by default. include_landmarks adds the packed int16
+        mesh for the client to draw; annotate (debug) adds the frame back
+        as a JPEG data URL with the mesh drawn on it. With a session_id the
+        distance is smoothed and the running session metrics are included.
+        """
+        distance, points = self.analyze(frame, session_id)
+        h, w = frame.shape[:2]
+
+        metrics = None
+        if session_id is not None:
+            session = session_metrics.get(session_id)
+            session.update(points, w, h, distance)
+            metrics = session.snapshot()
+            if points is not None:
+                distance = metrics["smoothed_distance"]
+
+        status = "No face detected"
+        if points is not None:
+            status = self.calibration_status(distance, points[NOSE_TIP, 0])
+
+        result = {
+            "distance": round(distance, 1),
+            "calibration_status": status,
+        }
+
+        if metrics is not None:
+            result["metrics"] = metrics
+
+        if include_landmarks:
+            result["landmarks"] = pack_landmarks(points) if points is not None else None
+
+        if annotate:
+            if points is not None:
+                draw_landmarks(frame, points)
+            result["processed_frame"] = encode_jpeg_data_url(frame)
+
+        return result
+
+    def _process_jpeg(self, jpeg: bytes, include_landmarks=False, annotate=False, session_id=None):
+        try:
+            frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+            if frame is None:
+                return None
+
+            return self.build_result(frame, include_landmarks, annotate, session_id)
+        except Exception as e:
+            print("Error:", e)
+            return None
+
+    def _process_frame(self, base64_image: str, include_landmarks=False, annotate=True, session_id=None):
+        try:
+            jpeg = self.decode_data_url(base64_image)
         except Exception as e:
             print("Error:", e)
             return None
 
+        return self._process_jpeg(jpeg, include_landmarks, annotate, session_id)
+
+    # Entry points; frames of a session armed in frame_profiler run under the profiler
+
+    def process_jpeg(self, jpeg: bytes, include_landmarks=False, annotate=False, session_id=None):
+        return frame_profiler.call(session_id, self._process_jpeg, jpeg, include_landmarks, annotate, session_id)
+
+    def process_frame(self, base64_image: str, include_landmarks=False, annotate=True, session_id=None):
+        return frame_profiler.call(session_id, self._process_frame, base64_image, include_landmarks, annotate, session_id)
+
 vision_service = VisionTrackingService()
\ No newline at end of file
@@ -0,0 +1,44 @@
+import pytest
+
+from services.pre_classifier import pre_classify, score_rules
+
+
+def rules_verdict(text):
+    verdict = pre_classify(text)
+    return verdict["primary_disability"] if verdict and verdict["stage"] == "rules" else None
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Bilateral sensorineural hearing loss, PTA 65 dB.", "hearing"),
+    ("Profound hearing loss; cochlear implant fitted in 2019.", "hearing"),
+    ("Patient attended with a parent. Uses bilateral hearing aids since age three.", "hearing"),
+    ("Diagnosed with autism spectrum disorder (ASD) at age 4.", "cognitive"),
+    ("Legally blind since birth.", "visual"),
+    ("Visual acuity RE 6/6 LE 6/60", "visual"),
+])
+def test_patient_findings_are_decided_by_rules(text, expected):
+    assert rules_verdict(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    # Someone else's findings
+    "Family history includes a sibling who uses hearing aids.",
+    "Mother was diagnosed with glaucoma and is legally blind.",
+    "Deafness runs in the family.",
+    # Negated or uncertain findings, before or after the match
+    "Referred to rule out hearing loss.",
+    "Autism was ruled out.",
+    "Screened for autism: negative.",
+    "Mild hearing loss was suspected but audiogram was normal.",
+    "No hearing loss.",
+    # ASD is also an atrial septal defect
+    "Echocardiogram shows a small ASD.",
+])
+def test_unclear_findings_escalate(text):
+    assert rules_verdict(text) is None
+
+
+def test_snellen_reads_each_eye():
+    evidence, matched = score_rules("Visual acuity RE 6/6 LE 6/60")
+    assert evidence["visual"] >= 0.9
+    assert "eye acuity" in matched["visual"]
@@ -134,6 +134,10 @@ const VisionTestView = ({ testId, onBack, onNext }: { testId: number; onBack: ()
   const processingIntervalRef = useRef<NodeJS.Timeout | null>(null);
   const dotAnimationRef = useRef<number | null>(null);
   const dotPositionRef = useRef({ x: 50, y: 50 });
+  const frameRetryAtRef = useRef(0); // Date.now() before which no frames are sent (server shed load)
+  // One tracked server session per recording: frames run on its own landmarker
+  // and its gaze metrics feed the final score
+  const visionSessionIdRef = useRef<string>(crypto.randomUUID());
 
   const isObjectRecognition = testId === 1;
   const isClarity = testId === 2;
@@ -347,6 +351,7 @@ const VisionTestView = ({ testId, onBack, onNext }: { testId: number; onBack: ()
   );
 
   const sendFrameToBackend = useCallback(async () => {
+    if (Date.now() < frameRetryAtRef.current) return;
     const frame = captureFrame();
     if (!frame) return;
 
@@ -354,8 +359,16 @@ const VisionTestView = ({ testId, onBack, onNext }: { testId: number; onBack: ()
       const response = await fetch("http://localhost:8000/vision/process-frame", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ frame }),
+        body: JSON.stringify({ frame, session_id: visionSessionIdRef.current }),
       });
+      if (!response.ok) {
+        // A shed (429) or failed frame keeps the last preview and calibration state
+        if (response.status === 429) {
+          const retryAfter = Number(response.headers.get("Retry-After")) || 1;
+          frameRetryAtRef.current = Date.now() + retryAfter * 1000;
+        }
+        return;
+      }
       const data = await response.json();
       setProcessedFrame(data.processed_frame);
       setCalibrationStatus(data.calibration_status);
@@ -380,6 +393,7 @@ const VisionTestView = ({ testId, onBack, onNext }: { testId: number; onBack: ()
   }, [captureFrame, readingPhase]);
 
   const startRecording = useCallback(async () => {
+    visionSessionIdRef.current = crypto.randomUUID();
     try {
       const stream = await navigator.mediaDevices.getUserMedia({
         video: true,
@@ -492,7 +506,8 @@ const VisionTestView = ({ testId, onBack, onNext }: { testId: number; onBack: ()
           typed_text: readingInput,
           time_taken: elapsedTime,
           stability_metrics: stabilityScore,
-          movement_metrics: movementScore
+          movement_metrics: movementScore,
+          session_id: visionSessionIdRef.current
         }),
       });
       const data = await response.json();
@@ -10,7 +10,7 @@
  * - Drift detection logging
  */
 
-import websocketService, { WebSocketService } from './websocket';
+import websocketService, { MessageType, WebSocketService } from './websocket';
 
 // Audio configuration
 interface AudioConfig {
@@ -31,6 +31,9 @@ const DEFAULT_CONFIG: AudioConfig = {
   bufferSize: 4096
 };
 
+// Minimum gap between playback_buffer reports to the backend
+const BUFFER_REPORT_INTERVAL_MS = 250;
+
 export enum AudioState {
   INACTIVE = 'inactive',
   RECORDING = 'recording',
@@ -81,6 +84,7 @@ export class AudioService {
   private decodeChainPromise: Promise<void> = Promise.resolve();
   private chunkArrivalCounter: number = 0;
   private driftResetCount: number = 0;
+  private lastBufferReport: number = 0;       // performance.now() of the last playback_buffer report
 
   // UI state flags (set by UI layer to suppress interrupts during critical moments)
   private isProcessing: boolean = false;
@@ -526,6 +530,8 @@ export class AudioService {
       this.dispatchEvent(AudioEvent.PLAYBACK_START, {});
     }
 
+    this._reportPlaybackBuffer();
+
     source.onended = () => {
       this.activeSources.delete(source);
       this.pendingChunks--;
@@ -534,6 +540,19 @@ export class AudioService {
     };
   }
 
+  /**
+   * Tell the backend how much audio is queued, so it can size and pace
+   * the next chunks. Throttled to one report per BUFFER_REPORT_INTERVAL_MS.
+   */
+  private _reportPlaybackBuffer(): void {
+    const now = performance.now();
+    if (now - this.lastBufferReport < BUFFER_REPORT_INTERVAL_MS) return;
+    this.lastBufferReport = now;
+    websocketService.send(MessageType.PLAYBACK_BUFFER, {
+      buffered_ms: Math.round(this.getSchedulerHeadroom() * 1000),
+    });
+  }
+
   /**
    * TTS is complete when both:
    * 1. Backend has signalled TTS_END
@@ -26,6 +26,8 @@ export enum MessageType {
   SILENT_FOLLOWUP = "silent_followup",
   TEXT_MESSAGE = "text_message",
   PDF_UPLOAD = "pdf_upload",
+  AUDIO_CONFIG = "audio_config",
+  PLAYBACK_BUFFER = "playback_buffer",
 
   // Session storage message types
   SAVE_SESSION = "save_session",
@@ -450,6 +452,18 @@ export class WebSocketService {
     return this.connectionState;
   }
 
+  /**
+   * TTS codecs this browser can play, preferred first ("wav" always works)
+   */
+  public static supportedAudioCodecs(): string[] {
+    const audio = document.createElement('audio');
+    const codecs: string[] = [];
+    if (audio.canPlayType('audio/webm; codecs="opus"')) codecs.push('webm_opus');
+    if (audio.canPlayType('audio/ogg; codecs="opus"')) codecs.push('ogg_opus');
+    codecs.push('wav');
+    return codecs;
+  }
+
   /**
    * Handle WebSocket open event
    */
@@ -465,6 +479,9 @@ export class WebSocketService {
       }
     }, 30000); // Send ping every 30 seconds
 
+    // Tell the backend which TTS codecs this browser can decode
+    this.send(MessageType.AUDIO_CONFIG, { codecs: WebSocketService.supportedAudioCodecs() });
+
     // Notify listeners
     this.notifyListeners('open', { event });
 